@@ -0,0 +1,27 @@
+# ---------------------------
+# Almacenamiento local (SQLite) compartido entre reruns, sesiones y procesos
+# ---------------------------
+import os
+import sqlite3
+from pathlib import Path
+
+# Carpeta de datos locales; se puede mover con la variable de entorno MATRIZ_DATA_DIR
+DATA_DIR = Path(os.environ.get("MATRIZ_DATA_DIR", ".matriz"))
+
+
+def ruta_datos(nombre: str) -> Path:
+    """Ruta de un archivo dentro de DATA_DIR (crea la carpeta si falta)."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    return DATA_DIR / nombre
+
+
+def conectar(nombre: str) -> sqlite3.Connection:
+    """
+    Conexión SQLite en modo WAL y autocommit (isolation_level=None).
+    Las operaciones atómicas abren su propia transacción con BEGIN IMMEDIATE,
+    que serializa escritores aunque vengan de otros procesos.
+    """
+    con = sqlite3.connect(ruta_datos(nombre), timeout=30, isolation_level=None, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
@@ -0,0 +1,92 @@
+# ---------------------------
+# Analítica de incidentes: tipado de columnas una vez + agregados vectorizados (pandas)
+# ---------------------------
+import pandas as pd
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M"
+CATEGORICAS = ["Sistema", "Area", "Clasificación", "Area de GTIC - Coordinando", "Impacto", "Estado", "Modo Reporte"]
+# "3 horas 15 minutos", "1 hora", "45 minutos", "2h 5m"
+TIEMPO_RE = r"^\s*(?:(?P<h>\d+)\s*h\w*)?\s*(?:(?P<m>\d+)\s*m\w*)?\s*$"
+ORDEN_IMPACTO = ["Alto", "Medio", "Bajo"]
+
+
+def _col(df: pd.DataFrame, nombre: str) -> pd.Series:
+    return df[nombre] if nombre in df else pd.Series("", index=df.index, dtype=object)
+
+
+def tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas tipadas a partir de la copia de la hoja (todo texto):
+    apertura/cierre (datetime), minutos_solucion (float), mes (Period) y categóricas.
+    Todo por columna, sin apply fila a fila.
+    """
+    t = pd.DataFrame(index=df.index)
+    t["CODIGO"] = _col(df, "CODIGO").astype("string")
+    t["apertura"] = pd.to_datetime(_col(df, "Fecha y Hora de Apertura"), format=FORMATO_FECHA, errors="coerce")
+    t["cierre"] = pd.to_datetime(_col(df, "Fecha y Hora de Cierre"), format=FORMATO_FECHA, errors="coerce")
+
+    # "Tiempo Solución" se repite mucho: se parsea una vez por valor distinto
+    codigos, unicos = pd.factorize(_col(df, "Tiempo Solución").fillna(""))
+    partes = pd.Series(unicos, dtype="string").str.extract(TIEMPO_RE).apply(pd.to_numeric, errors="coerce")
+    h = pd.Series(partes["h"].to_numpy()[codigos], index=df.index).where(codigos >= 0)
+    m = pd.Series(partes["m"].to_numpy()[codigos], index=df.index).where(codigos >= 0)
+    minutos = h.fillna(0) * 60 + m.fillna(0)
+    minutos = minutos.where(h.notna() | m.notna())
+    # Sin "Tiempo Solución" legible: cierre − apertura
+    delta = (t["cierre"] - t["apertura"]).dt.total_seconds() / 60
+    t["minutos_solucion"] = minutos.fillna(delta.where(delta >= 0))
+
+    t["mes"] = t["apertura"].dt.to_period("M")
+    for col in CATEGORICAS:
+        serie = _col(df, col).astype("string").str.strip()
+        t[col] = serie.mask(serie.fillna("") == "", "(sin dato)").astype("category")
+    return t
+
+
+def mttr_por(t: pd.DataFrame, col: str = "Sistema") -> pd.DataFrame:
+    """MTTR (media y mediana de minutos de solución) e incidentes por categoría."""
+    g = t.groupby(col, observed=True)["minutos_solucion"]
+    out = pd.DataFrame({
+        "incidentes": g.size(),
+        "con_tiempo": g.count(),
+        "mttr_h": g.mean() / 60,
+        "mediana_h": g.median() / 60,
+    })
+    return out.sort_values("incidentes", ascending=False)
+
+
+def conteo_por(t: pd.DataFrame, col: str) -> pd.Series:
+    return t[col].value_counts(sort=True).rename("incidentes")
+
+
+def impacto_por_mes(t: pd.DataFrame) -> pd.DataFrame:
+    """Incidentes por mes de apertura (filas) e Impacto (columnas)."""
+    con_fecha = t[t["mes"].notna()]
+    tabla = pd.crosstab(con_fecha["mes"], con_fecha["Impacto"])
+    columnas = [c for c in ORDEN_IMPACTO if c in tabla.columns] + [c for c in tabla.columns if c not in ORDEN_IMPACTO]
+    tabla = tabla[columnas]
+    tabla.index = tabla.index.astype(str)
+    return tabla
+
+
+def resumen(t: pd.DataFrame) -> dict:
+    abiertos = (t["Estado"].astype("string") != "Cerrado").sum()
+    return {
+        "incidentes": len(t),
+        "abiertos": int(abiertos),
+        "mttr_h": float(t["minutos_solucion"].mean() / 60) if t["minutos_solucion"].notna().any() else None,
+        "desde": t["apertura"].min(),
+        "hasta": t["apertura"].max(),
+    }
+
+
+def agregados(df: pd.DataFrame) -> dict:
+    """Todo lo que muestra el tablero, en una pasada sobre la tabla tipada."""
+    t = tipar(df)
+    return {
+        "resumen": resumen(t),
+        "mttr_sistema": mttr_por(t, "Sistema"),
+        "por_clasificacion": conteo_por(t, "Clasificación"),
+        "por_gtic": conteo_por(t, "Area de GTIC - Coordinando"),
+        "impacto_mes": impacto_por_mes(t),
+    }
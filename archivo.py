@@ -0,0 +1,249 @@
+# ---------------------------
+# Archivo histórico: incidentes cerrados fuera de la hoja, en Parquet por año/mes + índice SQLite
+# ---------------------------
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from almacen import conectar, ruta_datos
+from temporal import TZ
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M"
+COL_APERTURA, COL_ESTADO = 1, 16
+
+if TYPE_CHECKING:
+    import pandas as pd   # pandas/pyarrow se importan al leer o escribir particiones
+
+    from espejo import EspejoHoja
+    from hoja import ClienteHoja
+
+
+class ArchivoIncidentes:
+    """
+    Incidentes sacados de la hoja, en `raiz/anio=AAAA/mes=MM/parte-<ts>.parquet` (todas las
+    columnas como texto, igual que en la hoja) y un índice SQLite compacto:
+    CODIGO → (apertura, partición, archivo). El índice responde los chequeos de unicidad de
+    CODIGO sin abrir ningún Parquet; dataframe() lee solo las particiones del rango pedido.
+    """
+
+    def __init__(self, raiz: Optional[Path] = None, db: str = "archivo_indice.sqlite3"):
+        self.raiz = Path(raiz) if raiz else ruta_datos("archivo")
+        self._lock = threading.Lock()
+        self._con = conectar(db)
+        with self._lock:
+            self._con.executescript("""
+                CREATE TABLE IF NOT EXISTS archivados (
+                    codigo TEXT PRIMARY KEY, apertura TEXT NOT NULL,
+                    anio INTEGER NOT NULL, mes INTEGER NOT NULL, archivo TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_archivados_particion ON archivados(anio, mes);
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+            """)
+
+    # --- índice ---
+    @property
+    def version(self) -> int:
+        with self._lock:
+            row = self._con.execute("SELECT valor FROM meta WHERE clave='version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM archivados").fetchone()[0]
+
+    def codigos(self) -> list[str]:
+        with self._lock:
+            return [c for (c,) in self._con.execute("SELECT codigo FROM archivados ORDER BY apertura").fetchall()]
+
+    def codigos_desde(self, registro: int) -> tuple[list[str], int]:
+        """CODIGO archivados después de `registro` (rowid del índice) y el último registro."""
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT rowid, codigo FROM archivados WHERE rowid > ? ORDER BY rowid", (registro,)).fetchall()
+        return [c for _, c in rows], (rows[-1][0] if rows else registro)
+
+    def contiene(self, codigos: Iterable[str]) -> set[str]:
+        """Los CODIGO de `codigos` que ya están archivados."""
+        codigos = list(codigos)
+        out: set[str] = set()
+        with self._lock:
+            for i in range(0, len(codigos), 500):
+                lote = codigos[i:i + 500]
+                marcas = ",".join("?" * len(lote))
+                out.update(c for (c,) in self._con.execute(
+                    f"SELECT codigo FROM archivados WHERE codigo IN ({marcas})", lote).fetchall())
+        return out
+
+    def particiones(self) -> list[tuple[int, int, int]]:
+        """[(año, mes, incidentes), ...]"""
+        with self._lock:
+            return self._con.execute(
+                "SELECT anio, mes, COUNT(*) FROM archivados GROUP BY anio, mes ORDER BY anio, mes").fetchall()
+
+    # --- escritura ---
+    def guardar(self, encabezado: list[str], filas: list[list[str]]) -> int:
+        """
+        Escribe `filas` (con CODIGO y apertura válida) en sus particiones y las indexa.
+        Idempotente: las que ya estaban archivadas se saltan. Retorna cuántas se guardaron.
+        """
+        import pandas as pd
+
+        ya = self.contiene(f[0] for f in filas)
+        por_particion: dict[tuple[int, int], list[list[str]]] = {}
+        for f in filas:
+            if f[0] in ya:
+                continue
+            ap = datetime.strptime(f[COL_APERTURA].strip(), FORMATO_FECHA)
+            por_particion.setdefault((ap.year, ap.month), []).append(f)
+        if not por_particion:
+            return 0
+
+        sello = time.strftime("%Y%m%d%H%M%S")
+        indice = []
+        for (anio, mes), grupo in sorted(por_particion.items()):
+            carpeta = self.raiz / f"anio={anio}" / f"mes={mes:02d}"
+            carpeta.mkdir(parents=True, exist_ok=True)
+            destino = carpeta / f"parte-{sello}.parquet"
+            tmp = destino.with_suffix(".tmp")
+            df = pd.DataFrame(grupo, columns=encabezado, dtype="string")
+            df.to_parquet(tmp, index=False, compression="zstd")
+            tmp.replace(destino)   # el Parquet aparece completo o no aparece
+            rel = str(destino.relative_to(self.raiz))
+            indice += [(f[0], f[COL_APERTURA].strip(), anio, mes, rel) for f in grupo]
+
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.executemany(
+                    "INSERT OR IGNORE INTO archivados(codigo, apertura, anio, mes, archivo) VALUES (?, ?, ?, ?, ?)",
+                    indice,
+                )
+                self._con.execute(
+                    "INSERT INTO meta(clave, valor) VALUES ('version', '1') "
+                    "ON CONFLICT(clave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1")
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return len(indice)
+
+    # --- lectura ---
+    def filas(self, codigos: Iterable[str]) -> list[list[str]]:
+        """Filas archivadas de `codigos`: se abren solo los Parquet que las contienen."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        codigos = list(codigos)
+        por_archivo: dict[str, list[str]] = {}
+        with self._lock:
+            for i in range(0, len(codigos), 500):
+                lote = codigos[i:i + 500]
+                for c, a in self._con.execute(
+                        f"SELECT codigo, archivo FROM archivados WHERE codigo IN ({','.join('?' * len(lote))})", lote):
+                    por_archivo.setdefault(a, []).append(c)
+        out: list[list[str]] = []
+        for a, cods in sorted(por_archivo.items()):
+            if not (self.raiz / a).exists():
+                continue
+            tabla = pq.read_table(self.raiz / a)
+            tabla = tabla.filter(pc.is_in(tabla.column(0), value_set=pa.array(cods)))
+            out += [list(f) for f in zip(*(c.to_pylist() for c in tabla.columns))]
+        return out
+
+    def dataframe(self, desde: Optional[tuple[int, int]] = None, hasta: Optional[tuple[int, int]] = None,
+                  columnas: Optional[list[str]] = None) -> "pd.DataFrame":
+        """Incidentes archivados con apertura entre los meses `desde` y `hasta` (año, mes), inclusive."""
+        import pandas as pd
+
+        with self._lock:
+            archivos = [a for (a,) in self._con.execute(
+                "SELECT DISTINCT archivo FROM archivados WHERE (anio * 100 + mes) BETWEEN ? AND ? ORDER BY archivo",
+                ((desde[0] * 100 + desde[1]) if desde else 0, (hasta[0] * 100 + hasta[1]) if hasta else 999912),
+            ).fetchall()]
+        partes = [pd.read_parquet(self.raiz / a, columns=columnas) for a in archivos if (self.raiz / a).exists()]
+        if not partes:
+            return pd.DataFrame(columns=columnas or [], dtype="string")
+        return pd.concat(partes, ignore_index=True).astype(object)   # como EspejoHoja.dataframe()
+
+
+# ---------------------------
+# Trabajo de archivo: hoja → Parquet → borrar de la hoja
+# ---------------------------
+@dataclass
+class ResultadoArchivo:
+    candidatos: int = 0          # cerrados con apertura anterior al corte
+    archivados: int = 0          # guardados en Parquet en esta corrida
+    borrados: int = 0            # filas quitadas de la hoja
+    omitidos: list[str] = field(default_factory=list)   # CODIGO que cambiaron de fila: quedan para la próxima
+
+
+def candidatos(filas: list[tuple[int, list[str]]], corte: datetime) -> list[tuple[int, list[str]]]:
+    """Filas "Cerrado" con CODIGO y apertura (parseable) anterior a `corte`."""
+    out = []
+    for n, f in filas:
+        if len(f) <= COL_ESTADO or not f[0].strip() or f[COL_ESTADO].strip().lower() != "cerrado":
+            continue
+        try:
+            ap = datetime.strptime(f[COL_APERTURA].strip(), FORMATO_FECHA).replace(tzinfo=TZ)
+        except ValueError:
+            continue
+        if ap < corte:
+            out.append((n, f))
+    return out
+
+
+def tramos(numeros: Iterable[int]) -> list[tuple[int, int]]:
+    """Números de fila → tramos contiguos [(inicio, fin)], de abajo hacia arriba."""
+    out: list[list[int]] = []
+    for n in sorted(set(numeros)):
+        if out and n == out[-1][1] + 1:
+            out[-1][1] = n
+        else:
+            out.append([n, n])
+    return [(a, b) for a, b in reversed(out)]
+
+
+def archivar(hoja: "ClienteHoja", espejo: "EspejoHoja", archivo: ArchivoIncidentes, edad_dias: float,
+             ahora: Optional[datetime] = None, borrar: bool = True) -> ResultadoArchivo:
+    """
+    Mueve a `archivo` los incidentes "Cerrado" abiertos hace más de `edad_dias` días.
+
+    1. Copia completa de la hoja (números de fila actuales).
+    2. Parquet + índice (idempotente: si se corta después, la próxima corrida no duplica).
+    3. Antes de borrar, relee la columna CODIGO de cada tramo (rangos acotados): si alguien
+       movió filas mientras tanto, ese tramo se omite.
+    4. Borra los tramos en un solo batch_update, de abajo hacia arriba, y resincroniza la copia.
+    """
+    corte = (ahora or datetime.now(TZ)) - timedelta(days=edad_dias)
+    espejo.sincronizar(completa=True)
+    sel = candidatos(espejo.filas_desde(1), corte)
+    res = ResultadoArchivo(candidatos=len(sel))
+    if not sel:
+        return res
+    encabezado = espejo.encabezado()
+    ancho = len(encabezado)
+    res.archivados = archivo.guardar(encabezado, [list(f[:ancho]) + [""] * (ancho - len(f)) for _, f in sel])
+    if not borrar:
+        return res
+
+    esperado = {n: f[0] for n, f in sel}
+    por_borrar = tramos(esperado)
+    actuales = hoja.batch_get([f"A{a}:A{b}" for a, b in por_borrar])
+    confirmados = []
+    for (a, b), valores in zip(por_borrar, actuales):
+        codigos = [(v[0] if v else "") for v in valores] + [""] * (b - a + 1 - len(valores))
+        if codigos == [esperado[n] for n in range(a, b + 1)]:
+            confirmados.append((a, b))
+        else:
+            res.omitidos += [esperado[n] for n in range(a, b + 1)]
+    # Solo se borra lo que quedó en el índice (guardar() pudo saltar filas ya archivadas: también valen)
+    archivados = archivo.contiene(esperado[n] for a, b in confirmados for n in range(a, b + 1))
+    confirmados = [(a, b) for a, b in confirmados if all(esperado[n] in archivados for n in range(a, b + 1))]
+    if confirmados:
+        hoja.eliminar_filas(confirmados)
+        res.borrados = sum(b - a + 1 for a, b in confirmados)
+        espejo.sincronizar(completa=True)
+    return res
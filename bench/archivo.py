@@ -0,0 +1,139 @@
+# ---------------------------
+# Archivo de cerrados contra la hoja falsa: filas que salen, llamadas a la API y consultas al histórico
+#
+#   python -m bench.archivo                       # escenario + chequeos
+#   python -m bench.archivo --filas 20000 --edad-dias 90 --fallar
+# ---------------------------
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from archivo import COL_APERTURA, COL_ESTADO, ArchivoIncidentes, archivar
+from bench.hoja import ENCABEZADO, filas_sinteticas
+from bench.hoja_falsa import ServidorHojaFalso
+from codigos import CodigoAllocator
+from espejo import EspejoHoja
+from hoja import ClienteHoja
+from procesamiento import TZ
+
+AHORA = datetime(2025, 9, 5, 10, 0, tzinfo=TZ)
+
+
+def hoja_con_historia(n: int, anios: float, seed: int, desde: int = 0) -> list[list[str]]:
+    """Filas sintéticas con apertura repartida en los últimos `anios` años, en orden de llegada."""
+    rnd = random.Random(seed)
+    filas = filas_sinteticas(n, desde)
+    paso = timedelta(days=365 * anios) / max(n, 1)
+    for i, f in enumerate(filas):
+        f[COL_APERTURA] = (AHORA - timedelta(days=365 * anios) + paso * i).strftime("%Y-%m-%d %H:%M")
+        f[COL_ESTADO] = "Cerrado" if rnd.random() < 0.85 else "En investigación"
+    return filas
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="archivar() + ArchivoIncidentes contra una hoja falsa en memoria.")
+    ap.add_argument("--filas", type=int, default=10000)
+    ap.add_argument("--anios", type=float, default=3.0, help="antigüedad de la fila más vieja")
+    ap.add_argument("--edad-dias", type=float, default=180)
+    ap.add_argument("--seed", type=int, default=5)
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si algún chequeo falla (para CI)")
+    args = ap.parse_args(argv)
+
+    tmp = Path(tempfile.mkdtemp())
+    filas = hoja_con_historia(args.filas, args.anios, args.seed)
+    srv = ServidorHojaFalso(filas=[ENCABEZADO] + [list(f) for f in filas])
+    cliente = ClienteHoja(srv.conectar)
+    espejo = EspejoHoja(leer=cliente.leer, db=str(tmp / "espejo.sqlite3"))
+    archivo = ArchivoIncidentes(raiz=tmp / "archivo", db=str(tmp / "archivo.sqlite3"))
+    corte = AHORA - timedelta(days=args.edad_dias)
+    esperados = {f[0] for f in filas
+                 if f[COL_ESTADO] == "Cerrado" and datetime.strptime(f[COL_APERTURA], "%Y-%m-%d %H:%M").replace(tzinfo=TZ) < corte}
+
+    chequeos: list[tuple[str, bool]] = []
+    llamadas = dict(srv.llamadas)
+    t0 = time.perf_counter()
+    res = archivar(cliente, espejo, archivo, args.edad_dias, ahora=AHORA)
+    ms = (time.perf_counter() - t0) * 1e3
+    nuevas = {k: v - llamadas.get(k, 0) for k, v in srv.llamadas.items() if v != llamadas.get(k, 0)}
+    print(f"archivar: {res.candidatos:,} candidatos · {res.archivados:,} a Parquet · {res.borrados:,} filas borradas "
+          f"en {ms:,.0f} ms · llamadas {nuevas}")
+    print(f"hoja: {args.filas:,} → {len(srv.filas) - 1:,} filas · archivo: {len(archivo.particiones())} meses, "
+          f"{sum(p.stat().st_size for p in (tmp / 'archivo').rglob('*.parquet')) / 1e6:.2f} MB")
+    chequeos.append(("se archivan exactamente los cerrados viejos", set(archivo.codigos()) == esperados))
+    chequeos.append(("la hoja conserva el resto, en orden",
+                     [f[0] for f in srv.filas[1:]] == [f[0] for f in filas if f[0] not in esperados]))
+    chequeos.append(("la copia local queda igual a la hoja", espejo.codigos() == [f[0] for f in srv.filas[1:]]))
+    chequeos.append(("un solo batch_update de borrado", nuevas.get("batch_update") == 1))
+    chequeos.append(("ninguna fila archivada queda abierta o reciente",
+                     all(f[COL_ESTADO] == "Cerrado" and f[COL_APERTURA] < corte.strftime("%Y-%m-%d %H:%M")
+                         for f in archivo.dataframe().values.tolist())))
+
+    otra = archivar(cliente, espejo, archivo, args.edad_dias, ahora=AHORA)
+    chequeos.append(("segunda corrida: nada que hacer", otra.candidatos == 0 and len(archivo) == len(esperados)))
+
+    # Alguien inserta una fila arriba entre la copia y el borrado: todo se corre, nada se borra
+    viejas = hoja_con_historia(20, args.anios, args.seed + 1, desde=args.filas)
+    srv.filas[1:1] = [list(f) for f in viejas]
+    leer_api = cliente.batch_get
+
+    def batch_get_con_insercion(rangos):
+        if all(r.startswith("A") and ":A" in r for r in rangos):   # la verificación de CODIGO
+            insertada = ["INC-INSERTADA"] + filas[0][1:]
+            insertada[COL_ESTADO] = "En investigación"
+            srv.filas.insert(1, insertada)
+            cliente.batch_get = leer_api
+        return leer_api(rangos)
+
+    cliente.batch_get = batch_get_con_insercion
+    movida = archivar(cliente, espejo, archivo, args.edad_dias, ahora=AHORA)
+    chequeos.append(("fila insertada: los tramos corridos se omiten",
+                     movida.borrados == 0 and len(movida.omitidos) == movida.candidatos > 0
+                     and all(f in srv.filas for f in viejas)))
+    repetida = archivar(cliente, espejo, archivo, args.edad_dias, ahora=AHORA)
+    chequeos.append(("la corrida siguiente los quita sin duplicar el archivo",
+                     repetida.borrados == movida.candidatos and repetida.archivados == 0
+                     and not set(movida.omitidos) & {f[0] for f in srv.filas}))
+
+    # Unicidad de CODIGO: el allocator sembrado con hoja + archivo no repite códigos archivados
+    t0 = time.perf_counter()
+    alloc = CodigoAllocator(db=str(tmp / "codigos.sqlite3"))
+    sembrados = alloc.ponerse_al_dia(espejo, archivo)
+    nuevos = [alloc.reservar(int(c.split("-")[1]), int(c.split("-")[2]))[0] for c in list(esperados)[:200]]
+    print(f"unicidad: {sembrados:,} CODIGO (hoja + índice) en {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    chequeos.append(("CODIGO nuevos no chocan con el archivo", not set(nuevos) & (set(archivo.codigos()) | set(espejo.codigos()))))
+
+    # Otra instancia (su propio allocator) escribe filas con los próximos códigos del mismo día:
+    # después de sembrar solo se leen las nuevas, y no se repiten
+    otra = CodigoAllocator(db=str(tmp / "codigos_otra.sqlite3"))
+    otra.ponerse_al_dia(espejo, archivo)
+    ajenas = filas_sinteticas(5, args.filas)
+    for f, c in zip(ajenas, otra.reservar(5, 9, len(ajenas))):
+        f[0] = c
+    cliente.append_rows(ajenas)
+    espejo.sincronizar()
+    t0 = time.perf_counter()
+    leidos = alloc.ponerse_al_dia(espejo, archivo)
+    print(f"al día: {leidos} CODIGO nuevos en {(time.perf_counter() - t0) * 1e3:.2f} ms")
+    repetidos = alloc.reservar(5, 9, len(ajenas))
+    chequeos.append(("al día: solo las filas nuevas, sin repetir sus CODIGO",
+                     leidos == len(ajenas) and not {f[0] for f in ajenas} & set(repetidos)
+                     and alloc.ponerse_al_dia(espejo, archivo) == 0))
+
+    t0 = time.perf_counter()
+    anio = (AHORA - timedelta(days=365)).year
+    df = archivo.dataframe(desde=(anio, 1), hasta=(anio, 12), columnas=["CODIGO", "Fecha y Hora de Apertura"])
+    print(f"consulta {anio}: {len(df):,} incidentes archivados en {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    chequeos.append((f"consulta por año: solo {anio}", len(df) > 0 and df["Fecha y Hora de Apertura"].str.startswith(str(anio)).all()))
+
+    print()
+    for nombre, ok in chequeos:
+        print(f"  {'ok ' if ok else 'MAL'}  {nombre}")
+    return 1 if args.fallar and not all(ok for _, ok in chequeos) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
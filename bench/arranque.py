@@ -0,0 +1,108 @@
+# ---------------------------
+# Presupuesto de arranque en frío: tiempos de importación (-X importtime) en un proceso nuevo
+#
+#   python -m bench.arranque                      # tabla por módulo + los imports más pesados
+#   python -m bench.arranque --fallar             # exit 1 si se pasa el presupuesto o se carga un módulo pesado
+# ---------------------------
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+# Módulos del repo que repository.py importa antes de dibujar la página
+MODULOS_ARRANQUE = (
+    "archivo", "busqueda", "cache_llm", "casete", "codigos", "cola_hoja", "duplicados", "hoja", "llm",
+    "masivo", "procesamiento", "recursos", "temporal", "via_rapida",
+)
+# No deben cargarse al arrancar (se importan en el primer uso)
+PESADOS = ("pandas", "numpy", "pyarrow", "gspread", "vertexai", "google.auth", "google.oauth2", "http.server")
+PRESUPUESTO_MS = 150.0
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def medir(modulos: list[str]) -> tuple[dict[str, tuple[float, float, int]], str]:
+    """
+    Importa `modulos` en un intérprete nuevo con -X importtime.
+    Retorna ({módulo: (propio_ms, acumulado_ms, nivel)}, error); error = stderr si el import falló.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modulos)}"],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    tiempos: dict[str, tuple[float, float, int]] = {}
+    otras: list[str] = []
+    for linea in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(linea)
+        if m:
+            propio, acumulado, sangria, nombre = m.groups()
+            tiempos[nombre] = (int(propio) / 1e3, int(acumulado) / 1e3, len(sangria) // 2)
+        elif not linea.startswith("import time:"):
+            otras.append(linea)
+    return tiempos, ("\n".join(otras) if proc.returncode else "")
+
+
+def mejor_de(modulos: list[str], rondas: int) -> tuple[dict[str, tuple[float, float, int]], str]:
+    """La ronda más rápida (el ruido del sistema solo suma tiempo)."""
+    mejor, error = None, ""
+    for _ in range(rondas):
+        tiempos, error = medir(modulos)
+        if error:
+            return tiempos, error
+        total = sum(tiempos[m][1] for m in modulos if m in tiempos)
+        if mejor is None or total < mejor[0]:
+            mejor = (total, tiempos)
+    return mejor[1], ""
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Tiempos de importación del arranque de la app.")
+    ap.add_argument("--modulos", nargs="+", default=list(MODULOS_ARRANQUE))
+    ap.add_argument("--presupuesto-ms", type=float, default=PRESUPUESTO_MS,
+                    help=f"máximo para importar todos los módulos juntos (default {PRESUPUESTO_MS:g})")
+    ap.add_argument("--rondas", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10, help="imports más pesados a listar")
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si hay violaciones (para CI)")
+    args = ap.parse_args(argv)
+
+    # Un proceso por módulo (costo aislado) y uno con todos (lo que paga la app al arrancar)
+    print(f"{'módulo':<16} {'acum. ms':>9}")
+    disponibles = []
+    for mod in args.modulos:
+        tiempos, error = mejor_de([mod], args.rondas)
+        if error:
+            # p. ej. recursos necesita streamlit: se informa y se excluye del total
+            print(f"{mod:<16} {'—':>9}   no se pudo importar: {error.strip().splitlines()[-1]}")
+            continue
+        disponibles.append(mod)
+        print(f"{mod:<16} {tiempos[mod][1]:>9.1f}")
+
+    tiempos, error = mejor_de(disponibles, args.rondas)
+    if error:
+        print(error, file=sys.stderr)
+        return 2
+    total = sum(tiempos[m][1] for m in disponibles if tiempos[m][2] == 0)
+    print(f"\nTotal ({len(disponibles)} módulos, un proceso): {total:.1f} ms  (presupuesto {args.presupuesto_ms:g} ms)")
+
+    print("\nImports más pesados (tiempo propio):")
+    for nombre, (propio, acumulado, _) in sorted(tiempos.items(), key=lambda x: -x[1][0])[:args.top]:
+        print(f"  {nombre:<40} {propio:>8.1f} ms   (acum. {acumulado:.1f})")
+
+    violaciones = []
+    if total > args.presupuesto_ms:
+        violaciones.append(f"arranque {total:.1f} ms > presupuesto {args.presupuesto_ms:g} ms")
+    cargados = sorted({p for p in PESADOS for n in tiempos if n == p or n.startswith(p + ".")})
+    if cargados:
+        violaciones.append("módulos pesados cargados al arrancar: " + ", ".join(cargados))
+    if violaciones:
+        print("\nFuera de presupuesto:")
+        for v in violaciones:
+            print("  " + v)
+        return 1 if args.fallar else 0
+    print("\nDentro del presupuesto; ningún módulo pesado se carga al arrancar.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
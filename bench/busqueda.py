@@ -0,0 +1,137 @@
+# ---------------------------
+# Índice de búsqueda (FTS5) sobre años de incidentes: construcción, actualización incremental y latencia
+#
+#   python -m bench.busqueda                      # 50.000 incidentes en 5 años + chequeos
+#   python -m bench.busqueda --filas 200000 --anios 8 --fallar
+# ---------------------------
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from archivo import ArchivoIncidentes, archivar
+from bench.archivo import AHORA, hoja_con_historia
+from bench.hoja import ENCABEZADO
+from bench.hoja_falsa import ServidorHojaFalso
+from busqueda import CAMPOS, COL_APERTURA, COL_CLASIFICACION, COL_IMPACTO, PALABRAS_VACIAS, IndiceBusqueda
+from duplicados import normalizar
+from espejo import EspejoHoja
+from hoja import ClienteHoja
+
+# (consulta, filtros)
+CONSULTAS = [
+    ("caida del servicio", {}),
+    ("CAÍDA servicio", {}),
+    ('"base de datos"', {}),
+    ("firewall reglas", {"impacto": ["Alto"]}),
+    ("malware", {"clasificacion": ["No disponibilidad de recursos"], "desde": "2023-01-01", "hasta": "2023-12-31"}),
+    ("contraseña -vpn", {}),
+    ("correo OR vpn", {}),
+    ("escan*", {}),
+    ("sistema:erp acceso", {}),
+    ("", {"impacto": ["Medio"], "desde": "2024-03-01", "hasta": "2024-03-31"}),
+]
+PRESUPUESTO_MS = 50.0   # p99 por consulta
+
+
+def _percentil(orden: list[float], q: float) -> float:
+    return orden[min(len(orden) - 1, int(q * len(orden)))]
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="IndiceBusqueda sobre una hoja falsa + archivo Parquet.")
+    ap.add_argument("--filas", type=int, default=50000)
+    ap.add_argument("--anios", type=float, default=5.0)
+    ap.add_argument("--edad-dias", type=float, default=365, help="los cerrados más viejos pasan al archivo")
+    ap.add_argument("--repeticiones", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=5)
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si algún chequeo falla (para CI)")
+    args = ap.parse_args(argv)
+
+    tmp = Path(tempfile.mkdtemp())
+    filas = hoja_con_historia(args.filas, args.anios, args.seed)
+    srv = ServidorHojaFalso(filas=[ENCABEZADO] + [list(f) for f in filas])
+    cliente = ClienteHoja(srv.conectar)
+    espejo = EspejoHoja(leer=cliente.leer, db=str(tmp / "espejo.sqlite3"))
+    archivo = ArchivoIncidentes(raiz=tmp / "archivo", db=str(tmp / "archivo.sqlite3"))
+    archivar(cliente, espejo, archivo, args.edad_dias, ahora=AHORA)
+    print(f"{args.filas:,} incidentes: {len(srv.filas) - 1:,} en la hoja, {len(archivo):,} archivados")
+
+    chequeos: list[tuple[str, bool]] = []
+    indice = IndiceBusqueda(db=str(tmp / "busqueda.sqlite3"))
+    t0 = time.perf_counter()
+    n = indice.sincronizar(espejo, archivo)
+    print(f"construcción: {n:,} filas en {time.perf_counter() - t0:.2f} s "
+          f"({(tmp / 'busqueda.sqlite3').stat().st_size / 1e6:.1f} MB)")
+    chequeos.append(("se indexan hoja + archivo", len(indice) == args.filas))
+
+    t0 = time.perf_counter()
+    chequeos.append(("sin cambios: nada que hacer", indice.sincronizar(espejo, archivo) == 0))
+    print(f"sin cambios: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    nuevas = hoja_con_historia(200, 0.01, args.seed + 1, desde=args.filas)
+    nuevas[-1][4] = "Ransomware cifró el servidor de planillas"
+    cliente.append_rows(nuevas)
+    espejo.sincronizar()
+    t0 = time.perf_counter()
+    n = indice.sincronizar(espejo, archivo)
+    print(f"incremental: {n} filas nuevas en {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    chequeos.append(("incremental: solo las filas nuevas", n == 200))
+    chequeos.append(("incremental: buscables al instante",
+                     [r.codigo for r in indice.buscar("ransomware planillas")] == [nuevas[-1][0]]))
+
+    # Referencia: "Ctrl-F" (todas las palabras, sin tildes) sobre las filas, en Python
+    todas = filas + nuevas
+
+    def ctrl_f(consulta: str) -> set[str]:
+        palabras = [p for p in normalizar(consulta).split() if p not in PALABRAS_VACIAS]
+        return {f[0] for f in todas
+                if all(p in normalizar(" ".join(f[i] for i in CAMPOS.values())).split() for p in palabras)}
+
+    for consulta in ("caida servicio", "CAÍDA del Servicio", "contrasena"):
+        esperados = ctrl_f(consulta)
+        hallados = {r.codigo for r in indice.buscar(consulta, limite=len(todas))}
+        chequeos.append((f"sin tildes ni mayúsculas: {consulta!r} ({len(esperados):,})", hallados == esperados))
+
+    desde, hasta = "2023-01-01", "2023-06-30"
+    r = indice.buscar("acceso", impacto=["Alto"], desde=desde, hasta=hasta, limite=len(todas))
+    chequeos.append(("filtros: impacto y rango de apertura",
+                     bool(r) and all(x.impacto == "Alto" and desde <= x.apertura[:10] <= hasta for x in r)))
+    chequeos.append(("los archivados se encuentran (origen archivo)",
+                     any(x.origen == "archivo" for x in indice.buscar("servicio", hasta="2021-12-31", limite=5))))
+    por_fila = {f[0]: f for f in todas}
+    chequeos.append(("los datos indexados son los de la hoja", all(
+        (x.apertura, x.clasificacion, x.impacto) == (por_fila[x.codigo][COL_APERTURA], por_fila[x.codigo][COL_CLASIFICACION],
+                                                     por_fila[x.codigo][COL_IMPACTO])
+        for x in indice.buscar("firewall", limite=500))))
+
+    print(f"\n{'consulta':<28} {'filtros':<34} {'result.':>7} {'p50 ms':>7} {'p99 ms':>7}")
+    peores = []
+    for consulta, filtros in CONSULTAS:
+        tiempos = []
+        for _ in range(args.repeticiones):
+            t0 = time.perf_counter()
+            res = indice.buscar(consulta, **filtros)
+            tiempos.append((time.perf_counter() - t0) * 1e3)
+        tiempos.sort()
+        peores.append(_percentil(tiempos, .99))
+        print(f"{consulta or '(sin texto)':<28} {', '.join(f'{k}={v}' for k, v in filtros.items())[:34]:<34} "
+              f"{len(res):>7} {statistics.median(tiempos):>7.2f} {peores[-1]:>7.2f}")
+    chequeos.append((f"p99 < {PRESUPUESTO_MS:.0f} ms en todas las consultas", max(peores) < PRESUPUESTO_MS))
+
+    t0 = time.perf_counter()
+    ctrl_f("caida servicio")
+    print(f"\nreferencia Ctrl-F en Python sobre {len(todas):,} filas: {(time.perf_counter() - t0) * 1e3:,.0f} ms")
+    print(f"(corte del archivo: {datetime.strftime(AHORA, '%Y-%m-%d')} − {args.edad_dias:g} días)")
+
+    print()
+    for nombre, ok in chequeos:
+        print(f"  {'ok ' if ok else 'MAL'}  {nombre}")
+    return 1 if args.fallar and not all(ok for _, ok in chequeos) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# ---------------------------
+# Pipeline de Reportar sin red: texto crudo → fila_con_ts → hoja, contra un casete
+#
+#   python -m bench.casete --grabar               # graba un casete (modelo stub + hoja falsa)
+#   python -m bench.casete                        # reproduce: filas/s y diferencias con lo grabado
+#   python -m bench.casete --casete ruta.jsonl --latencia-llm-ms 300 --fallar
+# ---------------------------
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from almacen import ruta_datos
+from bench.corpus import TAMANOS, ModeloStub, generar_corpus
+from bench.hoja import ENCABEZADO, filas_sinteticas
+from bench.hoja_falsa import ServidorHojaFalso
+from casete import Casete, HojaGrabada, ModeloGrabado
+from codigos import CodigoAllocator
+from espejo import EspejoHoja
+from hoja import ClienteHoja
+from llm import LLMClient
+from procesamiento import TZ, ContextoReporte, persona, procesar_respuesta
+from via_rapida import UMBRAL, extraer
+
+GEN_CONFIG = {"temperature": 0.2}   # el de repository.py (modo "pipes")
+TAM_LOTE = 200                      # filas por append_rows, como la cola de escritura
+
+
+def dia_mes(fecha_apertura: str) -> tuple[int, int]:
+    try:
+        dt = datetime.strptime(fecha_apertura.strip(), "%Y-%m-%d %H:%M")
+    except ValueError:
+        dt = datetime.now(TZ)
+    return dt.day, dt.month
+
+
+def reportar(texto: str, llm: LLMClient, alloc: CodigoAllocator) -> list[str]:
+    """Pasos 1–8 de Reportar (repository.py) sin la UI: vía rápida o modelo, fila, CODIGO y hora."""
+    ctx = ContextoReporte(texto)
+    ext = extraer(texto, ctx)
+    if ext.bajas(UMBRAL):
+        resp = llm.generate_content([texto.strip()], generation_config=GEN_CONFIG)
+        fila, _, _ = procesar_respuesta(texto, resp.text, ctx=ctx)
+    else:
+        fila = ext.fila
+    fila[0] = alloc.reservar(*dia_mes(fila[1]))[0]
+    return fila + [datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")]
+
+
+def correr(casete: Casete, textos: list[str], modelo_real=None, ws_real=None) -> tuple[list[float], float]:
+    """Siembra CODIGO desde la hoja, procesa los reportes y escribe en lotes. (latencias s, total s)"""
+    tmp = Path(tempfile.mkdtemp())
+    llm = LLMClient(ModeloGrabado(modelo_real, casete, "gemini-1.5-flash", persona),
+                    rate_per_min=10**7, burst=10**7)
+    cliente = ClienteHoja(lambda: HojaGrabada(ws_real, casete))
+    espejo = EspejoHoja(leer=cliente.leer, db=str(tmp / "espejo.sqlite3"))
+    alloc = CodigoAllocator(db=str(tmp / "codigos.sqlite3"))
+
+    t0 = time.perf_counter()
+    espejo.sincronizar(completa=True)
+    alloc.sembrar(espejo.codigos())
+    latencias, lote = [], []
+    for texto in textos:
+        t = time.perf_counter()
+        lote.append(reportar(texto, llm, alloc))
+        latencias.append(time.perf_counter() - t)
+        if len(lote) >= TAM_LOTE:
+            cliente.append_rows(lote, value_input_option="USER_ENTERED")
+            lote = []
+    if lote:
+        cliente.append_rows(lote, value_input_option="USER_ENTERED")
+    return latencias, time.perf_counter() - t0
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Reportar de punta a punta contra un casete (sin Vertex ni Sheets).")
+    ap.add_argument("--casete", default=str(ruta_datos("bench_casete.jsonl")))
+    ap.add_argument("--grabar", action="store_true", help="graba de nuevo (modelo stub + hoja falsa)")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--tamano", choices=TAMANOS, default="medio",
+                    help="'corto' no trae fecha: la apertura depende del día de la corrida")
+    ap.add_argument("--filas-hoja", type=int, default=3000, help="filas existentes en la hoja al grabar")
+    ap.add_argument("--latencia-llm-ms", type=float, default=0.0)
+    ap.add_argument("--latencia-hoja-ms", type=float, default=0.0)
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si la reproducción difiere de lo grabado")
+    args = ap.parse_args(argv)
+
+    textos = [r.texto for r in generar_corpus(args.n, args.tamano)]
+    ruta = Path(args.casete)
+    if args.grabar or not ruta.exists():
+        ruta.unlink(missing_ok=True)
+        srv = ServidorHojaFalso(filas=[ENCABEZADO] + filas_sinteticas(args.filas_hoja))
+        casete = Casete(ruta, "grabar")
+        _, total = correr(casete, textos, modelo_real=ModeloStub(generar_corpus(args.n, args.tamano)),
+                          ws_real=srv.conectar())
+        print(f"grabado {ruta} ({len(casete)} interacciones, {ruta.stat().st_size / 1e6:.1f} MB) en {total:.1f} s")
+
+    casete = Casete(ruta, "reproducir", latencia_llm=args.latencia_llm_ms / 1e3,
+                    latencia_hoja=args.latencia_hoja_ms / 1e3)
+    latencias, total = correr(casete, textos)
+    orden = sorted(latencias)
+    print(f"reproducido: {len(textos)} reportes en {total:.2f} s → {len(textos) / total:,.0f} reportes/s "
+          f"(p50 {statistics.median(orden) * 1e3:.2f} ms, p99 {orden[int(0.99 * (len(orden) - 1))] * 1e3:.2f} ms)")
+    # Mismo corpus y secuencias locales nuevas: solo "Hora de reporte" depende del reloj
+    diferencias = casete.diferencias(ignorar=(len(ENCABEZADO) - 1,))
+    if diferencias:
+        print(f"{len(diferencias)} diferencias con lo grabado:")
+        for d in diferencias[:20]:
+            print("  " + d)
+    else:
+        print(f"{len(casete.escrituras)} filas escritas, idénticas a las grabadas")
+    return 1 if args.fallar and diferencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# ---------------------------
+# Cobertura (hedging) del LLM con modelos falsos: latencia de cola y pedidos extra
+#
+#   python -m bench.cobertura                     # primario con cola lenta vs. cubierto
+#   python -m bench.cobertura --p-lento 0.2 --max-fraccion 0.05 --pedidos 300
+# ---------------------------
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.corpus import generar_corpus, respuesta_enlatada
+from llm import LLMClient, LLMCubierto, ModeloFalso, latencia_con_cola, latencia_lognormal
+from procesamiento import respuesta_completa
+
+
+def _percentil(orden: list[float], q: float) -> float:
+    return orden[min(len(orden) - 1, int(q * len(orden)))]
+
+
+def correr(cliente, textos: list[str], concurrencia: int) -> list[float]:
+    def uno(t: str) -> float:
+        t0 = time.perf_counter()
+        cliente.generate_content([t])
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        return sorted(pool.map(uno, textos))
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="LLMCubierto vs. un solo modelo, con latencias simuladas.")
+    ap.add_argument("--pedidos", type=int, default=200)
+    ap.add_argument("--concurrencia", type=int, default=8)
+    ap.add_argument("--base-ms", type=float, nargs=2, default=[40, 120], help="latencia normal del primario")
+    ap.add_argument("--p-lento", type=float, default=0.08, help="fracción de respuestas lentas del primario")
+    ap.add_argument("--lento-ms", type=float, nargs=2, default=[800, 1500])
+    ap.add_argument("--respaldo-ms", type=float, default=90, help="mediana del respaldo (lognormal)")
+    ap.add_argument("--invalidas", type=float, default=0.0, help="fracción de respuestas incompletas del primario")
+    ap.add_argument("--percentil", type=float, default=0.9)
+    ap.add_argument("--max-fraccion", type=float, default=0.15)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    corpus = generar_corpus(args.pedidos, "medio", args.seed)
+    respuestas = {r.texto: respuesta_enlatada(r) for r in corpus}
+    textos = list(respuestas)
+    cortes = iter(range(10**9))
+
+    def resp_primario(contents) -> str:
+        t = contents[-1]
+        # Cada tanto el primario corta la fila (p. ej. por max_output_tokens)
+        if args.invalidas and next(cortes) % round(1 / args.invalidas) == 0:
+            return respuestas[t].split("|", 5)[0]
+        return respuestas[t]
+
+    def primario(seed: int) -> ModeloFalso:
+        return ModeloFalso(
+            respuesta=resp_primario, seed=seed,
+            latencia_s=latencia_con_cola(
+                (args.base_ms[0] / 1e3, args.base_ms[1] / 1e3), args.p_lento,
+                (args.lento_ms[0] / 1e3, args.lento_ms[1] / 1e3),
+            ),
+        )
+
+    respaldo = ModeloFalso(respuesta=lambda c: respuestas[c[-1]], seed=args.seed + 1,
+                           latencia_s=latencia_lognormal(args.respaldo_ms / 1e3, 0.3))
+
+    solo = LLMClient(primario(args.seed), rate_per_min=10**6, burst=10**6, max_workers=64)
+    m_prim = primario(args.seed)
+    cubierto = LLMCubierto(
+        LLMClient(m_prim, rate_per_min=10**6, burst=10**6, max_workers=64),
+        LLMClient(respaldo, rate_per_min=10**6, burst=10**6, max_workers=64),
+        valida=lambda r: respuesta_completa(r.text),
+        percentil=args.percentil, max_fraccion=args.max_fraccion,
+        plazo_inicial_s=args.base_ms[1] / 1e3, plazo_min_s=0.01, min_muestras=20,
+    )
+
+    print(f"{'':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'llamadas':>9} {'extra':>6}")
+    for nombre, cliente, modelos in (("primario", solo, [solo.model]), ("cubierto", cubierto, [m_prim, respaldo])):
+        lat = correr(cliente, textos, args.concurrencia)
+        llamadas = sum(m.llamadas for m in modelos)
+        print(f"{nombre:<12} {_percentil(lat, .5) * 1e3:>8.0f} {_percentil(lat, .95) * 1e3:>8.0f} "
+              f"{_percentil(lat, .99) * 1e3:>8.0f} {lat[-1] * 1e3:>8.0f} {llamadas:>9} "
+              f"{(llamadas - len(textos)) / len(textos):>6.0%}")
+    print(f"\nplazo final: {cubierto.plazo_s() * 1e3:.0f} ms · media primario "
+          f"{statistics.mean(m_prim.latencia_s(m_prim._rnd) for _ in range(1000)) * 1e3:.0f} ms")
+    print("cobertura: " + " · ".join(f"{k}: {v}" for k, v in sorted(cubierto.conteos.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
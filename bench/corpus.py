@@ -0,0 +1,153 @@
+# ---------------------------
+# Corpus sintético y anonimizado de reportes + modelo stub con respuestas enlatadas
+# ---------------------------
+import json
+import random
+from dataclasses import dataclass
+
+from procesamiento import COLUMNAS
+
+SISTEMAS = ["Correo", "VPN", "Active Directory", "Firewall", "ERP", "Portal Web", "Base de Datos", "Antivirus"]
+AREAS = ["Contabilidad", "Recursos Humanos", "Finanzas", "Tesorería", "Auditoría Interna", "Legal", "Operaciones"]
+CIUDADES = ["La Paz", "El Alto", "Santa Cruz", "Cochabamba", "Sucre", "Tarija", "Oruro", "Potosí"]
+MODOS = [("por correo", "Correo"), ("mediante ticket de Jira", "Jira"), ("por llamada telefónica", "Teléfono"),
+         ("por alerta de monitoreo", "Monitoreo"), ("por WhatsApp", "WhatsApp")]
+GTIC = [("Seguridad Informática", "DSEC - Seguridad"), ("Infraestructura", "DITC - Infraestructura"),
+        ("Mesa de Ayuda de Soporte", "DSTC - Soporte Técnico"), ("Sistemas", "DISC - Sistemas")]
+ACCIONES = ["reinició el equipo", "verificó conectividad con ping", "bloqueó la cuenta del usuario",
+            "aisló el equipo de la red", "forzó el cambio de contraseña"]
+SOLUCIONES = ["desbloqueo de la cuenta en AD", "limpieza de malware con el antivirus",
+              "ajuste de reglas en el firewall", "creación de excepción en la allowlist",
+              "reconfiguración de la política de acceso", "reinicio del servicio en el servidor"]
+PROBLEMAS = ["no puede acceder", "reporta lentitud extrema", "detecta acceso no autorizado",
+             "observa una caída del servicio", "recibe un escaneo de puertos desde una IP externa",
+             "reporta uso indebido de recursos"]
+# Nombres ficticios (corpus anonimizado)
+ENCARGADOS = ["Ana Quispe", "Luis Mamani", "Carla Rojas", "Jorge Flores", "Rosa Vargas", "Mario Choque"]
+
+LOG_LINEAS = [
+    "{h} fw01 kernel: DROP IN=eth0 SRC=10.{a}.{b}.{c} DST=172.16.{a}.{b} PROTO=TCP DPT=443",
+    "{h} vpn-gw sshd[{c}]: Failed password for invalid user admin from 192.168.{a}.{b} port 22",
+    "{h} mail01 postfix/smtp[{c}]: connect to mx.example.org: Connection timed out",
+    "{h} dc01 Security-Auditing 4625: An account failed to log on. Account: usr{a}{b}",
+]
+
+TAMANOS = ("corto", "medio", "largo")
+
+
+@dataclass
+class Reporte:
+    texto: str
+    esperado: dict        # valores "verdaderos" usados por el stub para armar la respuesta
+    tamano: str
+
+
+def _hora(rnd: random.Random) -> tuple[str, int, int]:
+    h, m = rnd.randint(1, 11), rnd.choice([0, 5, 15, 30, 45])
+    ampm = rnd.choice(["am", "pm"])
+    return f"{h}:{m:02d}{ampm}", h + (12 if ampm == "pm" else 0), m
+
+
+def generar_reporte(rnd: random.Random, tamano: str = "medio") -> Reporte:
+    sistema, area, ciudad = rnd.choice(SISTEMAS), rnd.choice(AREAS), rnd.choice(CIUDADES)
+    modo_txt, modo = rnd.choice(MODOS)
+    gtic_txt, gtic = rnd.choice(GTIC)
+    accion, solucion = rnd.choice(ACCIONES), rnd.choice(SOLUCIONES)
+    problema, encargado = rnd.choice(PROBLEMAS), rnd.choice(ENCARGADOS)
+    h_ini, hh, mm = _hora(rnd)
+    h_fin, _, _ = _hora(rnd)
+    dia, mes = rnd.randint(1, 28), rnd.randint(1, 12)
+
+    if tamano == "corto":
+        texto = f"{h_ini} {sistema} caído en {area}, reportado {modo_txt}. Se {accion}."
+    else:
+        texto = (
+            f"El {dia}/{mes}/2025 a las {h_ini} el área de {area} en la oficina {ciudad} {problema} "
+            f"al sistema de {sistema}; lo reportó {modo_txt}. Como acción inmediata el usuario {accion}. "
+            f"{gtic_txt} coordinó la atención y aplicó {solucion}. El encargado es {encargado}. "
+            f"A las {h_fin} el servicio quedó restablecido y se cerró el incidente."
+        )
+    if tamano == "largo":
+        # Logs pegados: varios KB de ruido técnico antes del cierre
+        lineas = [
+            rnd.choice(LOG_LINEAS).format(
+                h=f"{hh:02d}:{mm:02d}:{rnd.randint(0, 59):02d}",
+                a=rnd.randint(0, 254), b=rnd.randint(0, 254), c=rnd.randint(100, 9999),
+            )
+            for _ in range(rnd.randint(40, 80))
+        ]
+        texto = texto + "\nLogs adjuntos:\n" + "\n".join(lineas)
+
+    esperado = {c: "" for c in COLUMNAS}
+    esperado.update({
+        "Modo Reporte": modo, "Evento/ Incidente": "Incidente",
+        "Descripción Evento/ Incidente": f"{area} {problema} al sistema de {sistema}",
+        "Sistema": sistema, "Area": area, "Ubicación": f"{ciudad}, Bolivia",
+        "Impacto": rnd.choice(["Alto", "Medio", "Bajo"]),
+        "Clasificación": "No disponibilidad de recursos",
+        "Acción Inmediata": accion.capitalize(), "Solución": solucion.capitalize(),
+        "Area de GTIC - Coordinando": gtic, "Encargado SI": encargado, "Estado": "Cerrado",
+    })
+    return Reporte(texto=texto, esperado=esperado, tamano=tamano)
+
+
+def generar_corpus(n: int, tamano: str = "medio", seed: int = 42) -> list[Reporte]:
+    rnd = random.Random(f"{seed}-{tamano}")
+    return [generar_reporte(rnd, tamano) for _ in range(n)]
+
+
+# ---------------------------
+# Respuestas del modelo: bien formadas y con los defectos típicos de producción
+# ---------------------------
+DEFECTOS = ("ok", "fences", "pipes_extra", "faltan_campos", "corrida", "espaciada", "json", "texto_extra")
+
+
+def respuesta_enlatada(rep: Reporte, defecto: str = "ok") -> str:
+    vals = [rep.esperado[c] for c in COLUMNAS]
+    if defecto == "json":
+        return json.dumps(rep.esperado, ensure_ascii=False)
+    if defecto == "pipes_extra":
+        vals[4] = vals[4] + " | detalle adicional | otro detalle"
+    if defecto == "faltan_campos":
+        vals = vals[:14]
+    if defecto == "corrida":
+        # Impacto y Estado desplazados: el clásico corrimiento de columnas
+        vals[5], vals[8] = vals[8], vals[5]
+        vals[16], vals[6] = vals[6], vals[16]
+    sep = " | " if defecto == "espaciada" else "|"
+    linea = sep.join(vals)
+    if defecto == "fences":
+        return f"```text\n{linea}\n```"
+    if defecto == "texto_extra":
+        return f"Aquí está la fila solicitada:\n{linea}"
+    return linea
+
+
+class ModeloStub:
+    """
+    Modelo local sin red: devuelve la respuesta enlatada del reporte, con una fracción de
+    respuestas defectuosas. Misma interfaz que GenerativeModel.generate_content.
+    """
+
+    def __init__(self, corpus: list[Reporte], tasa_defectos: float = 0.3, seed: int = 7):
+        self._por_texto = {r.texto.strip(): r for r in corpus}
+        self._rnd = random.Random(seed)
+        self.tasa_defectos = tasa_defectos
+
+    def responder(self, texto: str, json_mode: bool = False) -> str:
+        rep = self._por_texto[texto.strip()]
+        if json_mode:
+            # Con response_schema la salida siempre es JSON válido
+            return respuesta_enlatada(rep, "json")
+        defecto = "ok"
+        if self._rnd.random() < self.tasa_defectos:
+            defecto = self._rnd.choice(DEFECTOS[1:])
+        return respuesta_enlatada(rep, defecto)
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        from llm import RespuestaFalsa
+        prompt = contents[-1] if isinstance(contents, list) else contents
+        # El reporte va al final del prompt (persona + texto)
+        texto = prompt.rsplit("[REPORTE DE ENTRADA]:", 1)[-1].strip()
+        json_mode = (generation_config or {}).get("response_mime_type") == "application/json"
+        return RespuestaFalsa(self.responder(texto, json_mode) if texto in self._por_texto else "")
@@ -0,0 +1,92 @@
+# ---------------------------
+# Casi-duplicados contra la historia de la hoja: un reporte reenviado después de un reinicio
+#
+#   python -m bench.duplicados                    # 2.000 reportes en la hoja + chequeos
+#   python -m bench.duplicados --reportes 10000 --fallar
+# ---------------------------
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.corpus import generar_corpus
+from bench.hoja import ENCABEZADO
+from bench.hoja_falsa import ServidorHojaFalso
+from cola_hoja import ColaHoja
+from duplicados import IndiceDuplicados, normalizar
+from espejo import EspejoHoja
+from hoja import ClienteHoja
+from procesamiento import COLUMNAS
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="IndiceDuplicados sobre la hoja falsa + textos del journal.")
+    ap.add_argument("--reportes", type=int, default=2000)
+    ap.add_argument("--muestra", type=int, default=200, help="reportes que se reenvían")
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si algún chequeo falla (para CI)")
+    args = ap.parse_args(argv)
+
+    tmp = Path(tempfile.mkdtemp())
+    srv = ServidorHojaFalso(filas=[ENCABEZADO])
+    cliente = ClienteHoja(srv.conectar)
+    espejo = EspejoHoja(leer=cliente.leer, db=str(tmp / "espejo.sqlite3"))
+
+    def nueva_cola() -> ColaHoja:
+        return ColaHoja(escribir=cliente.append_rows, codigos_en_hoja=espejo.codigos,
+                        db=str(tmp / "cola.sqlite3"), backoff_base_s=0.0)
+
+    # Reportar: la fila que va a la hoja es el resumen del modelo; el texto crudo queda en el journal
+    reportes = generar_corpus(args.reportes, "medio", seed=args.seed)
+    filas = [[f"INC-{(i % 28) + 1}-{(i % 12) + 1}-{i:03d}"] + [r.esperado[c] for c in COLUMNAS[1:]]
+             + ["2025-09-05 10:00"] for i, r in enumerate(reportes)]
+    cola = nueva_cola()
+    cola.encolar(filas, textos=[normalizar(r.texto) for r in reportes])
+    while cola.vaciar():
+        pass
+    espejo.sincronizar()
+    print(f"{len(srv.filas) - 1:,} reportes en la hoja")
+
+    # Reinicio: índice y cola nuevos; solo quedan la hoja (copia local) y el journal en disco
+    chequeos: list[tuple[str, bool]] = []
+    indice = IndiceDuplicados()
+    t0 = time.perf_counter()
+    n = indice.sincronizar(espejo, textos=nueva_cola().textos)
+    print(f"tras reiniciar: {n:,} filas indexadas en {(time.perf_counter() - t0) * 1e3:.0f} ms")
+    chequeos.append(("tras reiniciar: se indexa toda la hoja", n == len(filas)))
+
+    paso = max(1, len(reportes) // args.muestra)
+    muestra = list(range(0, len(reportes), paso))[:args.muestra]
+    tiempos, propios = [], 0
+    for i in muestra:
+        t0 = time.perf_counter()
+        dup = indice.buscar(reportes[i].texto)
+        tiempos.append((time.perf_counter() - t0) * 1e3)
+        propios += dup is not None and dup.codigo == filas[i][0]
+    print(f"reenviados: {propios}/{len(muestra)} coinciden con su fila (p50 {statistics.median(tiempos):.2f} ms)")
+    chequeos.append(("reenvío tras reiniciar: coincide con su fila", propios == len(muestra)))
+
+    # Reenvío con otra hora y una línea agregada: sigue siendo el mismo incidente
+    editados = sum(
+        (dup := indice.buscar(reportes[i].texto.replace("a las", "alrededor de las") + " Favor revisar.")) is not None
+        and dup.codigo == filas[i][0] for i in muestra)
+    print(f"reenviados con cambios menores: {editados}/{len(muestra)}")
+    chequeos.append(("reenvío con cambios menores: coincide con su fila", editados == len(muestra)))
+
+    # Referencia: sin los textos del journal solo queda el resumen de la hoja, que no se parece al reporte
+    solo_resumen = IndiceDuplicados()
+    solo_resumen.sincronizar(espejo)
+    resumen = sum((dup := solo_resumen.buscar(reportes[i].texto)) is not None and dup.codigo == filas[i][0]
+                  for i in muestra)
+    print(f"referencia, índice sobre el resumen de la hoja: {resumen}/{len(muestra)}")
+
+    print()
+    for nombre, ok in chequeos:
+        print(f"  {'ok ' if ok else 'MAL'}  {nombre}")
+    return 1 if args.fallar and not all(ok for _, ok in chequeos) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
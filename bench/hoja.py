@@ -0,0 +1,125 @@
+# ---------------------------
+# Cliente de la hoja contra el backend falso: llamadas a la API, rangos leídos y reconexión
+#
+#   python -m bench.hoja                          # escenarios + chequeos
+#   python -m bench.hoja --filas 20000 --fallar   # exit 1 si algún chequeo falla
+# ---------------------------
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.corpus import generar_corpus
+from bench.hoja_falsa import ErrorAPIFalso, ServidorHojaFalso
+from cola_hoja import ColaHoja
+from espejo import EspejoHoja
+from hoja import BLOQUE_FILAS, ClienteHoja
+from procesamiento import COLUMNAS
+
+ENCABEZADO = COLUMNAS + ["Hora de reporte"]
+
+
+def filas_sinteticas(n: int, desde: int = 0) -> list[list[str]]:
+    corpus = generar_corpus(min(n, 500), "corto", seed=7)
+    return [
+        [f"INC-{(i % 28) + 1}-{(i % 12) + 1}-{i:03d}"]
+        + [corpus[i % len(corpus)].esperado[c] for c in COLUMNAS[1:]]
+        + ["2025-09-05 10:00"]
+        for i in range(desde, desde + n)
+    ]
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="ClienteHoja + EspejoHoja contra una hoja falsa en memoria.")
+    ap.add_argument("--filas", type=int, default=5000)
+    ap.add_argument("--bloque", type=int, default=BLOQUE_FILAS)
+    ap.add_argument("--latencia-ms", type=float, default=0.0, help="demora simulada por llamada a la API")
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si algún chequeo falla (para CI)")
+    args = ap.parse_args(argv)
+
+    srv = ServidorHojaFalso(filas=[ENCABEZADO] + filas_sinteticas(args.filas), latencia_s=args.latencia_ms / 1e3)
+    cliente = ClienteHoja(srv.conectar, bloque_filas=args.bloque)
+    tmp = Path(tempfile.mkdtemp())
+    espejo = EspejoHoja(leer=cliente.leer, db=str(tmp / "espejo.sqlite3"))
+
+    chequeos: list[tuple[str, bool]] = []
+    print(f"{'escenario':<34} {'llamadas':>8} {'rangos':>7} {'celdas':>9} {'ms':>8}  rangos leídos")
+
+    def escenario(nombre: str, fn):
+        llamadas, rangos, celdas = sum(srv.llamadas.values()), len(srv.rangos_leidos), srv.celdas_leidas
+        t0 = time.perf_counter()
+        try:
+            fn()
+        finally:
+            ms = (time.perf_counter() - t0) * 1e3
+            nuevos = srv.rangos_leidos[rangos:]
+            muestra = ", ".join(nuevos[:3]) + (f", … (+{len(nuevos) - 3})" if len(nuevos) > 3 else "")
+            print(f"{nombre:<34} {sum(srv.llamadas.values()) - llamadas:>8} {len(nuevos):>7} "
+                  f"{srv.celdas_leidas - celdas:>9,} {ms:>8.1f}  {muestra}")
+
+    escenario("copia completa", lambda: espejo.sincronizar(completa=True))
+    chequeos.append(("copia completa: todas las filas", len(espejo.codigos()) == args.filas))
+    chequeos.append(("una sola conexión", srv.conexiones == 1))
+
+    escenario("sin cambios", espejo.sincronizar)
+    chequeos.append(("sin cambios: un rango acotado", all(r[-1].isdigit() for r in srv.rangos_leidos[-1:])))
+
+    escenario("append 10 filas", lambda: cliente.append_rows(filas_sinteticas(10, args.filas)))
+    escenario("incremental", espejo.sincronizar)
+    chequeos.append(("incremental: filas nuevas", len(espejo.codigos()) == args.filas + 10))
+
+    srv.expirar_tokens()
+    cliente.append_rows(filas_sinteticas(5, args.filas + 10))
+    escenario("token vencido (401) → reconexión", espejo.sincronizar)
+    chequeos.append(("401: reconecta y no duplica la escritura", srv.conexiones == 2 and len(srv.filas) == args.filas + 16))
+    chequeos.append(("401: la lectura se completa", len(espejo.codigos()) == args.filas + 15))
+
+    srv.fallar(1, ConnectionError("conexión reiniciada"))
+    escenario("corte de conexión en lectura", lambda: espejo.sincronizar(completa=True))
+    chequeos.append(("corte en lectura: reintenta", cliente.reconexiones == 2 and len(espejo.codigos()) == args.filas + 15))
+
+    srv.fallar(1, ConnectionError("conexión reiniciada"))
+    try:
+        cliente.append_rows(filas_sinteticas(1, args.filas + 15))
+        propagado = False
+    except ConnectionError:
+        propagado = True
+    chequeos.append(("corte en escritura: se propaga sin reintentar", propagado and len(srv.filas) == args.filas + 16))
+
+    srv.fallar(1, ErrorAPIFalso(403, "The caller does not have permission"))
+    try:
+        cliente.batch_get(["A1:A1"])
+        chequeos.append(("403: no se reintenta", False))
+    except ErrorAPIFalso:
+        chequeos.append(("403: no se reintenta", cliente.reconexiones == 2))
+
+    # Cortes a mitad de append_rows a través de la cola: la API no aplicó la escritura, o la
+    # aplicó y la respuesta se perdió. En ambos casos cada fila queda exactamente una vez.
+    def codigos_en_hoja() -> list[str]:
+        espejo.sincronizar()
+        return espejo.codigos()
+
+    cola = ColaHoja(escribir=cliente.append_rows, codigos_en_hoja=codigos_en_hoja,
+                    db=str(tmp / "cola.sqlite3"), backoff_base_s=0.0)
+    enviados = 0
+    for nombre, aplicada, desde in (("no aplicado", False, args.filas + 100), ("aplicado sin respuesta", True, args.filas + 200)):
+        lote = filas_sinteticas(3, desde)
+        cola.encolar(lote)
+        enviados += len(lote)
+        srv.fallar(1, ConnectionError("conexión reiniciada"), aplicada=aplicada)
+        escenario(f"cola: append {nombre}", lambda: [cola.vaciar() for _ in range(2)])
+        veces = [sum(f[0] == c[0] for f in srv.filas) for c in lote]
+        chequeos.append((f"cola, append {nombre}: cada CODIGO una sola vez en la hoja",
+                         veces == [1, 1, 1] and cola.estado()["enviado"] == enviados))
+
+    chequeos.append(("nunca se pidió una columna entera", all(r[-1].isdigit() for r in srv.rangos_leidos)))
+
+    print()
+    for nombre, ok in chequeos:
+        print(f"  {'ok ' if ok else 'MAL'}  {nombre}")
+    return 1 if args.fallar and not all(ok for _, ok in chequeos) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
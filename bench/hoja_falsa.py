@@ -0,0 +1,147 @@
+# ---------------------------
+# Backend falso de Google Sheets (en memoria): mismo contrato que gspread.Worksheet para
+# lo que usa la app (row_count, get, batch_get, append_rows y el batch_update de
+# deleteDimension), con conteo de llamadas y fallas
+# ---------------------------
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+A1_RE = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def _col(letras: str) -> int:
+    n = 0
+    for c in letras:
+        n = n * 26 + ord(c) - 64
+    return n
+
+
+@dataclass
+class RespuestaFalsa:
+    status_code: int
+
+
+class ErrorAPIFalso(Exception):
+    """Como gspread.exceptions.APIError: el código HTTP va en e.response.status_code."""
+
+    def __init__(self, status_code: int, mensaje: str = ""):
+        super().__init__(mensaje or f"HTTP {status_code}")
+        self.response = RespuestaFalsa(status_code)
+
+
+@dataclass
+class ServidorHojaFalso:
+    """
+    Los datos de la hoja y la "API": conectar() hace las veces de abrir_worksheet
+    (autenticación + metadatos) y devuelve un worksheet con un token propio.
+
+    - expirar_tokens(): los worksheets ya abiertos reciben 401 hasta reconectar.
+    - fallar(n, error): las próximas n llamadas lanzan `error` (cortes, 5xx, …).
+      Con aplicada=True son escrituras que la API aplica pero cuya respuesta se pierde.
+    - latencia_s: demora por llamada (para medir round-trips).
+    """
+
+    filas: list[list[str]] = field(default_factory=list)
+    grilla: int = 1000          # filas de la grilla (Sheets crea hojas de 1000 filas)
+    latencia_s: float = 0.0
+    conexiones: int = 0
+    llamadas: dict[str, int] = field(default_factory=dict)
+    rangos_leidos: list[str] = field(default_factory=list)
+    celdas_leidas: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._token = 0
+        self._fallas: list[BaseException] = []
+        self._fallas_aplicadas: list[BaseException] = []
+
+    def conectar(self) -> "WorksheetFalso":
+        with self._lock:
+            self.conexiones += 1
+            return WorksheetFalso(self, self._token)
+
+    def expirar_tokens(self):
+        with self._lock:
+            self._token += 1
+
+    def fallar(self, n: int, error: BaseException, aplicada: bool = False):
+        with self._lock:
+            (self._fallas_aplicadas if aplicada else self._fallas).extend([error] * n)
+
+    def _responder(self):
+        """Después de aplicar una escritura (con el lock tomado): ¿se pierde la respuesta?"""
+        if self._fallas_aplicadas:
+            raise self._fallas_aplicadas.pop(0)
+
+    def _entrar(self, metodo: str, token: int):
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+        with self._lock:
+            self.llamadas[metodo] = self.llamadas.get(metodo, 0) + 1
+            if self._fallas:
+                raise self._fallas.pop(0)
+            if token != self._token:
+                raise ErrorAPIFalso(401, "Request had invalid authentication credentials.")
+
+    def _rango(self, rango: str) -> list[list[str]]:
+        m = A1_RE.match(rango.split("!")[-1])
+        if not m:
+            raise ErrorAPIFalso(400, f"Unable to parse range: {rango}")
+        c0, f0, c1, f1 = m.groups()
+        c1 = c1 or c0
+        f0 = int(f0) if f0 else 1
+        f1 = int(f1) if f1 else max(len(self.filas), f0)
+        valores = []
+        for fila in self.filas[f0 - 1:f1]:
+            valores.append(list(fila[_col(c0) - 1:_col(c1)]))
+        # Como la API: sin celdas vacías al final de cada fila ni filas vacías al final
+        for v in valores:
+            while v and v[-1] == "":
+                v.pop()
+        while valores and not valores[-1]:
+            valores.pop()
+        self.rangos_leidos.append(rango)
+        self.celdas_leidas += sum(len(v) for v in valores)
+        return valores
+
+
+class WorksheetFalso:
+    id = 0   # sheetId
+
+    def __init__(self, servidor: ServidorHojaFalso, token: int):
+        self._srv = servidor
+        self._token = token
+        self.spreadsheet = self   # ws.spreadsheet.batch_update: lo atiende el mismo objeto
+        self.row_count = max(servidor.grilla, len(servidor.filas))   # metadatos al abrir
+
+    def get(self, rango: str) -> list[list[str]]:
+        self._srv._entrar("get", self._token)
+        with self._srv._lock:
+            return self._srv._rango(rango)
+
+    def batch_get(self, rangos: list[str]) -> list[list[list[str]]]:
+        self._srv._entrar("batch_get", self._token)
+        with self._srv._lock:
+            return [self._srv._rango(r) for r in rangos]
+
+    def append_rows(self, filas: list[list[str]], value_input_option: str = "RAW", **kwargs):
+        self._srv._entrar("append_rows", self._token)
+        with self._srv._lock:
+            self._srv.filas.extend([str(c) for c in f] for f in filas)
+            # La API agranda la grilla; self.row_count queda como se leyó al abrir
+            self._srv.grilla = max(self._srv.grilla, len(self._srv.filas))
+            self._srv._responder()
+
+    def batch_update(self, body: dict):
+        """Solo deleteDimension sobre filas, aplicados en orden (como la API)."""
+        self._srv._entrar("batch_update", self._token)
+        with self._srv._lock:
+            for pedido in body["requests"]:
+                r = pedido["deleteDimension"]["range"]
+                if r["dimension"] != "ROWS" or r["sheetId"] != self.id:
+                    raise ErrorAPIFalso(400, f"pedido no soportado: {pedido}")
+                del self._srv.filas[r["startIndex"]:r["endIndex"]]
+                self._srv.grilla -= r["endIndex"] - r["startIndex"]
+        return {"replies": [{} for _ in body["requests"]]}
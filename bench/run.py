@@ -0,0 +1,278 @@
+# ---------------------------
+# Benchmark offline del pipeline de parseo e inferencia (sin red, sin Streamlit)
+#
+#   python -m bench.run                           # corre y muestra la tabla
+#   python -m bench.run --guardar                 # además guarda la línea base
+#   python -m bench.run --comparar --fallar       # compara con la línea base; exit 1 si hay regresión
+#   python -m bench.run --barrido-lote            # realineo vectorizado vs. fila por fila según el lote
+#   python -m bench.arranque                      # tiempos de importación del arranque (presupuesto)
+# ---------------------------
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from almacen import ruta_datos
+from bench.corpus import TAMANOS, ModeloStub, generar_corpus
+from procesamiento import (
+    MOTOR_REGLAS, ContextoReporte, _preparar, detectar_modo_reporte,
+    detectar_ubicacion_ext, extraer_encargado, fechas_desde_texto, infer_accion_inmediata,
+    infer_area, infer_area_coordinando, infer_clasificacion, infer_sistema, infer_solucion,
+    LOTE_MIN_VECTORIZADO, normalize_21_fields, procesar_respuesta, procesar_respuestas_lote, sanitize_text,
+)
+from realineo import clasificar_celda, realinear
+from reglas import _escanear_memo
+from temporal import _analizar_memo
+from via_rapida import extraer as via_rapida
+
+ARCHIVO_BASE = "bench_baseline.json"
+
+
+def _limpiar_caches():
+    # Cada etapa se mide "en frío": sin análisis memoizados de la etapa anterior
+    _escanear_memo.cache_clear()
+    clasificar_celda.cache_clear()
+    _analizar_memo.cache_clear()
+
+
+def _contexto_completo(texto: str) -> ContextoReporte:
+    return ContextoReporte(texto).precalcular()
+
+
+# Etapa = (nombre, preparar(texto, respuesta) → args, función medida)
+# preparar() corre fuera del cronómetro.
+Etapa = tuple[str, Callable[[str, str], tuple], Callable]
+
+
+def _fila_preparada(texto: str, respuesta: str) -> tuple:
+    ctx = _contexto_completo(texto)
+    return _preparar(respuesta, ctx)[0], ctx
+
+
+def etapas(stub: ModeloStub) -> list[Etapa]:
+    def _extremo_a_extremo(texto: str):
+        # La instrucción fija va como system_instruction: en contents solo viaja el reporte
+        respuesta = stub.generate_content([texto.strip()]).text
+        return procesar_respuesta(texto, respuesta)
+
+    solo_texto = lambda t, r: (t,)
+    return [
+        ("sanitize_text",          lambda t, r: (r,),                 sanitize_text),
+        ("normalize_21_fields",    lambda t, r: (sanitize_text(r),),  normalize_21_fields),
+        ("fechas_desde_texto",     solo_texto,                        fechas_desde_texto),
+        ("motor_reglas.escanear",  solo_texto,                        MOTOR_REGLAS.escanear),
+        ("infer_sistema",          solo_texto,                        infer_sistema),
+        ("infer_clasificacion",    solo_texto,                        infer_clasificacion),
+        ("infer_area_coordinando", solo_texto,                        infer_area_coordinando),
+        ("infer_area",             solo_texto,                        infer_area),
+        ("infer_accion_inmediata", solo_texto,                        infer_accion_inmediata),
+        ("infer_solucion",         solo_texto,                        infer_solucion),
+        ("detectar_ubicacion_ext", solo_texto,                        detectar_ubicacion_ext),
+        ("detectar_modo_reporte",  solo_texto,                        detectar_modo_reporte),
+        ("extraer_encargado",      solo_texto,                        extraer_encargado),
+        ("contexto_reporte",       solo_texto,                        _contexto_completo),
+        ("realinear",              _fila_preparada,                   realinear),
+        ("procesar_respuesta",     lambda t, r: (t, r),               procesar_respuesta),
+        ("procesar_respuesta_json", lambda t, r: (t, stub.responder(t, json_mode=True)), procesar_respuesta),
+        ("via_rapida",             solo_texto,                        via_rapida),
+        ("extremo_a_extremo",      solo_texto,                        _extremo_a_extremo),
+    ]
+
+
+def _percentil(ordenados: list[float], q: float) -> float:
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * q
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def resumir(muestras: list[float], filas: int | None = None) -> dict:
+    """Latencias en ms (por llamada) y throughput en filas/s (default: una fila por llamada)."""
+    ordenados = sorted(muestras)
+    total = sum(muestras)
+    return {
+        "n": len(muestras),
+        "p50_ms": _percentil(ordenados, 0.50) * 1e3,
+        "p95_ms": _percentil(ordenados, 0.95) * 1e3,
+        "p99_ms": _percentil(ordenados, 0.99) * 1e3,
+        "media_ms": statistics.fmean(muestras) * 1e3 if muestras else 0.0,
+        "filas_s": (len(muestras) if filas is None else filas) / total if total else 0.0,
+    }
+
+
+def medir_etapa(etapa: Etapa, textos: list[str], respuestas: list[str], rondas: int) -> dict:
+    _, preparar, fn = etapa
+    muestras: list[float] = []
+    for _ in range(rondas):
+        _limpiar_caches()
+        args = [preparar(t, r) for t, r in zip(textos, respuestas)]
+        _limpiar_caches()
+        for a in args:
+            t0 = time.perf_counter()
+            fn(*a)
+            muestras.append(time.perf_counter() - t0)
+    return resumir(muestras)
+
+
+def medir_lote(textos: list[str], respuestas: list[str], rondas: int, tam_lote: int) -> dict:
+    muestras: list[float] = []
+    for _ in range(rondas):
+        _limpiar_caches()
+        for i in range(0, len(textos), tam_lote):
+            t0 = time.perf_counter()
+            procesar_respuestas_lote(textos[i:i + tam_lote], respuestas[i:i + tam_lote])
+            muestras.append(time.perf_counter() - t0)
+    return resumir(muestras, filas=len(textos) * rondas)
+
+
+def barrido_lote(n: int, tamano: str, rondas: int, seed: int, tasa_defectos: float,
+                 lotes: tuple[int, ...] = (25, 50, 100, 200, 400, 800, 1600, 3200)) -> list[tuple[int, float, float]]:
+    """[(tamaño de lote, filas/s vectorizado, filas/s fila por fila), ...] sobre los mismos `n` reportes."""
+    corpus = generar_corpus(n, tamano, seed)
+    stub = ModeloStub(corpus, tasa_defectos=tasa_defectos, seed=seed)
+    textos = [r.texto for r in corpus]
+    respuestas = [stub.responder(t) for t in textos]
+    procesar_respuestas_lote(textos[:50], respuestas[:50], vectorizar=True)   # calentamiento (pandas)
+    out = []
+    for lote in lotes:
+        tasas = []
+        for vectorizar in (True, False):
+            mejor = float("inf")
+            for _ in range(rondas):
+                _limpiar_caches()
+                t0 = time.perf_counter()
+                for i in range(0, len(textos), lote):
+                    procesar_respuestas_lote(textos[i:i + lote], respuestas[i:i + lote], vectorizar=vectorizar)
+                mejor = min(mejor, time.perf_counter() - t0)
+            tasas.append(len(textos) / mejor)
+        out.append((lote, *tasas))
+    return out
+
+
+def correr(n: int, tamanos: list[str], rondas: int, tam_lote: int, seed: int,
+           tasa_defectos: float, solo: list[str] | None = None) -> dict:
+    resultados: dict[str, dict[str, dict]] = {}
+    for tamano in tamanos:
+        corpus = generar_corpus(n, tamano, seed)
+        stub = ModeloStub(corpus, tasa_defectos=tasa_defectos, seed=seed)
+        textos = [r.texto for r in corpus]
+        respuestas = [stub.responder(t) for t in textos]
+        por_etapa = {}
+        for etapa in etapas(stub):
+            if solo and etapa[0] not in solo:
+                continue
+            # Calentamiento (compilación perezosa de regex, imports de pandas, etc.)
+            medir_etapa(etapa, textos[:5], respuestas[:5], 1)
+            por_etapa[etapa[0]] = medir_etapa(etapa, textos, respuestas, rondas)
+        if not solo or "procesar_respuestas_lote" in solo:
+            medir_lote(textos[:tam_lote], respuestas[:tam_lote], 1, tam_lote)
+            por_etapa["procesar_respuestas_lote"] = medir_lote(textos, respuestas, rondas, tam_lote)
+        resultados[tamano] = por_etapa
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "n": n, "rondas": rondas, "lote": tam_lote, "seed": seed, "tasa_defectos": tasa_defectos,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(actual: dict, base: dict, umbral: float, metrica: str = "p50_ms") -> list[str]:
+    """Etapas cuya `metrica` empeoró más de `umbral` (fracción) respecto a la línea base."""
+    regresiones = []
+    for tamano, etapas_act in actual["resultados"].items():
+        etapas_base = base.get("resultados", {}).get(tamano, {})
+        for nombre, r in etapas_act.items():
+            b = etapas_base.get(nombre)
+            if not b or not b.get(metrica):
+                continue
+            cambio = r[metrica] / b[metrica] - 1
+            if cambio > umbral:
+                regresiones.append(
+                    f"{tamano:<6} {nombre:<26} {metrica} {b[metrica]:.3f} → {r[metrica]:.3f} ms (+{cambio:.0%})"
+                )
+    return regresiones
+
+
+def imprimir(res: dict, base: dict | None = None):
+    cab = f"{'etapa':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'filas/s':>11}"
+    for tamano, por_etapa in res["resultados"].items():
+        print(f"\n== {tamano} ({res['meta']['n']} reportes × {res['meta']['rondas']} rondas)")
+        print(cab + ("   vs base" if base else ""))
+        for nombre, r in por_etapa.items():
+            linea = (f"{nombre:<26} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} "
+                     f"{r['p99_ms']:>9.3f} {r['filas_s']:>11,.0f}")
+            b = (base or {}).get("resultados", {}).get(tamano, {}).get(nombre)
+            if b and b.get("p50_ms"):
+                linea += f"   {r['p50_ms'] / b['p50_ms'] - 1:+.0%}"
+            print(linea)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark offline del pipeline de parseo e inferencia.")
+    ap.add_argument("-n", type=int, default=200, help="reportes por tamaño (default 200)")
+    ap.add_argument("--tamanos", nargs="+", choices=TAMANOS, default=list(TAMANOS))
+    ap.add_argument("--rondas", type=int, default=3)
+    ap.add_argument("--lote", type=int, default=50, help="filas por llamada a procesar_respuestas_lote")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--tasa-defectos", type=float, default=0.3, help="fracción de respuestas malformadas del stub")
+    ap.add_argument("--solo", nargs="+", metavar="ETAPA", help="medir solo estas etapas")
+    ap.add_argument("--base", type=Path, default=None, help=f"archivo de línea base (default DATA_DIR/{ARCHIVO_BASE})")
+    ap.add_argument("--guardar", action="store_true", help="guardar el resultado como nueva línea base")
+    ap.add_argument("--comparar", action="store_true", help="comparar contra la línea base")
+    ap.add_argument("--umbral", type=float, default=0.20, help="regresión tolerada en p50 (default 0.20 = +20%%)")
+    ap.add_argument("--fallar", action="store_true", help="exit 1 si hay regresiones (para CI)")
+    ap.add_argument("--json", type=Path, help="escribir también el resultado completo en este archivo")
+    ap.add_argument("--barrido-lote", action="store_true",
+                    help="medir el realineo vectorizado vs. fila por fila según el tamaño de lote y salir")
+    args = ap.parse_args(argv)
+
+    if args.barrido_lote:
+        for tamano in args.tamanos:
+            print(f"\n== {tamano} ({max(args.n, 3200)} reportes, mejor de {args.rondas} rondas)")
+            print(f"{'lote':>6} {'vectorizado f/s':>16} {'por fila f/s':>13}")
+            for lote, vec, fila in barrido_lote(max(args.n, 3200), tamano, args.rondas, args.seed, args.tasa_defectos):
+                print(f"{lote:>6} {vec:>16,.0f} {fila:>13,.0f}  {'vectorizado' if vec > fila else ''}")
+        print(f"\nLOTE_MIN_VECTORIZADO = {LOTE_MIN_VECTORIZADO} (filas con pipes por llamada)")
+        return 0
+
+    ruta_base = args.base or ruta_datos(ARCHIVO_BASE)
+    base = None
+    if args.comparar:
+        if not ruta_base.exists():
+            print(f"No hay línea base en {ruta_base}; corre primero con --guardar.", file=sys.stderr)
+            return 2
+        base = json.loads(ruta_base.read_text(encoding="utf-8"))
+
+    res = correr(args.n, args.tamanos, args.rondas, args.lote, args.seed, args.tasa_defectos, args.solo)
+    imprimir(res, base)
+
+    if args.json:
+        args.json.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.guardar:
+        ruta_base.parent.mkdir(parents=True, exist_ok=True)
+        ruta_base.write_text(json.dumps(res, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nLínea base guardada en {ruta_base}")
+
+    if base is not None:
+        regresiones = comparar(res, base, args.umbral)
+        if regresiones:
+            print(f"\nRegresiones (> +{args.umbral:.0%} en p50):")
+            for r in regresiones:
+                print("  " + r)
+            return 1 if args.fallar else 0
+        print(f"\nSin regresiones respecto a {ruta_base} (umbral +{args.umbral:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# ---------------------------
+# Microbenchmark del motor temporal: un escaneo (temporal.py) vs. la cadena anterior de funciones
+#
+#   python -m bench.temporal                      # corpus "largo" + versiones rellenadas x4 y x16
+#   python -m bench.temporal --relleno 1 8 32 --n 500
+# ---------------------------
+import argparse
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bench.corpus import TAMANOS, generar_corpus
+from temporal import MESES_ES, MESES_MAP, TZ, _analizar_memo, analizar_temporal
+
+# Texto sin fechas que alarga el reporte (hilos de correo, bitácoras pegadas)
+RELLENO = (
+    " Se adjunta el detalle enviado por el usuario, quien indica que el problema persiste en "
+    "varias estaciones del área y que ya se había reportado antes por otro medio sin respuesta."
+)
+
+
+# --- Referencia: la cadena anterior (una búsqueda por patrón y por campo, strptime por hora) ---
+ISO_FECHA_RE = re.compile(r"\b(20\d{2})-(\d{1,2})-(\d{1,2})\b")
+DMY_SLASH_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?\b")
+DM_DE_MES_RE = re.compile(rf"\b(\d{{1,2}})\s+de\s+(?:{MESES_ES})(?:\s+de\s+(\d{{4}}))?\b", re.IGNORECASE)
+AMPM_RE = re.compile(
+    r"\b(?P<hour>1[0-2]|0?[1-9])(?::(?P<minute>[0-5]\d))?\s*(?P<ampm>a\.?m\.?|am|p\.?m\.?|pm)\b", re.IGNORECASE
+)
+H24_RE = re.compile(r"\b(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)\b")
+
+
+def _anio(y: Optional[str]) -> int:
+    if not y:
+        return datetime.now(TZ).year
+    return 2000 + int(y) if int(y) < 100 else int(y)
+
+
+def ref_fecha(texto: str):
+    t = texto.lower()
+    m = ISO_FECHA_RE.search(t)
+    if m:
+        return datetime(*map(int, m.groups()), tzinfo=TZ).date()
+    m = DM_DE_MES_RE.search(t)
+    if m:
+        mes = re.search(MESES_ES, m.group(0).lower()).group(0)
+        return datetime(_anio(m.group(2)), MESES_MAP[mes], int(m.group(1)), tzinfo=TZ).date()
+    m = DMY_SLASH_RE.search(t)
+    if m:
+        d, mo = int(m.group(1)), int(m.group(2))
+        if 1 <= d <= 31 and 1 <= mo <= 12:
+            return datetime(_anio(m.group(3)), mo, d, tzinfo=TZ).date()
+    return None
+
+
+def ref_horas(texto: str) -> list[str]:
+    t = texto.lower()
+    horas = []
+    for m in AMPM_RE.finditer(t):
+        h, mi, ampm = int(m.group("hour")), int(m.group("minute") or 0), m.group("ampm").lower().replace(".", "")
+        h = h + 12 if ampm.startswith("p") and h != 12 else 0 if ampm.startswith("a") and h == 12 else h
+        horas.append(f"{h:02d}:{mi:02d}")
+    for m in H24_RE.finditer(t):
+        horas.append(f"{int(m.group('hour')):02d}:{m.group('minute')}")
+    return list(dict.fromkeys(horas))
+
+
+def ref_cadena(texto: str) -> tuple[tuple[str, str], str]:
+    """fechas_desde_texto + calcula_tiempo_desde_texto tal como se llamaban antes (dos veces las horas)."""
+    horas = ref_horas(texto)
+    if horas:
+        base = ref_fecha(texto) or datetime.now(TZ).date()
+        a = f"{base} {horas[0]}"
+        c = ""
+        if len(horas) > 1:
+            h0 = datetime.strptime(horas[0], "%H:%M").time()
+            h1 = datetime.strptime(horas[-1], "%H:%M").time()
+            c = f"{base + timedelta(days=1) if h1 < h0 else base} {horas[-1]}"
+        fechas = (a, c)
+    else:
+        fechas = ("", "")
+    hh = ref_horas(texto)
+    tiempo = ""
+    if len(hh) >= 2:
+        hoy = datetime.now(TZ).date()
+        a = datetime.strptime(f"{hoy} {hh[0]}", "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
+        c = datetime.strptime(f"{hoy} {hh[-1]}", "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
+        if c < a:
+            c += timedelta(days=1)
+        d = c - a
+        tiempo = f"{d.seconds // 3600 + d.days * 24} horas {(d.seconds % 3600) // 60} minutos"
+    return fechas, tiempo
+
+
+def motor(texto: str) -> tuple[tuple[str, str], str]:
+    r = analizar_temporal(texto)
+    return r.fechas, r.tiempo
+
+
+def medir(fn, textos: list[str], rondas: int) -> float:
+    """Mediana (µs por texto) de `rondas` pasadas sobre todos los textos, sin memo entre pasadas."""
+    muestras = []
+    for _ in range(rondas):
+        _analizar_memo.cache_clear()
+        t0 = time.perf_counter()
+        for t in textos:
+            fn(t)
+        muestras.append((time.perf_counter() - t0) / len(textos) * 1e6)
+    return statistics.median(muestras)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Motor temporal vs. cadena anterior en textos largos.")
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--tamano", choices=TAMANOS, default="largo")
+    ap.add_argument("--relleno", type=int, nargs="+", default=[1, 4, 16],
+                    help="veces que se repite RELLENO antes y después del reporte")
+    ap.add_argument("--rondas", type=int, default=7)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    base = [r.texto for r in generar_corpus(args.n, args.tamano, args.seed)]
+    print(f"{'relleno':>8} {'chars':>7} {'cadena µs':>10} {'motor µs':>9} {'x':>6} {'horas=':>7} {'fechas=':>8}")
+    for k in args.relleno:
+        textos = [RELLENO * k + t + RELLENO * k for t in base]
+        ref = medir(ref_cadena, textos, args.rondas)
+        nuevo = medir(motor, textos, args.rondas)
+        # Concordancia: mismas horas (sin importar el orden) y mismas fechas de apertura/cierre
+        horas_ok = sum(set(ref_horas(t)) == set(analizar_temporal(t).horas) for t in textos) / len(textos)
+        fechas_ok = sum(ref_cadena(t)[0] == motor(t)[0] for t in textos) / len(textos)
+        chars = statistics.mean(len(t) for t in textos)
+        print(f"{k:>8} {chars:>7.0f} {ref:>10.1f} {nuevo:>9.1f} {ref / nuevo:>6.2f} {horas_ok:>7.0%} {fechas_ok:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
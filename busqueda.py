@@ -0,0 +1,291 @@
+# ---------------------------
+# Búsqueda de texto completo sobre los incidentes (hoja + archivo): índice invertido SQLite FTS5
+# ---------------------------
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from almacen import conectar
+
+# Columnas de la hoja que se indexan → columna FTS (nombres sin tildes: sirven para "sistema:correo")
+CAMPOS = {"descripcion": 4, "sistema": 5, "accion": 10, "solucion": 11}
+COL_APERTURA, COL_IMPACTO, COL_CLASIFICACION, COL_ESTADO = 1, 8, 9, 16
+# unicode61 + remove_diacritics 2: "caída", "caida" y "CAÍDA" son el mismo término (ñ → n,
+# como duplicados.normalizar)
+TOKENIZADOR = "unicode61 remove_diacritics 2"
+OPTIMIZAR_DESDE = 1000   # filas cambiadas en una sincronización: se fusionan los segmentos del índice
+TERMINO_RE = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+# Palabras sueltas que casi todo incidente contiene: no filtran y encarecen el ranking
+# (dentro de "frases" se respetan)
+PALABRAS_VACIAS = frozenset(
+    "a al con de del e el en la las lo los o para por que se su u un una y".split()
+)
+
+if TYPE_CHECKING:
+    from archivo import ArchivoIncidentes
+    from espejo import EspejoHoja
+
+
+@dataclass(frozen=True)
+class Resultado:
+    codigo: str
+    apertura: str
+    clasificacion: str
+    impacto: str
+    estado: str
+    origen: str          # "hoja" | "archivo"
+    fragmento: str       # texto alrededor de los términos, marcados con « »
+    fila: tuple          # fila completa (como en la hoja)
+
+
+def consulta_fts(texto: str) -> str:
+    """
+    Texto del usuario → expresión MATCH de FTS5, sin errores de sintaxis posibles:
+    palabras (todas deben aparecer), "frases exactas", prefijo* , -excluida, OR entre
+    términos y campo:término (descripcion, sistema, accion, solucion). Las PALABRAS_VACIAS
+    sueltas se ignoran, salvo que la consulta no tenga otra cosa.
+    """
+    incluidos, excluidos, vacias = [], [], []
+    for m in TERMINO_RE.finditer(texto or ""):
+        menos, campo, frase, palabra = m.groups()
+        if palabra == "OR" and not menos and not campo:
+            if incluidos and incluidos[-1] != "OR":
+                incluidos.append("OR")
+            continue
+        crudo = frase if frase is not None else palabra
+        if campo and campo.lower() not in CAMPOS:   # "10:30", "http://…": no es un campo
+            crudo, campo = f"{campo} {crudo}", None
+        prefijo = palabra is not None and palabra.endswith("*")
+        limpio = " ".join(re.findall(r"\w+", crudo))
+        if not limpio:
+            continue
+        termino = f'"{limpio}"' + ("*" if prefijo else "")
+        if campo and campo.lower() in CAMPOS:
+            termino = f"{campo.lower()} : {termino}"
+        elif palabra is not None and not prefijo and not menos and limpio.lower() in PALABRAS_VACIAS:
+            vacias.append(termino)
+            continue
+        (excluidos if menos else incluidos).append(termino)
+    while incluidos and incluidos[-1] == "OR":
+        incluidos.pop()
+    if not incluidos:
+        incluidos = vacias
+    if not incluidos:
+        return ""   # FTS5 no admite una consulta solo con NOT
+    return " ".join(incluidos) + "".join(f" NOT {t}" for t in excluidos)
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido persistente (SQLite FTS5) de los incidentes de la hoja y del archivo.
+
+    - `incidentes` guarda la fila y las columnas de filtro (apertura, Clasificación, Impacto)
+      con índices B-tree; `fts` (rowid = incidentes.id) los textos de CAMPOS.
+    - sincronizar(espejo, archivo): incremental por número de fila, como IndiceDuplicados;
+      tras una copia completa de la hoja (ediciones, filas archivadas o borradas) se recorre
+      todo y se reescriben solo las filas que cambiaron. Los incidentes del archivo se leen
+      de sus Parquet solo si el índice no los tenía.
+    - agregar(filas): lo que se acaba de registrar (antes de que la cola lo escriba en la hoja).
+    - buscar(): ranking BM25, filtros por Clasificación, Impacto y rango de apertura.
+    """
+
+    def __init__(self, db: str = "busqueda.sqlite3"):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._con = conectar(db)
+        columnas = ", ".join(CAMPOS)
+        with self._lock:
+            self._con.executescript(f"""
+                CREATE TABLE IF NOT EXISTS incidentes (
+                    id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, apertura TEXT NOT NULL,
+                    clasificacion TEXT NOT NULL, impacto TEXT NOT NULL, origen TEXT NOT NULL,
+                    datos TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_incidentes_apertura ON incidentes(apertura);
+                CREATE INDEX IF NOT EXISTS ix_incidentes_clasificacion ON incidentes(clasificacion, apertura);
+                CREATE INDEX IF NOT EXISTS ix_incidentes_impacto ON incidentes(impacto, apertura);
+                CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5({columnas}, tokenize='{TOKENIZADOR}', prefix='2 3');
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+            """)
+
+    # --- meta ---
+    def _meta(self, clave: str, default=None):
+        row = self._con.execute("SELECT valor FROM meta WHERE clave=?", (clave,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, clave: str, valor):
+        self._con.execute("INSERT OR REPLACE INTO meta(clave, valor) VALUES (?, ?)", (clave, json.dumps(valor)))
+
+    # --- escritura ---
+    def _guardar(self, filas: Iterable[list[str]], origen: str) -> int:
+        """Inserta o reescribe por CODIGO (solo si la fila cambió). Dentro de una transacción."""
+        cambios = 0
+        for fila in filas:
+            codigo = (fila[0] if fila else "").strip()
+            if not codigo:
+                continue
+            fila = list(fila) + [""] * (COL_ESTADO + 1 - len(fila))
+            datos = json.dumps(fila, ensure_ascii=False)
+            previo = self._con.execute("SELECT id, datos, origen FROM incidentes WHERE codigo=?", (codigo,)).fetchone()
+            if previo and previo[1] == datos and previo[2] == origen:
+                continue
+            valores = (fila[COL_APERTURA].strip(), fila[COL_CLASIFICACION].strip(), fila[COL_IMPACTO].strip(), origen, datos)
+            textos = [fila[i] for i in CAMPOS.values()]
+            if previo:
+                self._con.execute("UPDATE incidentes SET apertura=?, clasificacion=?, impacto=?, origen=?, datos=? "
+                                  "WHERE id=?", (*valores, previo[0]))
+                self._con.execute("DELETE FROM fts WHERE rowid=?", (previo[0],))
+                rowid = previo[0]
+            else:
+                rowid = self._con.execute(
+                    "INSERT INTO incidentes(codigo, apertura, clasificacion, impacto, origen, datos) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (codigo, *valores)).lastrowid
+            self._con.execute(f"INSERT INTO fts(rowid, {', '.join(CAMPOS)}) VALUES (?, ?, ?, ?, ?)", (rowid, *textos))
+            cambios += 1
+        return cambios
+
+    def _transaccion(self, fn) -> int:
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                n = fn()
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return n
+
+    def agregar(self, filas: list[list[str]]) -> int:
+        return self._transaccion(lambda: self._guardar(filas, "hoja"))
+
+    def sincronizar(self, espejo: "EspejoHoja", archivo: Optional["ArchivoIncidentes"] = None) -> int:
+        """Trae al índice lo nuevo de la copia local y del archivo; retorna cuántas filas cambiaron."""
+        with self._sync_lock:
+            with self._lock:
+                estado = self._meta("espejo", {})
+                version_archivo = self._meta("archivo", 0)
+            cambios = 0
+            if archivo is not None and archivo.version != version_archivo:
+                cambios += self._sincronizar_archivo(archivo)
+            if (espejo.version, espejo.completa_en()) != (estado.get("version"), estado.get("completa_en")):
+                cambios += self._sincronizar_espejo(espejo, estado, archivo)
+            if cambios >= OPTIMIZAR_DESDE:
+                with self._lock:
+                    self._con.execute("INSERT INTO fts(fts) VALUES('optimize')")
+            return cambios
+
+    def _sincronizar_archivo(self, archivo: "ArchivoIncidentes") -> int:
+        version = archivo.version   # antes de leer: si cambia mientras tanto, se vuelve a pasar
+        archivados = archivo.codigos()
+        with self._lock:
+            conocidos = {c: o for c, o in self._con.execute("SELECT codigo, origen FROM incidentes").fetchall()}
+        # Los que estaban indexados desde la hoja solo cambian de origen; los demás se leen del Parquet
+        mover = [c for c in archivados if conocidos.get(c) == "hoja"]
+        faltan = [c for c in archivados if c not in conocidos]
+        filas = archivo.filas(faltan) if faltan else []
+
+        def aplicar() -> int:
+            for i in range(0, len(mover), 500):
+                lote = mover[i:i + 500]
+                self._con.execute(f"UPDATE incidentes SET origen='archivo' WHERE codigo IN ({','.join('?' * len(lote))})", lote)
+            n = self._guardar(filas, "archivo") + len(mover)
+            self._set_meta("archivo", version)
+            return n
+        return self._transaccion(aplicar)
+
+    def _sincronizar_espejo(self, espejo: "EspejoHoja", estado: dict, archivo: Optional["ArchivoIncidentes"]) -> int:
+        version, completa_en = espejo.version, espejo.completa_en()
+        recorrer = completa_en != estado.get("completa_en") or espejo.ultima_fila() < estado.get("ultima_n", 0)
+        filas = espejo.filas_desde(0 if recorrer else estado.get("ultima_n", 0))
+        archivados = set(archivo.codigos()) if (recorrer and archivo is not None) else set()
+
+        def aplicar() -> int:
+            n = self._guardar((f for _, f in filas), "hoja")
+            if recorrer:
+                # Lo que ya no está en la hoja pasó al archivo o se borró a mano
+                en_hoja = {(f[0] if f else "").strip() for _, f in filas}
+                for i, c in self._con.execute("SELECT id, codigo FROM incidentes WHERE origen='hoja'").fetchall():
+                    if c in en_hoja:
+                        continue
+                    if c in archivados:
+                        self._con.execute("UPDATE incidentes SET origen='archivo' WHERE id=?", (i,))
+                    else:
+                        self._con.execute("DELETE FROM fts WHERE rowid=?", (i,))
+                        self._con.execute("DELETE FROM incidentes WHERE id=?", (i,))
+                    n += 1
+            ultima_n = filas[-1][0] if filas else (0 if recorrer else estado.get("ultima_n", 0))
+            self._set_meta("espejo", {"version": version, "completa_en": completa_en, "ultima_n": ultima_n})
+            return n
+        return self._transaccion(aplicar)
+
+    # --- lectura ---
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM incidentes").fetchone()[0]
+
+    def opciones(self) -> dict[str, list[str]]:
+        """Valores presentes de Clasificación e Impacto (para los filtros de la página)."""
+        with self._lock:
+            return {
+                col: [v for (v,) in self._con.execute(
+                    f"SELECT DISTINCT {col} FROM incidentes WHERE {col} != '' ORDER BY {col}").fetchall()]
+                for col in ("clasificacion", "impacto")
+            }
+
+    def buscar(
+        self,
+        texto: str = "",
+        clasificacion: Iterable[str] = (),
+        impacto: Iterable[str] = (),
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        limite: int = 50,
+    ) -> list[Resultado]:
+        """
+        Incidentes que cumplen `texto` (ver consulta_fts) y los filtros, por relevancia; sin
+        texto, los más recientes. `desde`/`hasta`: "YYYY-MM-DD" (inclusive) sobre la apertura.
+        """
+        donde, args = [], []
+        for col, valores in (("clasificacion", list(clasificacion)), ("impacto", list(impacto))):
+            if valores:
+                donde.append(f"i.{col} IN ({','.join('?' * len(valores))})")
+                args += valores
+        if desde:
+            donde.append("i.apertura >= ?")
+            args.append(desde)
+        if hasta:
+            donde.append("i.apertura <= ?")
+            args.append(hasta + " 23:59")
+        match = consulta_fts(texto)
+        if not match and (texto or "").strip():
+            return []   # solo exclusiones, palabras vacías o signos: no hay nada que buscar
+        filtro = "".join(" AND " + d for d in donde)
+        with self._lock:
+            if match:
+                # Ranking primero (solo rowids); el fragmento y la fila, solo para los `limite`
+                # elegidos: snippet() sobre todas las coincidencias cuesta más que el ranking
+                # (sin filtros no hace falta el JOIN: es casi la mitad del costo con muchas coincidencias)
+                desde_sql = "fts JOIN incidentes i ON i.id = fts.rowid" if donde else "fts"
+                ids = [i for (i,) in self._con.execute(
+                    f"SELECT fts.rowid FROM {desde_sql} WHERE fts MATCH ?{filtro} ORDER BY bm25(fts) LIMIT ?",
+                    [match] + args + [limite]).fetchall()]
+                marcas = ",".join("?" * len(ids))
+                fragmentos = dict(self._con.execute(
+                    f"SELECT rowid, snippet(fts, -1, '«', '»', '…', 12) FROM fts WHERE fts MATCH ? AND rowid IN ({marcas})",
+                    [match] + ids).fetchall()) if ids else {}
+            else:
+                ids = [i for (i,) in self._con.execute(
+                    f"SELECT i.id FROM incidentes i WHERE 1{filtro} ORDER BY i.apertura DESC LIMIT ?",
+                    args + [limite]).fetchall()]
+                fragmentos = {}
+            filas = {f[0]: f[1:] for f in self._con.execute(
+                f"SELECT id, codigo, apertura, clasificacion, impacto, origen, datos FROM incidentes "
+                f"WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()} if ids else {}
+        out = []
+        for i in ids:
+            codigo, apertura, clasif, imp, origen, datos = filas[i]
+            fila = json.loads(datos)
+            out.append(Resultado(codigo, apertura, clasif, imp, fila[COL_ESTADO], origen,
+                                 fragmentos.get(i) or fila[CAMPOS["descripcion"]][:160], tuple(fila)))
+        return out
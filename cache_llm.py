@@ -0,0 +1,122 @@
+# ---------------------------
+# Caché de respuestas del LLM: LRU en memoria + SQLite en disco
+# ---------------------------
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from almacen import conectar
+
+
+def normalizar_reporte(texto: str) -> str:
+    """Forma canónica del reporte para la clave: NFC, espacios colapsados, sin bordes."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", texto or "")).strip()
+
+
+def huella_prompt(prompt: str, modelo: str, generation_config: dict | None) -> str:
+    """Versión del prompt: cambia si cambia el prompt, el modelo o la configuración."""
+    base = json.dumps([prompt, modelo, generation_config or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheLLM:
+    """
+    Dos niveles: OrderedDict (LRU, por proceso) → SQLite (compartido, sobrevive reinicios).
+    Cada instancia pertenece a UNA versión de prompt, que forma parte de la clave: un cambio
+    en `persona` deja de ver lo anterior sin borrarlo (en un despliegue gradual conviven
+    procesos con versiones distintas); las entradas viejas salen por TTL o por tamaño.
+    El recorte del disco corre cada `recorte_cada` escrituras, no en cada una.
+    """
+
+    def __init__(self, version: str, db: str = "cache_llm.sqlite3",
+                 max_mem: int = 256, max_disk: int = 5000, ttl_s: float = 7 * 24 * 3600,
+                 recorte_cada: int = 100):
+        self.version = version
+        self.max_mem = max_mem
+        self.max_disk = max_disk
+        self.ttl_s = ttl_s
+        self.recorte_cada = recorte_cada
+        self._mem: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.hits_mem = self.hits_disk = self.misses = 0
+        self._con = conectar(db)
+        with self._lock:
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY, version TEXT NOT NULL,
+                    valor TEXT NOT NULL, creado REAL NOT NULL, usado REAL NOT NULL)""")
+            self._con.execute("CREATE INDEX IF NOT EXISTS ix_resp_usado ON respuestas(usado)")
+            self._evict_disk(time.time())
+
+    def clave(self, texto: str) -> str:
+        base = f"{self.version}\x00{normalizar_reporte(texto)}"
+        return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+    def get(self, texto: str) -> Optional[str]:
+        k = self.clave(texto)
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(k)
+            if hit and now - hit[1] <= self.ttl_s:
+                self._mem.move_to_end(k)
+                self.hits_mem += 1
+                return hit[0]
+            row = self._con.execute(
+                "SELECT valor, creado FROM respuestas WHERE clave=?", (k,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_s:
+                self._con.execute("UPDATE respuestas SET usado=? WHERE clave=?", (now, k))
+                self._recordar(k, row[0], row[1])
+                self.hits_disk += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, texto: str, valor: str):
+        k = self.clave(texto)
+        now = time.time()
+        with self._lock:
+            self._recordar(k, valor, now)
+            self._con.execute(
+                "INSERT OR REPLACE INTO respuestas(clave, version, valor, creado, usado) VALUES (?,?,?,?,?)",
+                (k, self.version, valor, now, now),
+            )
+            self._escrituras += 1
+            if self._escrituras % self.recorte_cada == 0:
+                self._evict_disk(now)
+
+    def quitar(self, texto: str):
+        """Olvida la respuesta de `texto` (p. ej. si resultó inservible al procesarla)."""
+        k = self.clave(texto)
+        with self._lock:
+            self._mem.pop(k, None)
+            self._con.execute("DELETE FROM respuestas WHERE clave=?", (k,))
+
+    def _recordar(self, k: str, valor: str, creado: float):
+        self._mem[k] = (valor, creado)
+        self._mem.move_to_end(k)
+        while len(self._mem) > self.max_mem:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        self._con.execute("DELETE FROM respuestas WHERE creado < ?", (now - self.ttl_s,))
+        self._con.execute(
+            "DELETE FROM respuestas WHERE clave IN ("
+            " SELECT clave FROM respuestas ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk,),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits_mem + self.hits_disk + self.misses
+            return {
+                "hits_mem": self.hits_mem, "hits_disk": self.hits_disk, "misses": self.misses,
+                "hit_rate": (self.hits_mem + self.hits_disk) / total if total else 0.0,
+                "mem_entries": len(self._mem),
+            }
@@ -0,0 +1,228 @@
+# ---------------------------
+# Grabación/reproducción (casetes) de Vertex y de la hoja: corridas del pipeline sin red
+# ---------------------------
+import hashlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Union
+
+from cache_llm import normalizar_reporte
+from llm import RespuestaFalsa, UsoFalso
+
+MODOS = ("grabar", "reproducir")
+# Latencia inyectada al reproducir: segundos fijos o función Random → segundos (llm.latencia_*)
+Latencia = Union[float, Callable[[random.Random], float]]
+
+
+class CaseteFaltante(KeyError):
+    """Pedido que no está en el casete (modo reproducir). No es reintentable."""
+
+
+def _clave(*partes) -> str:
+    base = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:24]
+
+
+class Casete:
+    """
+    Archivo JSONL con las interacciones de un proceso con Vertex y con la hoja.
+
+    - grabar: cada respuesta real se agrega al archivo al llegar (sobrevive a un corte).
+    - reproducir: las respuestas se sirven por clave (pedido normalizado) sin red, con la
+      latencia inyectada opcional. Una misma clave grabada varias veces (p. ej. leer la cola
+      de la hoja antes y después de escribir) se reproduce en orden; agotada, se repite la última.
+    - Escrituras a la hoja: al grabar quedan en el casete; al reproducir se guardan en
+      `escrituras` y diferencias() las compara con las grabadas (prueba de regresión).
+    """
+
+    def __init__(self, ruta: Union[str, Path], modo: str = "reproducir",
+                 latencia_llm: Latencia = 0.0, latencia_hoja: Latencia = 0.0, seed: int = 0):
+        if modo not in MODOS:
+            raise ValueError(f"modo de casete inválido: {modo!r} (opciones: {', '.join(MODOS)})")
+        self.ruta = Path(ruta)
+        self.modo = modo
+        self.latencia = {"llm": latencia_llm, "hoja": latencia_hoja}
+        self.escrituras: list[list[str]] = []
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._grabadas: dict[str, list[dict]] = {}
+        self._posicion: dict[str, int] = {}
+        self._escrituras_grabadas: list[list[str]] = []
+        self.cambios: list[dict] = []   # batch_update reproducidos (borrado de filas)
+        self._cambios_grabados: list[dict] = []
+        if self.ruta.exists():
+            with self.ruta.open(encoding="utf-8") as f:
+                for linea in f:
+                    if linea.strip():
+                        self._cargar(json.loads(linea))
+
+    def _cargar(self, reg: dict):
+        if reg["op"] == "append_rows":
+            self._escrituras_grabadas.extend(reg["filas"])
+        elif reg["op"] == "batch_update":
+            self._cambios_grabados.append(reg["body"])
+        else:
+            self._grabadas.setdefault(reg["clave"], []).append(reg)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._grabadas.values()) + len(self._escrituras_grabadas) + len(self._cambios_grabados)
+
+    @property
+    def grabando(self) -> bool:
+        return self.modo == "grabar"
+
+    def grabar(self, reg: dict):
+        with self._lock:
+            self._cargar(reg)
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            with self.ruta.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+
+    def reproducir(self, tipo: str, clave: str, descripcion: str = "") -> dict:
+        with self._lock:
+            regs = self._grabadas.get(clave)
+            if not regs:
+                raise CaseteFaltante(f"{tipo} no grabado en {self.ruta.name}: {descripcion or clave}")
+            i = self._posicion.get(clave, 0)
+            self._posicion[clave] = i + 1
+            lat = self.latencia[tipo]
+            lat = lat(self._rnd) if callable(lat) else lat
+        if lat:
+            time.sleep(lat)
+        return regs[min(i, len(regs) - 1)]
+
+    def escribir(self, filas: list[list[str]]):
+        lat = self.latencia["hoja"]
+        with self._lock:
+            lat = lat(self._rnd) if callable(lat) else lat
+            self.escrituras.extend([list(map(str, f)) for f in filas])
+        if lat:
+            time.sleep(lat)
+
+    def cambiar(self, body: dict):
+        with self._lock:
+            self.cambios.append(body)
+
+    def diferencias(self, ignorar: tuple[int, ...] = (0, 21)) -> list[str]:
+        """
+        Escrituras reproducidas vs. grabadas, en orden. Por defecto se ignoran CODIGO (depende
+        de la secuencia local) y "Hora de reporte" (reloj).
+        """
+        out = []
+        grabadas, nuevas = self._escrituras_grabadas, self.escrituras
+        if len(grabadas) != len(nuevas):
+            out.append(f"filas escritas: {len(nuevas)} (grabadas: {len(grabadas)})")
+        if self.cambios != self._cambios_grabados:
+            out.append(f"batch_update: {len(self.cambios)} (grabados: {len(self._cambios_grabados)}) o con otros tramos")
+        for n, (g, r) in enumerate(zip(grabadas, nuevas)):
+            for i in range(max(len(g), len(r))):
+                a = g[i] if i < len(g) else ""
+                b = r[i] if i < len(r) else ""
+                if i not in ignorar and a != b:
+                    out.append(f"fila {n + 1}, columna {i + 1}: {b!r} (grabado: {a!r})")
+        return out
+
+
+class ModeloGrabado:
+    """
+    Como GenerativeModel.generate_content (también stream=True), sobre un casete.
+    `modelo` es el modelo real (None al reproducir). La clave incluye nombre, instrucción
+    de sistema, contenido (normalizado como en la caché) y generation_config.
+    """
+
+    def __init__(self, modelo, casete: Casete, nombre: str, system_instruction: str = ""):
+        self.modelo = modelo
+        self.casete = casete
+        self.nombre = nombre
+        self._instruccion = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:16]
+
+    def _clave(self, contents, generation_config) -> str:
+        textos = contents if isinstance(contents, (list, tuple)) else [contents]
+        return _clave("llm", self.nombre, self._instruccion, [normalizar_reporte(str(t)) for t in textos],
+                      generation_config or {})
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        clave = self._clave(contents, generation_config)
+        if self.casete.grabando:
+            resp = self.modelo.generate_content(contents, generation_config=generation_config, stream=stream, **kwargs)
+            if stream:
+                return self._grabar_stream(clave, resp)
+            self._grabar(clave, [resp])
+            return resp
+        reg = self.casete.reproducir("llm", clave, str(contents)[:80])
+        fragmentos = reg["fragmentos"]
+        uso = UsoFalso(*reg["uso"]) if reg.get("uso") else None
+        if not stream:
+            return RespuestaFalsa("".join(fragmentos), uso)
+        return iter([RespuestaFalsa(t, uso if i == len(fragmentos) - 1 else None) for i, t in enumerate(fragmentos)])
+
+    def _grabar(self, clave: str, respuestas: list):
+        def texto(r) -> str:
+            try:
+                return r.text or ""
+            except Exception:   # fragmento sin texto (solo finish_reason)
+                return ""
+        uso = getattr(respuestas[-1], "usage_metadata", None) if respuestas else None
+        self.casete.grabar({
+            "op": "llm", "clave": clave, "modelo": self.nombre,
+            "fragmentos": [texto(r) for r in respuestas],
+            "uso": [uso.prompt_token_count, uso.candidates_token_count] if uso else None,
+        })
+
+    def _grabar_stream(self, clave: str, it):
+        # Se graba al terminar el stream (uno abandonado a medias no queda en el casete)
+        vistos = []
+        for r in it:
+            vistos.append(r)
+            yield r
+        self._grabar(clave, vistos)
+
+
+class HojaGrabada:
+    """
+    Worksheet (row_count, get, batch_get, append_rows, spreadsheet.batch_update) sobre un
+    casete; `ws` es el real (None al reproducir). Al reproducir, las escrituras no salen del proceso.
+    """
+
+    def __init__(self, ws, casete: Casete):
+        self.ws = ws
+        self.casete = casete
+        self.row_count = self._leer("row_count", (), lambda: ws.row_count)
+        self.spreadsheet = self   # batch_update va al spreadsheet; aquí lo atiende el mismo objeto
+
+    @property
+    def id(self) -> int:
+        # Solo lo pide eliminar_filas: un casete grabado sin borrados no lo necesita
+        return self._leer("id", (), lambda: self.ws.id)
+
+    def _leer(self, op: str, args, llamar: Callable):
+        clave = _clave("hoja", op, args)
+        if self.casete.grabando:
+            resultado = llamar()
+            self.casete.grabar({"op": op, "clave": clave, "args": args, "resultado": resultado})
+            return resultado
+        return self.casete.reproducir("hoja", clave, f"{op} {args}")["resultado"]
+
+    def get(self, rango: str) -> list[list[str]]:
+        return self._leer("get", [rango], lambda: [list(f) for f in self.ws.get(rango)])
+
+    def batch_get(self, rangos: list[str]) -> list[list[list[str]]]:
+        return self._leer("batch_get", list(rangos),
+                          lambda: [[list(f) for f in bloque] for bloque in self.ws.batch_get(rangos)])
+
+    def append_rows(self, filas: list[list[str]], **kwargs):
+        if self.casete.grabando:
+            resultado = self.ws.append_rows(filas, **kwargs)
+            self.casete.grabar({"op": "append_rows", "filas": [list(map(str, f)) for f in filas]})
+            return resultado
+        self.casete.escribir(filas)
+
+    def batch_update(self, body: dict):
+        if self.casete.grabando:
+            resultado = self.ws.spreadsheet.batch_update(body)
+            self.casete.grabar({"op": "batch_update", "body": body})
+            return resultado
+        self.casete.cambiar(body)
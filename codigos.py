@@ -0,0 +1,153 @@
+# ---------------------------
+# Asignador de CODIGO: INC-<día>-<mes>-<NNN>
+# ---------------------------
+import json
+import re
+import threading
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from almacen import conectar
+
+if TYPE_CHECKING:
+    from archivo import ArchivoIncidentes
+    from espejo import EspejoHoja
+
+CODIGO_RE = re.compile(r"^INC-(\d{1,2})-(\d{1,2})-(\d{3,})$")
+
+
+def formato_codigo(dia: int, mes: int, seq: int) -> str:
+    return f"INC-{dia}-{mes}-{seq:03d}"
+
+
+class CodigoAllocator:
+    """
+    Secuencia por (día, mes) guardada en SQLite local.
+
+    - Se siembra UNA vez desde la columna CODIGO de la hoja (un solo col_values); después
+      ponerse_al_dia() registra solo lo nuevo de la copia local y del archivo (códigos de
+      otras instancias o cargados a mano), recordando hasta dónde leyó.
+    - Después cada reserva es O(1): BEGIN IMMEDIATE + UPDATE de la secuencia.
+    - La tabla `asignados` (PRIMARY KEY codigo) es el chequeo al escribir: si un
+      código ya existe (sembrado u observado de otra instancia), se salta al siguiente.
+    El archivo es compartido por todas las sesiones y procesos del servidor.
+    """
+
+    def __init__(self, db: str = "codigos.sqlite3"):
+        self._lock = threading.Lock()  # la conexión se comparte entre hilos de Streamlit
+        self._con = conectar(db)
+        with self._lock:
+            self._con.executescript("""
+                CREATE TABLE IF NOT EXISTS secuencias (
+                    dia INTEGER NOT NULL, mes INTEGER NOT NULL, ultimo INTEGER NOT NULL,
+                    PRIMARY KEY (dia, mes));
+                CREATE TABLE IF NOT EXISTS asignados (codigo TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+            """)
+
+    def sembrado(self) -> bool:
+        with self._lock:
+            row = self._con.execute("SELECT valor FROM meta WHERE clave='sembrado'").fetchone()
+        return bool(row)
+
+    def _registrar(self, codigos: Iterable[str]):
+        """Agrega códigos existentes y sube las secuencias (sin transacción propia)."""
+        maximos: dict[tuple[int, int], int] = {}
+        vistos = []
+        for c in codigos:
+            m = CODIGO_RE.match((c or "").strip())
+            if not m:
+                continue
+            dia, mes, seq = int(m.group(1)), int(m.group(2)), int(m.group(3))
+            vistos.append((formato_codigo(dia, mes, seq),))
+            if seq > maximos.get((dia, mes), 0):
+                maximos[(dia, mes)] = seq
+        self._con.executemany("INSERT OR IGNORE INTO asignados(codigo) VALUES (?)", vistos)
+        self._con.executemany(
+            "INSERT INTO secuencias(dia, mes, ultimo) VALUES (?, ?, ?) "
+            "ON CONFLICT(dia, mes) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)",
+            [(d, m, s) for (d, m), s in maximos.items()],
+        )
+
+    def sembrar(self, codigos: Iterable[str], forzar: bool = False):
+        """Siembra desde la hoja. Idempotente: si otro proceso ya sembró, no hace nada."""
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                ya = self._con.execute("SELECT 1 FROM meta WHERE clave='sembrado'").fetchone()
+                if not ya or forzar:
+                    self._registrar(codigos)
+                    self._con.execute("INSERT OR REPLACE INTO meta(clave, valor) VALUES ('sembrado', '1')")
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+    def observado(self) -> str:
+        """Marca de la última observar(): hasta dónde leyó ponerse_al_dia() (fila de la copia, registro del archivo)."""
+        with self._lock:
+            row = self._con.execute("SELECT valor FROM meta WHERE clave='observado'").fetchone()
+        return row[0] if row else ""
+
+    def observar(self, codigos: Iterable[str], marca: str = ""):
+        """Registra códigos escritos por fuera (otra instancia, edición manual de la hoja)."""
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._registrar(codigos)
+                self._con.execute("INSERT OR REPLACE INTO meta(clave, valor) VALUES ('observado', ?)", (marca,))
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+    def ponerse_al_dia(self, espejo: "EspejoHoja", archivo: Optional["ArchivoIncidentes"] = None) -> int:
+        """
+        Registra los CODIGO de las filas de la copia local posteriores a la última observada y
+        los archivados desde entonces (la primera vez, todos: es la siembra); no sincroniza la
+        copia. Si la fila donde quedó cambió (la hoja se renumeró al archivar), recorre la
+        copia entera una vez. Retorna cuántos leyó.
+        """
+        marca = json.loads(self.observado() or "{}")
+        n, ancla = marca.get("fila", 0), marca.get("codigo", "")
+        filas = espejo.filas_desde(max(n - 1, 0))
+        if n and filas and filas[0][0] == n and (filas[0][1][:1] or [""])[0] == ancla:
+            filas = filas[1:]
+        elif n:
+            filas = espejo.filas_desde(0)
+        archivados, hasta = archivo.codigos_desde(marca.get("archivo", 0)) if archivo else ([], 0)
+        codigos = archivados + [f[0] for _, f in filas if f]
+        if filas:
+            n, ancla = filas[-1][0], (filas[-1][1][:1] or [""])[0]
+        nueva = json.dumps({"fila": n, "codigo": ancla, "archivo": hasta or marca.get("archivo", 0)})
+        leidos = len(codigos)
+        if not self.sembrado():
+            self.sembrar(codigos)
+            codigos = []
+        if codigos or nueva != self.observado():
+            self.observar(codigos, nueva)
+        return leidos
+
+    def reservar(self, dia: int, mes: int, n: int = 1) -> list[str]:
+        """Reserva `n` códigos consecutivos y únicos para (día, mes)."""
+        out: list[str] = []
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.execute(
+                    "INSERT OR IGNORE INTO secuencias(dia, mes, ultimo) VALUES (?, ?, 0)", (dia, mes)
+                )
+                (seq,) = self._con.execute(
+                    "SELECT ultimo FROM secuencias WHERE dia=? AND mes=?", (dia, mes)
+                ).fetchone()
+                while len(out) < n:
+                    seq += 1
+                    codigo = formato_codigo(dia, mes, seq)
+                    cur = self._con.execute("INSERT OR IGNORE INTO asignados(codigo) VALUES (?)", (codigo,))
+                    if cur.rowcount == 1:
+                        out.append(codigo)
+                self._con.execute("UPDATE secuencias SET ultimo=? WHERE dia=? AND mes=?", (seq, dia, mes))
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return out
@@ -0,0 +1,260 @@
+# ---------------------------
+# Cola durable de escritura a la hoja (write-behind): journal SQLite + vaciado en lotes
+# ---------------------------
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from almacen import conectar
+
+ESTADOS = ("pendiente", "enviando", "fallido", "enviado")
+
+
+class ColaHoja:
+    """
+    Las filas aceptadas se guardan primero en SQLite (la UI confirma apenas quedan ahí);
+    un hilo de fondo las envía a la hoja en lotes con append_rows.
+
+    - Idempotencia: CODIGO es la clave primaria del journal; encolar dos veces la misma
+      fila no la duplica.
+    - Cada lote se reclama con BEGIN IMMEDIATE (estado "enviando" + marca de tiempo), así
+      varios procesos pueden compartir el archivo sin enviar la misma fila dos veces.
+    - Si el proceso muere con un lote "enviando", al vencer el arriendo se compara contra
+      la columna CODIGO de la hoja (codigos_en_hoja): lo que ya está se marca enviado y el
+      resto vuelve a pendiente. Nada se pierde ni se duplica al reiniciar.
+    - Una escritura que falló pudo haberse aplicado igual (corte o timeout con la respuesta
+      perdida): antes de reenviar filas con intentos previos se consulta codigos_en_hoja y
+      las que ya están se marcan enviado en vez de agregarlas de nuevo.
+    - Errores: reintento con backoff exponencial (con jitter); tras `max_intentos` la fila
+      queda "fallido" hasta reintentar_fallidos().
+    - textos: el texto crudo (normalizado) de cada reporte junto a su CODIGO. La hoja solo
+      guarda el resumen del modelo; el índice de casi-duplicados necesita el original para
+      comparar reportes reenviados después de un reinicio o desde otro proceso.
+    """
+
+    def __init__(
+        self,
+        escribir: Callable[[list[list[str]]], None],
+        codigos_en_hoja: Callable[[], Iterable[str]],
+        db: str = "cola_hoja.sqlite3",
+        tam_lote: int = 200,
+        intervalo_s: float = 5.0,
+        ventana_s: float = 0.5,
+        arriendo_s: float = 300.0,
+        max_intentos: int = 8,
+        backoff_base_s: float = 2.0,
+        backoff_max_s: float = 300.0,
+        medir: Optional[Callable] = None,
+    ):
+        self.escribir = escribir
+        self.codigos_en_hoja = codigos_en_hoja
+        self.tam_lote = tam_lote
+        self.intervalo_s = intervalo_s
+        self.ventana_s = ventana_s
+        self.arriendo_s = arriendo_s
+        self.max_intentos = max_intentos
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.medir = medir
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._dueno = f"{os.getpid()}-{id(self):x}"
+        self._con = conectar(db)
+        with self._lock:
+            self._con.executescript("""
+                CREATE TABLE IF NOT EXISTS filas (
+                    codigo TEXT PRIMARY KEY, fila TEXT NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'pendiente', intentos INTEGER NOT NULL DEFAULT 0,
+                    error TEXT, dueno TEXT, reclamado REAL,
+                    creado REAL NOT NULL, actualizado REAL NOT NULL, proximo REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_filas_estado ON filas(estado, proximo);
+                CREATE TABLE IF NOT EXISTS textos (codigo TEXT PRIMARY KEY, texto TEXT NOT NULL, creado REAL NOT NULL);
+            """)
+
+    # --- productor (UI) ---
+    def encolar(self, filas: list[list[str]], textos: Optional[list[str]] = None) -> int:
+        """
+        Guarda las filas (CODIGO en la columna 0) y, si vienen, los textos de los reportes
+        (uno por fila). Retorna cuántas filas eran nuevas.
+        """
+        now = time.time()
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                nuevas = 0
+                for fila in filas:
+                    cur = self._con.execute(
+                        "INSERT OR IGNORE INTO filas(codigo, fila, creado, actualizado, proximo) VALUES (?,?,?,?,?)",
+                        (fila[0], json.dumps(fila, ensure_ascii=False), now, now, now),
+                    )
+                    nuevas += cur.rowcount
+                self._con.executemany(
+                    "INSERT OR IGNORE INTO textos(codigo, texto, creado) VALUES (?,?,?)",
+                    [(f[0], t, now) for f, t in zip(filas, textos or []) if t],
+                )
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        self._despertar.set()
+        return nuevas
+
+    def estado(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._con.execute("SELECT estado, COUNT(*) FROM filas GROUP BY estado").fetchall()
+        out = {e: 0 for e in ESTADOS}
+        out.update(dict(rows))
+        return out
+
+    def fallidos(self, limite: int = 50) -> list[tuple[str, int, str]]:
+        """[(codigo, intentos, error), ...] de las filas que agotaron reintentos."""
+        with self._lock:
+            return self._con.execute(
+                "SELECT codigo, intentos, error FROM filas WHERE estado='fallido' ORDER BY creado LIMIT ?",
+                (limite,),
+            ).fetchall()
+
+    def reintentar_fallidos(self) -> int:
+        with self._lock:
+            cur = self._con.execute(
+                "UPDATE filas SET estado='pendiente', intentos=0, proximo=?, actualizado=? WHERE estado='fallido'",
+                (time.time(), time.time()),
+            )
+        self._despertar.set()
+        return cur.rowcount
+
+    def textos(self, codigos: list[str]) -> dict[str, str]:
+        """{CODIGO: texto del reporte} de los `codigos` que lo tienen guardado."""
+        out: dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(codigos), 500):
+                lote = codigos[i:i + 500]
+                out.update(self._con.execute(
+                    f"SELECT codigo, texto FROM textos WHERE codigo IN ({','.join('?' * len(lote))})", lote
+                ).fetchall())
+        return out
+
+    def purgar_enviados(self, antiguedad_s: float = 7 * 24 * 3600,
+                        antiguedad_textos_s: float = 365 * 24 * 3600) -> int:
+        with self._lock:
+            cur = self._con.execute(
+                "DELETE FROM filas WHERE estado='enviado' AND actualizado < ?", (time.time() - antiguedad_s,)
+            )
+            self._con.execute("DELETE FROM textos WHERE creado < ?", (time.time() - antiguedad_textos_s,))
+        return cur.rowcount
+
+    # --- consumidor (hilo de fondo) ---
+    def _reclamar(self) -> list[tuple[str, list[str], int]]:
+        now = time.time()
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._con.execute(
+                    "SELECT codigo, fila, intentos FROM filas WHERE estado='pendiente' AND proximo <= ? "
+                    "ORDER BY creado, rowid LIMIT ?",
+                    (now, self.tam_lote),
+                ).fetchall()
+                self._con.executemany(
+                    "UPDATE filas SET estado='enviando', dueno=?, reclamado=?, actualizado=? WHERE codigo=?",
+                    [(self._dueno, now, now, c) for c, _, _ in rows],
+                )
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return [(c, json.loads(f), n) for c, f, n in rows]
+
+    def _marcar(self, codigos: list[str], estado: str, error: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            if estado == "enviado":
+                self._con.executemany(
+                    "UPDATE filas SET estado='enviado', error=NULL, actualizado=? WHERE codigo=?",
+                    [(now, c) for c in codigos],
+                )
+                return
+            # Falla: un mismo backoff para todo el lote (conserva el orden de las filas);
+            # tras max_intentos la fila queda "fallido"
+            intentos = {c: n + 1 for c, n in self._con.execute(
+                f"SELECT codigo, intentos FROM filas WHERE codigo IN ({','.join('?' * len(codigos))})", codigos
+            ).fetchall()}
+            if not intentos:
+                return
+            n = max(intentos.values())
+            proximo = now + random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** n))
+            self._con.executemany(
+                "UPDATE filas SET estado=?, intentos=?, error=?, proximo=?, actualizado=? WHERE codigo=?",
+                [("fallido" if i >= self.max_intentos else "pendiente", i, error, proximo, now, c)
+                 for c, i in intentos.items()],
+            )
+
+    def _recuperar_vencidos(self):
+        """Lotes "enviando" con el arriendo vencido (proceso caído): concilia contra la hoja."""
+        limite = time.time() - self.arriendo_s
+        with self._lock:
+            vencidos = [c for (c,) in self._con.execute(
+                "SELECT codigo FROM filas WHERE estado='enviando' AND reclamado < ?", (limite,)
+            ).fetchall()]
+        if not vencidos:
+            return
+        en_hoja = {(c or "").strip() for c in self.codigos_en_hoja()}
+        ya = [c for c in vencidos if c in en_hoja]
+        self._marcar(ya, "enviado")
+        with self._lock:
+            self._con.executemany(
+                "UPDATE filas SET estado='pendiente', proximo=? WHERE codigo=? AND estado='enviando'",
+                [(time.time(), c) for c in vencidos if c not in en_hoja],
+            )
+
+    def vaciar(self) -> int:
+        """Envía un lote (si hay). Retorna cuántas filas quedaron en la hoja."""
+        reclamado = self._reclamar()
+        if not reclamado:
+            return 0
+        lote = [(c, f) for c, f, _ in reclamado]
+        try:
+            if any(n for _, _, n in reclamado):
+                # Reenvío tras una falla: lo que la API aplicó sin responder ya está en la hoja
+                en_hoja = {(c or "").strip() for c in self.codigos_en_hoja()}
+                ya = [c for c, _ in lote if c in en_hoja]
+                if ya:
+                    self._marcar(ya, "enviado")
+                    lote = [(c, f) for c, f in lote if c not in en_hoja]
+                if not lote:
+                    return len(reclamado)
+            if self.medir:
+                with self.medir("hoja_append", filas=len(lote)):
+                    self.escribir([f for _, f in lote])
+            else:
+                self.escribir([f for _, f in lote])
+        except Exception as e:
+            self._marcar([c for c, _ in lote], "pendiente", error=f"{type(e).__name__}: {e}")
+            return 0
+        self._marcar([c for c, _ in lote], "enviado")
+        return len(reclamado)
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(self.intervalo_s)
+            self._despertar.clear()
+            time.sleep(self.ventana_s)  # junta las filas que llegan casi juntas en un solo append_rows
+            try:
+                self._recuperar_vencidos()
+                while self.vaciar() == self.tam_lote:
+                    pass
+            except Exception:
+                # Errores del journal o de la conciliación: se reintenta en la próxima vuelta
+                time.sleep(self.intervalo_s)
+
+    def iniciar(self) -> "ColaHoja":
+        """Arranca el hilo de vaciado (idempotente)."""
+        if self._hilo is None:
+            self.purgar_enviados()
+            self._hilo = threading.Thread(target=self._bucle, name="cola-hoja", daemon=True)
+            self._hilo.start()
+            self._despertar.set()  # vacía lo que haya quedado de una ejecución anterior
+        return self
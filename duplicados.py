@@ -0,0 +1,180 @@
+# ---------------------------
+# Detección de casi-duplicados antes de llamar al LLM: shingles + MinHash + LSH por bandas
+# ---------------------------
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Optional
+
+from procesamiento import TZ, ContextoReporte, calcula_tiempo_solucion
+
+PRIMO = (1 << 61) - 1
+K_SHINGLE = 5   # shingles de 5 caracteres: tolera cambios de orden y palabras sueltas
+# Filas sin texto original guardado (cargadas a mano, anteriores al journal): se indexa el
+# resumen del modelo, que solo se parece a reportes redactados de la misma forma
+COLS_TEXTO = (4, 5, 10, 11)   # Descripción, Sistema, Acción Inmediata, Solución
+
+if TYPE_CHECKING:
+    import numpy as np   # numpy se importa al construir el índice, no al cargar la app
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes ni dígitos (horas/fechas cambian entre reportes del mismo evento)."""
+    t = unicodedata.normalize("NFKD", (texto or "").lower())
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return re.sub(r"[^a-zñ]+", " ", t).strip()
+
+
+def shingles(texto: str, k: int = K_SHINGLE) -> "np.ndarray":
+    """Hashes (crc32, estables entre procesos) de los k-gramas de caracteres distintos."""
+    import numpy as np
+
+    t = normalizar(texto)
+    if len(t) <= k:
+        return np.array([zlib.crc32(t.encode())] if t else [], dtype=np.uint64)
+    return np.fromiter({zlib.crc32(t[i:i + k].encode()) for i in range(len(t) - k + 1)}, dtype=np.uint64)
+
+
+def texto_de_fila(fila: list[str]) -> str:
+    return " ".join(fila[i] for i in COLS_TEXTO if i < len(fila))
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    codigo: str
+    similitud: float     # Jaccard estimado por MinHash (0–1)
+    fila: tuple          # fila de la hoja (21 columnas), para reusar sus campos
+
+
+class IndiceDuplicados:
+    """
+    Índice en memoria (por proceso) de los incidentes recientes.
+
+    - Cada documento se resume en una firma MinHash de `num_perm` enteros; la firma se parte
+      en `bandas` y cada banda va a un dict hash→códigos (LSH). Buscar es armar la firma del
+      texto (vectorizado con numpy) y mirar solo los códigos que comparten alguna banda, así
+      el costo no crece con el historial.
+    - Guarda los últimos `max_docs` incidentes (los más viejos salen primero).
+    - sincronizar(espejo, textos): agrega las filas nuevas de la copia local de la hoja con
+      el texto original de cada reporte (`textos`, p. ej. ColaHoja.textos), así un reporte
+      reenviado coincide con su fila también tras un reinicio o desde otro proceso;
+      agregar(): los reportes de esta sesión.
+    """
+
+    def __init__(self, num_perm: int = 64, bandas: int = 16, umbral: float = 0.6,
+                 max_docs: int = 20000, semilla: int = 1):
+        import numpy as np
+
+        if num_perm % bandas:
+            raise ValueError("num_perm debe ser múltiplo de bandas")
+        self.num_perm = num_perm
+        self.bandas = bandas
+        self.filas_banda = num_perm // bandas
+        self.umbral = umbral
+        self.max_docs = max_docs
+        rng = np.random.default_rng(semilla)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._docs: OrderedDict[str, tuple["np.ndarray", tuple]] = OrderedDict()
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(bandas)]
+        self._version_espejo: Optional[int] = None
+        self._ultima_n = 0
+
+    def firma(self, texto: str) -> Optional["np.ndarray"]:
+        hs = shingles(texto)
+        if not hs.size:
+            return None
+        return ((hs[:, None] * self._a + self._b) % PRIMO).min(axis=0)
+
+    def _llaves(self, firma: "np.ndarray") -> list[bytes]:
+        r = self.filas_banda
+        return [firma[i * r:(i + 1) * r].tobytes() for i in range(self.bandas)]
+
+    # --- escritura ---
+    def _quitar(self, codigo: str):
+        firma, _ = self._docs.pop(codigo)
+        for banda, llave in zip(self._buckets, self._llaves(firma)):
+            grupo = banda.get(llave)
+            if grupo is not None:
+                grupo.discard(codigo)
+                if not grupo:
+                    del banda[llave]
+
+    def agregar(self, codigo: str, texto: str, fila: list[str]) -> bool:
+        codigo = (codigo or "").strip()
+        firma = self.firma(texto)
+        if not codigo or firma is None:
+            return False
+        with self._lock:
+            if codigo in self._docs:
+                self._quitar(codigo)
+            self._docs[codigo] = (firma, tuple(fila))
+            for banda, llave in zip(self._buckets, self._llaves(firma)):
+                banda.setdefault(llave, set()).add(codigo)
+            while len(self._docs) > self.max_docs:
+                self._quitar(next(iter(self._docs)))
+        return True
+
+    def sincronizar(self, espejo, textos: Optional[Callable[[list[str]], dict[str, str]]] = None) -> int:
+        """Indexa las filas de la copia local que todavía no están; retorna cuántas agregó."""
+        with self._sync_lock:
+            version = espejo.version
+            if version == self._version_espejo:
+                return 0
+            nuevas = espejo.filas_desde(self._ultima_n)
+            if not nuevas and espejo.ultima_fila() < self._ultima_n:
+                nuevas = espejo.filas_desde(0)   # la copia se releyó más corta: se vuelve a recorrer
+            pendientes = [(fila[0].strip(), fila) for _, fila in nuevas[-self.max_docs:]
+                          if fila and fila[0].strip() and fila[0].strip() not in self._docs]
+            originales = textos([c for c, _ in pendientes]) if textos and pendientes else {}
+            agregadas = 0
+            for codigo, fila in pendientes:
+                agregadas += self.agregar(codigo, originales.get(codigo) or texto_de_fila(fila), fila[:21])
+            if nuevas:
+                self._ultima_n = nuevas[-1][0]
+            self._version_espejo = version
+            return agregadas
+
+    # --- lectura ---
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def buscar(self, texto: str) -> Optional[Coincidencia]:
+        """El incidente más parecido con similitud ≥ umbral, o None."""
+        firma = self.firma(texto)
+        if firma is None:
+            return None
+        with self._lock:
+            candidatos: set[str] = set()
+            for banda, llave in zip(self._buckets, self._llaves(firma)):
+                candidatos |= banda.get(llave, set())
+            mejor = None
+            for codigo in candidatos:
+                f, fila = self._docs[codigo]
+                sim = float((f == firma).sum()) / self.num_perm
+                if sim >= self.umbral and (mejor is None or sim > mejor.similitud):
+                    mejor = Coincidencia(codigo, sim, fila)
+        return mejor
+
+
+def fila_reusada(base: tuple, ctx: ContextoReporte, ahora: Optional[datetime] = None) -> list[str]:
+    """
+    Fila nueva a partir de un duplicado: conserva lo que describe al incidente (sistema,
+    área, impacto, solución, …) y toma de ESTE reporte lo que cambia entre reportes (fechas
+    y modo de reporte). CODIGO queda vacío para asignarlo como siempre.
+    """
+    fila = list(base[:21]) + [""] * (21 - len(base[:21]))
+    fila[0] = ""
+    apertura, cierre = ctx.fechas
+    fila[1] = apertura or (ahora or datetime.now(TZ)).strftime("%Y-%m-%d %H:%M")
+    fila[2] = ctx.modo or fila[2]
+    fila[14] = cierre
+    fila[15] = calcula_tiempo_solucion(fila[1], cierre) or ctx.tiempo_desde_texto
+    fila[16] = "Cerrado" if cierre else "En investigación"
+    return fila
@@ -0,0 +1,182 @@
+# ---------------------------
+# Espejo local de la hoja "Reportes": SQLite, sincronización incremental por número de fila
+# ---------------------------
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+from almacen import conectar
+
+ULTIMA_COLUMNA = "V"   # CODIGO … Amenaza + "Hora de reporte" (22 columnas)
+
+
+class EspejoHoja:
+    """
+    Copia local de la hoja, compartida por todas las sesiones y procesos.
+
+    - sincronizar(): lee solo las filas nuevas (desde la última fila ya copiada, inclusive:
+      esa fila de solapamiento detecta ediciones/borrados en la cola de la hoja). Si no
+      coincide, o pasó `resync_s` desde la última copia completa, se relee toda la hoja.
+    - asegurar_fresco(): sincroniza solo si la copia tiene más de `max_edad_s`; así una vista
+      de página cuesta 0 lecturas a la API casi siempre (y a lo sumo un rango pequeño).
+    - version: cambia cada vez que cambian los datos (para memoizar cálculos derivados).
+
+    `leer(rango)` es p. ej. ClienteHoja.leer (lista de filas; celdas vacías finales recortadas).
+    """
+
+    def __init__(
+        self,
+        leer: Callable[[str], list[list[str]]],
+        db: str = "espejo_hoja.sqlite3",
+        max_edad_s: float = 60.0,
+        resync_s: float = 3600.0,
+    ):
+        self.leer = leer
+        self.max_edad_s = max_edad_s
+        self.resync_s = resync_s
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()   # una sola sincronización a la vez por proceso
+        self._df_cache: tuple[int, object] | None = None
+        self._con = conectar(db)
+        with self._lock:
+            self._con.executescript("""
+                CREATE TABLE IF NOT EXISTS filas (n INTEGER PRIMARY KEY, codigo TEXT, datos TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_filas_codigo ON filas(codigo);
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+            """)
+
+    # --- meta ---
+    def _meta(self, clave: str, default=None):
+        row = self._con.execute("SELECT valor FROM meta WHERE clave=?", (clave,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, clave: str, valor):
+        self._con.execute("INSERT OR REPLACE INTO meta(clave, valor) VALUES (?, ?)", (clave, json.dumps(valor)))
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._meta("version", 0)
+
+    def encabezado(self) -> list[str]:
+        with self._lock:
+            return self._meta("encabezado", [])
+
+    def edad_s(self) -> float:
+        with self._lock:
+            return time.time() - self._meta("sincronizado_en", 0.0)
+
+    def completa_en(self) -> float:
+        """Momento de la última copia completa (cambia cuando las filas pudieron moverse)."""
+        with self._lock:
+            return self._meta("completa_en", 0.0)
+
+    def invalidar(self):
+        """Marca la copia como vencida (p. ej. después de escribir en la hoja)."""
+        with self._lock:
+            self._set_meta("sincronizado_en", 0.0)
+
+    # --- sincronización ---
+    @staticmethod
+    def _ancho(filas: list[list[str]], ancho: int) -> list[list[str]]:
+        return [list(f) + [""] * (ancho - len(f)) if len(f) < ancho else list(f[:ancho]) for f in filas]
+
+    def _completa(self) -> int:
+        valores = self.leer(f"A1:{ULTIMA_COLUMNA}")
+        encabezado = list(valores[0]) if valores else []
+        filas = self._ancho(valores[1:], len(encabezado))
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.execute("DELETE FROM filas")
+                self._con.executemany(
+                    "INSERT INTO filas(n, codigo, datos) VALUES (?, ?, ?)",
+                    [(i + 2, f[0] if f else "", json.dumps(f, ensure_ascii=False)) for i, f in enumerate(filas)],
+                )
+                now = time.time()
+                self._set_meta("encabezado", encabezado)
+                self._set_meta("sincronizado_en", now)
+                self._set_meta("completa_en", now)
+                self._set_meta("version", self._meta("version", 0) + 1)
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return len(filas)
+
+    def _incremental(self) -> Optional[int]:
+        """Filas nuevas; None si la fila de solapamiento no coincide (hay que releer todo)."""
+        with self._lock:
+            encabezado = self._meta("encabezado", [])
+            ultima = self._con.execute("SELECT n, datos FROM filas ORDER BY n DESC LIMIT 1").fetchone()
+        if not encabezado:
+            return None
+        desde = ultima[0] if ultima else 1
+        valores = self.leer(f"A{desde}:{ULTIMA_COLUMNA}")
+        if not valores:
+            return None   # la hoja se achicó
+        esperada = json.loads(ultima[1]) if ultima else encabezado
+        if self._ancho(valores[:1], len(encabezado))[0] != self._ancho([esperada], len(encabezado))[0]:
+            return None
+        nuevas = self._ancho(valores[1:], len(encabezado))
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.executemany(
+                    "INSERT OR REPLACE INTO filas(n, codigo, datos) VALUES (?, ?, ?)",
+                    [(desde + 1 + i, f[0] if f else "", json.dumps(f, ensure_ascii=False))
+                     for i, f in enumerate(nuevas)],
+                )
+                self._set_meta("sincronizado_en", time.time())
+                if nuevas:
+                    self._set_meta("version", self._meta("version", 0) + 1)
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return len(nuevas)
+
+    def sincronizar(self, completa: bool = False) -> int:
+        """Trae los cambios de la hoja. Retorna cuántas filas se copiaron."""
+        with self._sync_lock:
+            with self._lock:
+                completa_en = self._meta("completa_en", 0.0)
+            if not completa and time.time() - completa_en <= self.resync_s:
+                n = self._incremental()
+                if n is not None:
+                    return n
+            return self._completa()
+
+    def asegurar_fresco(self) -> "EspejoHoja":
+        if self.edad_s() > self.max_edad_s:
+            self.sincronizar()
+        return self
+
+    # --- lectura ---
+    def codigos(self) -> list[str]:
+        with self._lock:
+            return [c for (c,) in self._con.execute("SELECT codigo FROM filas ORDER BY n").fetchall()]
+
+    def filas(self) -> list[list[str]]:
+        with self._lock:
+            return [json.loads(d) for (d,) in self._con.execute("SELECT datos FROM filas ORDER BY n").fetchall()]
+
+    def filas_desde(self, n: int) -> list[tuple[int, list[str]]]:
+        """[(número de fila, fila), ...] posteriores a la fila `n` de la hoja."""
+        with self._lock:
+            return [(i, json.loads(d)) for i, d in
+                    self._con.execute("SELECT n, datos FROM filas WHERE n > ? ORDER BY n", (n,)).fetchall()]
+
+    def ultima_fila(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COALESCE(MAX(n), 0) FROM filas").fetchone()[0]
+
+    def dataframe(self):
+        """DataFrame (object) con las columnas del encabezado; memoizado por version."""
+        import pandas as pd
+
+        version = self.version
+        if self._df_cache is None or self._df_cache[0] != version:
+            self._df_cache = (version, pd.DataFrame(self.filas(), columns=self.encabezado() or None, dtype=object))
+        return self._df_cache[1]
@@ -0,0 +1,140 @@
+# ---------------------------
+# Cliente de la hoja por proceso: una autenticación, conexiones HTTP reutilizadas,
+# reconexión ante credenciales rechazadas y lecturas por rangos acotados (batch_get)
+# ---------------------------
+import re
+import threading
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional
+
+BLOQUE_FILAS = 2000     # filas por rango en batch_get
+POOL_CONEXIONES = 10    # conexiones HTTP abiertas por proceso (hilo de la cola + sesiones)
+RANGO_ABIERTO_RE = re.compile(r"^([A-Z]+)(\d+):([A-Z]+)$")   # "A120:V" (sin fila final)
+ERRORES_CONEXION = {"ConnectionError", "TransportError", "ChunkedEncodingError", "RemoteDisconnected"}
+
+
+def abrir_worksheet(credenciales: dict, sheet_id: str, nombre: str, pool: int = POOL_CONEXIONES):
+    """
+    Autentica con la Service Account y abre la hoja (OAuth + metadatos: una vez).
+    gspread usa una AuthorizedSession de google-auth: el token se renueva solo antes de
+    vencer, y la sesión de requests mantiene las conexiones vivas (keep-alive); aquí solo
+    se agranda el pool para que los hilos no abran conexiones nuevas.
+    """
+    import gspread
+    from requests.adapters import HTTPAdapter
+
+    gc = gspread.service_account_from_dict(credenciales)
+    # gspread ≥ 6: gc.http_client.session; versiones anteriores: gc.session
+    sesion = getattr(getattr(gc, "http_client", None), "session", None) or getattr(gc, "session", None)
+    if sesion is not None:
+        sesion.mount("https://", HTTPAdapter(pool_connections=pool, pool_maxsize=pool))
+    return gc.open_by_key(sheet_id).worksheet(nombre)
+
+
+def es_error_credenciales(e: BaseException) -> bool:
+    if type(e).__name__ == "RefreshError":
+        return True
+    return getattr(getattr(e, "response", None), "status_code", None) == 401
+
+
+def es_error_conexion(e: BaseException) -> bool:
+    return isinstance(e, ConnectionError) or type(e).__name__ in ERRORES_CONEXION
+
+
+class ClienteHoja:
+    """
+    Manejador de la hoja compartido por todas las sesiones del proceso.
+
+    - conectar() abre el worksheet; se llama en el primer uso y otra vez solo si la API
+      rechaza las credenciales (401 / RefreshError) o, en lecturas, si se cortó la conexión.
+      La llamada se repite una vez con el worksheet nuevo.
+    - Escrituras (append_rows, eliminar_filas): se repiten solo tras un 401 (la API no las
+      aplicó); un corte a mitad de append_rows se propaga sin reintentar. ColaHoja.vaciar
+      relee la columna CODIGO antes de reenviar ese lote, así que la fila queda una sola vez.
+    - leer(rango): un rango abierto ("A120:V") se lee con batch_get en rangos de
+      `bloque_filas` filas hasta el tamaño conocido de la grilla; nunca se pide la columna
+      entera. Si el último bloque vuelve lleno (la hoja creció más), se sigue con el siguiente.
+    """
+
+    def __init__(
+        self,
+        conectar: Callable[[], object],
+        bloque_filas: int = BLOQUE_FILAS,
+        medir: Optional[Callable[..., ContextManager]] = None,
+    ):
+        self._conectar = conectar
+        self.bloque_filas = bloque_filas
+        self.medir = medir
+        self._lock = threading.Lock()
+        self._ws = None
+        self.reconexiones = 0
+
+    def worksheet(self):
+        with self._lock:
+            if self._ws is None:
+                self._ws = self._conectar()
+            return self._ws
+
+    def _descartar(self, ws):
+        with self._lock:
+            if self._ws is ws:   # si otro hilo ya reconectó, se usa su worksheet
+                self._ws = None
+                self.reconexiones += 1
+
+    def _llamar(self, etapa: str, fn: Callable, escritura: bool = False, **campos):
+        ws = self.worksheet()
+        with (self.medir(etapa, **campos) if self.medir else nullcontext()):
+            try:
+                return fn(ws)
+            except Exception as e:
+                if not (es_error_credenciales(e) or (not escritura and es_error_conexion(e))):
+                    raise
+                self._descartar(ws)
+            return fn(self.worksheet())
+
+    # --- API ---
+    def batch_get(self, rangos: list[str]) -> list[list[list[str]]]:
+        return self._llamar("hoja_lectura", lambda ws: ws.batch_get(rangos), rangos=len(rangos))
+
+    def append_rows(self, filas: list[list[str]], **kwargs):
+        return self._llamar("hoja_escritura", lambda ws: ws.append_rows(filas, **kwargs), escritura=True,
+                            filas=len(filas))
+
+    def eliminar_filas(self, tramos: list[tuple[int, int]]):
+        """
+        Borra los tramos de filas [(inicio, fin), ...] (1-based, inclusive) en un solo
+        batch_update. Se aplican en el orden dado: van de abajo hacia arriba para que los
+        números de los tramos siguientes no se corran.
+        """
+        def borrar(ws):
+            pedidos = [{"deleteDimension": {"range": {
+                "sheetId": ws.id, "dimension": "ROWS", "startIndex": a - 1, "endIndex": b,
+            }}} for a, b in tramos]
+            return ws.spreadsheet.batch_update({"requests": pedidos})
+        return self._llamar("hoja_escritura", borrar, escritura=True, filas=sum(b - a + 1 for a, b in tramos))
+
+    def leer(self, rango: str) -> list[list[str]]:
+        """Filas de `rango` (celdas vacías finales recortadas, como ws.get)."""
+        m = RANGO_ABIERTO_RE.match(rango)
+        if not m:
+            return [list(f) for f in self.batch_get([rango])[0]]
+        col_ini, desde, col_fin = m.group(1), int(m.group(2)), m.group(3)
+        # row_count viene de los metadatos que se leyeron al abrir (no cuesta una llamada) y
+        # queda viejo cuando la hoja crece: se pide un bloque de más en la misma llamada
+        hasta = max(int(getattr(self.worksheet(), "row_count", 0) or 0), desde) + self.bloque_filas - 1
+        filas: list[list[str]] = []
+        while True:
+            inicios = range(desde, hasta + 1, self.bloque_filas)
+            tamanos = [min(self.bloque_filas, hasta - i + 1) for i in inicios]
+            bloques = self.batch_get([f"{col_ini}{i}:{col_fin}{i + n - 1}" for i, n in zip(inicios, tamanos)])
+            for valores, n in zip(bloques, tamanos):
+                # batch_get recorta las filas vacías del final de cada bloque: se rellenan
+                # para que el bloque siguiente empiece en su fila
+                filas.extend(list(f) for f in valores)
+                filas.extend([] for _ in range(n - len(valores)))
+            if len(bloques[-1]) < tamanos[-1]:
+                break
+            desde, hasta = hasta + 1, hasta + self.bloque_filas
+        while filas and not any(filas[-1]):
+            filas.pop()
+        return filas
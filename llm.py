@@ -0,0 +1,570 @@
+# ---------------------------
+# Cliente LLM compartido: límite de tasa, reintentos con backoff, timeout y circuit breaker
+# ---------------------------
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Optional
+
+# Códigos HTTP/gRPC que vale la pena reintentar (cuota, sobrecarga, errores transitorios)
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+}
+
+
+class LLMError(Exception):
+    """Error del cliente LLM (después de agotar reintentos o por protección)."""
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class RateLimitedError(LLMError):
+    pass
+
+
+class LLMSaturado(LLMError):
+    """Demasiadas llamadas abandonadas por timeout siguen ocupando hilos: se falla sin esperar."""
+
+
+class CircuitOpenError(LLMError):
+    def __init__(self, retry_in: float):
+        super().__init__(f"Servicio LLM saturado; reintenta en {max(1, math.ceil(retry_in))} s.")
+        self.retry_in = retry_in
+
+
+class PresupuestoExcedido(LLMError):
+    def __init__(self, tokens: int, maximo: int):
+        super().__init__(f"El reporte tiene ~{tokens:,} tokens (máximo {maximo:,}); recórtalo antes de enviarlo.")
+        self.tokens = tokens
+        self.maximo = maximo
+
+
+def es_reintentable(e: BaseException) -> bool:
+    if isinstance(e, (LLMTimeout, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(e, "code", None)
+    code = getattr(code, "value", code)  # grpc.StatusCode o int
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return type(e).__name__ in RETRYABLE_NAMES
+
+
+class TokenBucket:
+    """Límite de tasa por proceso (todas las sesiones comparten el mismo bucket)."""
+
+    def __init__(self, rate_per_s: float, capacity: int):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _espera(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+        self._t = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, max_wait: float) -> None:
+        limite = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                wait = self._espera()
+            if wait == 0.0:
+                return
+            if time.monotonic() + wait > limite:
+                raise RateLimitedError("Límite de solicitudes al LLM alcanzado; intenta en unos segundos.")
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    closed → (N fallas seguidas) → open → (cooldown) → half-open (una prueba) → closed/open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self._fallas = 0
+        self._abierto_en = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def antes(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                restante = self._abierto_en + self.cooldown_s - time.monotonic()
+                if restante > 0:
+                    raise CircuitOpenError(restante)
+                self.state = "half-open"
+            if self.state == "half-open":
+                if self._prueba_en_curso:
+                    raise CircuitOpenError(self.cooldown_s)
+                self._prueba_en_curso = True
+
+    def exito(self) -> None:
+        with self._lock:
+            self.state, self._fallas, self._prueba_en_curso = "closed", 0, False
+
+    def neutral(self) -> None:
+        """La llamada no dice nada del servicio (error del pedido): solo libera la prueba half-open."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def falla(self) -> None:
+        with self._lock:
+            self._fallas += 1
+            if self.state == "half-open" or self._fallas >= self.failure_threshold:
+                self.state = "open"
+                self._abierto_en = time.monotonic()
+            self._prueba_en_curso = False
+
+
+# ---------------------------
+# Presupuesto de tokens de entrada
+# ---------------------------
+def estimar_tokens(texto: str) -> int:
+    """Estimación local sin red (~4 caracteres por token, suficiente para avisar a tiempo)."""
+    return math.ceil(len(texto or "") / 4)
+
+
+class PresupuestoTokens:
+    """
+    Límites por reporte (solo la parte variable: la instrucción fija va aparte).
+    - aviso: se avisa al analista pero se envía igual.
+    - maximo: no se envía (PresupuestoExcedido).
+    """
+
+    def __init__(self, aviso: int = 2000, maximo: int = 8000):
+        self.aviso = aviso
+        self.maximo = maximo
+
+    def revisar(self, texto: str) -> tuple[int, str]:
+        """(tokens estimados, "ok" | "aviso" | "excede")."""
+        tokens = estimar_tokens(texto)
+        if tokens > self.maximo:
+            return tokens, "excede"
+        return tokens, "aviso" if tokens > self.aviso else "ok"
+
+    def exigir(self, texto: str) -> int:
+        tokens, nivel = self.revisar(texto)
+        if nivel == "excede":
+            raise PresupuestoExcedido(tokens, self.maximo)
+        return tokens
+
+
+class LLMClient:
+    """
+    Envoltorio único sobre un modelo con interfaz generate_content(contents, generation_config=...).
+    Todas las llamadas (smoke test, Reportar, importación masiva) pasan por aquí.
+    Varios clientes (p. ej. uno por instrucción de sistema) pueden compartir bucket y breaker.
+
+    Una llamada que vence el timeout no se puede abortar: su hilo sigue ocupado hasta que el
+    modelo responda. Con `max_abandonados` de esas llamadas en curso, los pedidos nuevos
+    fallan enseguida (LLMSaturado) en vez de quedar en la cola del pool y vencer sin llegar
+    al modelo.
+    """
+
+    def __init__(
+        self,
+        model,
+        rate_per_min: float = 60,
+        burst: int = 10,
+        timeout_s: float = 60.0,
+        max_retries: int = 4,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None,
+        bucket: Optional[TokenBucket] = None,
+        max_workers: int = 8,
+        max_abandonados: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.model = model
+        self.bucket = bucket or TokenBucket(rate_per_min / 60.0, burst)
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.breaker = breaker or CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self.max_abandonados = max(1, max_workers // 2) if max_abandonados is None else max_abandonados
+        self._abandonados = 0
+        self._abandonados_lock = threading.Lock()
+        self._sleep = sleep
+
+    def _backoff(self, intento: int) -> float:
+        # "full jitter": uniforme entre 0 y base·2^intento (acotado)
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** intento))
+
+    @property
+    def abandonados(self) -> int:
+        """Llamadas que vencieron el timeout y todavía ocupan un hilo del pool."""
+        with self._abandonados_lock:
+            return self._abandonados
+
+    def _liberar(self, _fut):
+        with self._abandonados_lock:
+            self._abandonados -= 1
+
+    def _con_timeout(self, fn: Callable, timeout_s: float):
+        fut = self._pool.submit(fn)
+        try:
+            return fut.result(timeout=timeout_s)
+        except FutureTimeout:
+            if not fut.cancel():
+                # Ya estaba corriendo: su hilo queda ocupado hasta que el modelo responda
+                with self._abandonados_lock:
+                    self._abandonados += 1
+                fut.add_done_callback(self._liberar)
+            raise LLMTimeout(f"El modelo no respondió en {timeout_s:g} s.")
+
+    def _llamar(self, contents, generation_config, timeout_s: float, kwargs: dict):
+        return self._con_timeout(
+            lambda: self.model.generate_content(contents, generation_config=generation_config, **kwargs), timeout_s
+        )
+
+    def generate_content(self, contents, generation_config=None, timeout_s: Optional[float] = None, **kwargs):
+        timeout_s = timeout_s or self.timeout_s
+        return self._con_reintentos(lambda: self._llamar(contents, generation_config, timeout_s, kwargs), timeout_s)
+
+    def generate_stream(self, contents, generation_config=None, timeout_s: Optional[float] = None, **kwargs):
+        """
+        Como generate_content(..., stream=True): genera los fragmentos a medida que llegan.
+        Límite de tasa, breaker y reintentos cubren hasta el PRIMER fragmento; una falla a
+        mitad del stream cuenta como falla del servicio y se propaga (ya hubo salida parcial).
+        Cerrar el generador (close()) cierra también el stream del modelo.
+        `timeout_s` aplica al primer fragmento y a la espera entre fragmentos.
+        """
+        timeout_s = timeout_s or self.timeout_s
+
+        def _abrir():
+            it = iter(self.model.generate_content(contents, generation_config=generation_config, stream=True, **kwargs))
+            return it, next(it, None)
+
+        it, primero = self._con_reintentos(lambda: self._con_timeout(_abrir, timeout_s), timeout_s)
+        try:
+            if primero is None:
+                return
+            yield primero
+            while True:
+                try:
+                    fragmento = self._con_timeout(lambda: next(it, None), timeout_s)
+                except Exception:
+                    self.breaker.falla()
+                    raise
+                if fragmento is None:
+                    return
+                yield fragmento
+        finally:
+            # Si quien consume abandona el stream (close()), se corta también el del modelo
+            cerrar = getattr(it, "close", None)
+            if cerrar:
+                try:
+                    cerrar()
+                except ValueError:
+                    pass   # tras un timeout el iterador sigue ocupado en un hilo del pool
+
+    def _con_reintentos(self, llamar: Callable, timeout_s: float):
+        ultimo: Optional[BaseException] = None
+        for intento in range(self.max_retries + 1):
+            abandonados = self.abandonados
+            if abandonados >= self.max_abandonados:
+                raise LLMSaturado(f"Hay {abandonados} llamadas al modelo sin responder; intenta en unos segundos.")
+            self.bucket.acquire(max_wait=timeout_s)
+            self.breaker.antes()
+            try:
+                resp = llamar()
+            except Exception as e:
+                ultimo = e
+                if not es_reintentable(e):
+                    # Error del pedido (p. ej. 400): no dice nada del servicio, no cuenta ni
+                    # como falla ni como éxito (un 4xx en medio de 5xx no debe cerrar el circuito)
+                    self.breaker.neutral()
+                    raise
+                self.breaker.falla()
+                if intento < self.max_retries:
+                    self._sleep(self._backoff(intento))
+                continue
+            self.breaker.exito()
+            return resp
+        raise LLMError(f"El modelo falló tras {self.max_retries + 1} intentos: {ultimo}") from ultimo
+
+
+# ---------------------------
+# Cobertura (hedging): segundo pedido a otra región/modelo si el primario tarda más de lo usual
+# ---------------------------
+class VentanaLatencias:
+    """Últimas `n` latencias del primario; el plazo de cobertura es un percentil de estas."""
+
+    def __init__(self, n: int = 200):
+        self._muestras: deque[float] = deque(maxlen=n)
+        self._lock = threading.Lock()
+
+    def agregar(self, segundos: float) -> None:
+        with self._lock:
+            self._muestras.append(segundos)
+
+    def __len__(self) -> int:
+        return len(self._muestras)
+
+    def percentil(self, q: float) -> Optional[float]:
+        with self._lock:
+            orden = sorted(self._muestras)
+        if not orden:
+            return None
+        return orden[min(len(orden) - 1, int(q * len(orden)))]
+
+
+class LLMCubierto:
+    """
+    Misma interfaz que LLMClient (generate_content / generate_stream) sobre dos clientes:
+    `primario` y `respaldo` (otra región o un modelo más liviano, con su propio breaker).
+
+    - Si el primario no respondió dentro del plazo (percentil `percentil` de sus latencias
+      recientes, por separado para respuesta completa y primer fragmento; acotado a [plazo_min_s, plazo_max_s]; `plazo_inicial_s` hasta juntar
+      `min_muestras`), se lanza el mismo pedido al respaldo.
+    - Gana la primera respuesta que pase `valida` (p. ej. 21 campos); si el primario falla
+      o responde algo inválido antes del plazo, el respaldo sale de inmediato. La perdedora
+      se cancela: si no empezó no sale, y si ya está en vuelo su resultado se descarta.
+    - Un pedido perdedor ya en vuelo ocupa su hilo hasta terminar (la llamada síncrona de
+      Vertex no se puede abortar): los pools de los clientes deben tener holgura.
+    - En stream gana el primer fragmento (la validez se conoce recién al final); el stream
+      perdedor se cierra apenas entrega su primer fragmento.
+    - Tope de gasto: cada pedido suma `max_fraccion` de crédito (hasta `rafaga`) y cada
+      cobertura consume 1, así el respaldo recibe a lo sumo ~max_fraccion de los pedidos.
+    - contar(resultado): "disparada" | "ganada" | "perdida" | "tope" | "sin_cobertura".
+    """
+
+    def __init__(
+        self,
+        primario: LLMClient,
+        respaldo: LLMClient,
+        valida: Callable[[object], bool] = lambda resp: True,
+        percentil: float = 0.9,
+        plazo_inicial_s: float = 8.0,
+        plazo_min_s: float = 1.0,
+        plazo_max_s: float = 30.0,
+        min_muestras: int = 20,
+        max_fraccion: float = 0.1,
+        rafaga: float = 3.0,
+        contar: Optional[Callable[[str], None]] = None,
+        max_workers: int = 32,
+    ):
+        self.primario = primario
+        self.respaldo = respaldo
+        self.valida = valida
+        self.percentil = percentil
+        self.plazo_inicial_s = plazo_inicial_s
+        self.plazo_min_s = plazo_min_s
+        self.plazo_max_s = plazo_max_s
+        self.min_muestras = min_muestras
+        self.max_fraccion = max_fraccion
+        self.rafaga = rafaga
+        # Respuesta completa y primer fragmento del stream tienen distribuciones distintas
+        self.latencias = {"completa": VentanaLatencias(), "stream": VentanaLatencias()}
+        self.conteos: dict[str, int] = {}
+        self._contar = contar
+        self._credito = rafaga
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-cobertura")
+
+    # --- plazo y tope ---
+    def plazo_s(self, tipo: str = "completa") -> float:
+        ventana = self.latencias[tipo]
+        if len(ventana) < self.min_muestras:
+            return self.plazo_inicial_s
+        return min(self.plazo_max_s, max(self.plazo_min_s, ventana.percentil(self.percentil)))
+
+    def _registrar(self, resultado: str) -> None:
+        with self._lock:
+            self.conteos[resultado] = self.conteos.get(resultado, 0) + 1
+        if self._contar:
+            self._contar(resultado)
+
+    def _sumar_credito(self) -> None:
+        with self._lock:
+            self._credito = min(self.rafaga, self._credito + self.max_fraccion)
+
+    def _tomar_credito(self) -> bool:
+        with self._lock:
+            if self._credito < 1:
+                return False
+            self._credito -= 1
+        return True
+
+    def _medido(self, tipo: str, fn: Callable):
+        t0 = time.monotonic()
+        try:
+            return fn(self.primario)
+        finally:
+            self.latencias[tipo].agregar(time.monotonic() - t0)
+
+    # --- carrera ---
+    def _carrera(self, tipo: str, fn: Callable, valida: Callable[[object], bool],
+                 al_perder: Callable = lambda r: None):
+        self._sumar_credito()
+        prim = self._pool.submit(self._medido, tipo, fn)
+        try:
+            r = prim.result(timeout=self.plazo_s(tipo))
+            if valida(r):
+                return r
+        except Exception:
+            pass   # sin respuesta en el plazo, o error del primario (ya reintentado por LLMClient)
+        if not self._tomar_credito():
+            self._registrar("tope")
+            return prim.result()
+        self._registrar("disparada")
+        resp = self._pool.submit(fn, self.respaldo)
+        pendientes = {prim: "perdida", resp: "ganada"}
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                resultado = pendientes.pop(fut)
+                if fut.exception() is None and valida(fut.result()):
+                    for otro in pendientes:
+                        if not otro.cancel():
+                            otro.add_done_callback(lambda f: f.exception() is None and al_perder(f.result()))
+                    self._registrar(resultado)
+                    return fut.result()
+        # Ninguna válida: la del primario (si respondió), para que el pipeline la repare
+        self._registrar("sin_cobertura")
+        return prim.result() if prim.exception() is None else resp.result()
+
+    def generate_content(self, contents, generation_config=None, timeout_s: Optional[float] = None, **kwargs):
+        return self._carrera(
+            "completa",
+            lambda c: c.generate_content(contents, generation_config=generation_config, timeout_s=timeout_s, **kwargs),
+            self.valida,
+        )
+
+    def generate_stream(self, contents, generation_config=None, timeout_s: Optional[float] = None, **kwargs):
+        def _abrir(c: LLMClient):
+            it = c.generate_stream(contents, generation_config=generation_config, timeout_s=timeout_s, **kwargs)
+            return it, next(it, None)
+
+        def _cerrar(abierto):
+            abierto[0].close()
+
+        it, primero = self._carrera("stream", _abrir, lambda abierto: abierto[1] is not None, al_perder=_cerrar)
+        if primero is None:
+            return
+        yield primero
+        yield from it
+
+
+# ---------------------------
+# Modelo falso local (pruebas de carga / desarrollo sin Vertex)
+# ---------------------------
+class ErrorFalso(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"{code} error simulado")
+        self.code = code
+
+
+class UsoFalso:
+    """Imita usage_metadata de Vertex."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class RespuestaFalsa:
+    def __init__(self, text: str, usage_metadata: Optional[UsoFalso] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class ConteoFalso:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+def latencia_lognormal(mediana_s: float, sigma: float = 0.5) -> Callable[[random.Random], float]:
+    """Latencia típica de un servicio: mediana `mediana_s`, cola derecha según `sigma`."""
+    return lambda rnd: rnd.lognormvariate(math.log(mediana_s), sigma)
+
+
+def latencia_con_cola(base_s: tuple[float, float], p_lento: float, lento_s: tuple[float, float]
+                      ) -> Callable[[random.Random], float]:
+    """Uniforme en `base_s`, salvo una fracción `p_lento` de respuestas uniformes en `lento_s`."""
+    return lambda rnd: rnd.uniform(*(lento_s if rnd.random() < p_lento else base_s))
+
+
+def _texto_de(contents) -> str:
+    return "".join(contents) if isinstance(contents, (list, tuple)) else str(contents or "")
+
+
+class ModeloFalso:
+    """
+    Imita GenerativeModel.generate_content con latencia y errores inyectados.
+    - latencia_s: (min, max) segundos, uniforme; o función Random → segundos
+      (latencia_lognormal, latencia_con_cola)
+    - tasa_error: probabilidad de lanzar ErrorFalso(codigo_error)
+    - respuesta: texto fijo o función contents → texto
+    - system_instruction: como en GenerativeModel; cuenta como tokens de entrada en cada llamada
+    Cuenta tokens con estimar_tokens: usage_metadata en cada respuesta, count_tokens() y
+    los acumulados tokens_entrada / tokens_salida.
+    Con stream=True la latencia es el tiempo al primer fragmento; luego llegan `fragmentos`
+    trozos separados por `latencia_fragmento_s` (usage_metadata va en el último).
+    """
+
+    def __init__(self, respuesta="", latencia_s=(0.0, 0.0), tasa_error=0.0, codigo_error=429, seed=None,
+                 system_instruction=None, fragmentos: int = 8, latencia_fragmento_s: float = 0.0):
+        self.respuesta = respuesta
+        self.latencia_s = latencia_s
+        self.tasa_error = tasa_error
+        self.codigo_error = codigo_error
+        self.system_instruction = system_instruction
+        self.fragmentos = fragmentos
+        self.latencia_fragmento_s = latencia_fragmento_s
+        self.llamadas = 0
+        self.tokens_entrada = self.tokens_salida = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count_tokens(self, contents) -> ConteoFalso:
+        return ConteoFalso(estimar_tokens(_texto_de(self.system_instruction) + _texto_de(contents)))
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream(contents)
+        return self._generar(contents)
+
+    def _stream(self, contents):
+        resp = self._generar(contents)
+        texto, n = resp.text, max(1, self.fragmentos)
+        paso = max(1, math.ceil(len(texto) / n))
+        trozos = [texto[i:i + paso] for i in range(0, len(texto), paso)] or [""]
+        for i, trozo in enumerate(trozos):
+            if i:
+                time.sleep(self.latencia_fragmento_s)
+            yield RespuestaFalsa(trozo, resp.usage_metadata if i == len(trozos) - 1 else None)
+
+    def _generar(self, contents) -> RespuestaFalsa:
+        with self._lock:
+            self.llamadas += 1
+            lat = self.latencia_s(self._rnd) if callable(self.latencia_s) else self._rnd.uniform(*self.latencia_s)
+            falla = self._rnd.random() < self.tasa_error
+        time.sleep(lat)
+        if falla:
+            raise ErrorFalso(self.codigo_error)
+        texto = self.respuesta(contents) if callable(self.respuesta) else self.respuesta
+        uso = UsoFalso(self.count_tokens(contents).total_tokens, estimar_tokens(texto))
+        with self._lock:
+            self.tokens_entrada += uso.prompt_token_count
+            self.tokens_salida += uso.candidates_token_count
+        return RespuestaFalsa(texto, uso)
@@ -0,0 +1,105 @@
+# ---------------------------
+# Importación masiva: muchos reportes → LLM + normalización en paralelo (acotado)
+# ---------------------------
+import csv
+import io
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from procesamiento import Medidor, procesar_respuestas_lote
+
+# Columnas aceptadas como texto del reporte en CSV / claves en JSONL
+CAMPOS_TEXTO = ("reporte", "descripcion", "descripción", "texto", "report")
+
+
+@dataclass
+class ResultadoLote:
+    indice: int
+    texto: str
+    fila: list[str] = field(default_factory=list)   # 21 columnas (CODIGO vacío) si salió bien
+    avisos: list[str] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and len(self.fila) == 21
+
+
+def _texto_de_registro(rec: dict) -> str:
+    for k, v in rec.items():
+        if (k or "").strip().lower() in CAMPOS_TEXTO:
+            return str(v or "")
+    return ""
+
+
+def leer_reportes(nombre: str, contenido: bytes) -> list[str]:
+    """
+    Extrae los textos libres de un archivo subido.
+    - .txt   → un reporte por párrafo (separados por línea en blanco)
+    - .csv   → columna 'reporte' (o 'descripcion'/'texto'); si no existe, la primera columna
+    - .jsonl → por línea, un string o un objeto con clave 'reporte'
+    """
+    texto = contenido.decode("utf-8-sig", errors="replace")
+    ext = nombre.lower().rsplit(".", 1)[-1]
+    reportes: list[str] = []
+    if ext == "csv":
+        filas = list(csv.reader(io.StringIO(texto)))
+        if not filas:
+            return []
+        cabecera = [c.strip().lower() for c in filas[0]]
+        col = next((i for i, c in enumerate(cabecera) if c in CAMPOS_TEXTO), None)
+        if col is None:
+            col, datos = 0, filas          # sin cabecera reconocible: todo es dato
+        else:
+            datos = filas[1:]
+        reportes = [f[col] for f in datos if len(f) > col]
+    elif ext == "jsonl":
+        for linea in texto.splitlines():
+            if not linea.strip():
+                continue
+            obj = json.loads(linea)
+            reportes.append(obj if isinstance(obj, str) else _texto_de_registro(obj))
+    else:
+        reportes = re.split(r"\n\s*\n", texto)
+    return [r.strip() for r in reportes if r and r.strip()]
+
+
+def procesar_lote(
+    textos: list[str],
+    generar: Callable[[str], str],
+    max_workers: int = 4,
+    medir: Optional[Medidor] = None,
+    reglas: Optional[Callable[[str], Optional[list[str]]]] = None,
+) -> list[ResultadoLote]:
+    """
+    Corre generar(texto) (la llamada al modelo) para cada reporte con a lo sumo
+    `max_workers` llamadas simultáneas, y luego normaliza/realinea todas las respuestas
+    juntas con procesar_respuestas_lote. Conserva el orden de entrada.
+    reglas(texto) → fila de 21 columnas o None: si da fila, ese reporte no pasa por el modelo.
+    """
+    resultados = [ResultadoLote(indice=i, texto=t) for i, t in enumerate(textos)]
+    if reglas is not None:
+        for res in resultados:
+            res.fila = reglas(res.texto) or []
+    pendientes = [res for res in resultados if not res.fila]
+
+    def _generar(res: ResultadoLote) -> Optional[str]:
+        try:
+            return generar(res.texto)
+        except Exception as e:
+            res.error = f"Error al generar contenido: {e}"
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+        respuestas = list(ex.map(_generar, pendientes))
+
+    ok = [(res, r) for res, r in zip(pendientes, respuestas) if r is not None]
+    procesados = procesar_respuestas_lote([res.texto for res, _ in ok], [r for _, r in ok], medir)
+    for (res, _), (fila, avisos, _) in zip(ok, procesados):
+        res.fila, res.avisos = fila, avisos
+        if len(fila) != 21:
+            res.error = f"La salida quedó con {len(fila)} columnas (esperado: 21)."
+    return resultados
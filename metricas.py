@@ -0,0 +1,241 @@
+# ---------------------------
+# Métricas por etapa: spans con tiempo, contadores/histogramas (formato Prometheus) y logs JSON
+# ---------------------------
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Optional
+
+from almacen import ruta_datos
+
+# Límites de los buckets del histograma de duración (segundos)
+BUCKETS_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TIPOS_TOKENS = {"prompt_token_count": "prompt", "candidates_token_count": "salida", "total_token_count": "total"}
+
+log = logging.getLogger("matriz.metricas")
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer   # solo si se usa servir()
+
+
+def _percentil(ordenados: list[float], q: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+class _Histograma:
+    def __init__(self):
+        self.cuentas = [0] * len(BUCKETS_S)
+        self.suma = 0.0
+        self.n = 0
+
+    def observar(self, v: float):
+        self.suma += v
+        self.n += 1
+        for i, limite in enumerate(BUCKETS_S):
+            if v <= limite:
+                self.cuentas[i] += 1
+                break
+
+
+class Metricas:
+    """
+    Registro por proceso (compartido por todas las sesiones).
+
+    - span(etapa): cronometra un bloque; alimenta el histograma de la etapa, cuenta errores
+      por tipo de excepción y emite una línea JSON en el logger "matriz.metricas".
+    - prometheus(): exposición en formato texto de Prometheus; se vuelca cada
+      `intervalo_archivo_s` a DATA_DIR/<archivo> (textfile collector) y opcionalmente
+      se sirve en un endpoint local con servir(puerto).
+    - resumen(): p50/p95 de las últimas `ventana` observaciones por etapa (panel admin).
+    """
+
+    def __init__(self, ventana: int = 500, archivo: Optional[str] = "metricas.prom",
+                 intervalo_archivo_s: float = 10.0):
+        self.ventana = ventana
+        self.archivo = archivo
+        self.intervalo_archivo_s = intervalo_archivo_s
+        self._lock = threading.Lock()
+        self._hist: dict[str, _Histograma] = {}
+        self._recientes: dict[str, deque] = {}
+        self._errores: dict[tuple[str, str], int] = {}
+        self._tokens: dict[str, int] = {}
+        self._contadores: dict[tuple[str, tuple], int] = {}
+        self._volcado_en = 0.0
+        self._servidor: Optional["ThreadingHTTPServer"] = None
+
+    # --- registro ---
+    @contextmanager
+    def span(self, etapa: str, **campos):
+        """
+        with metricas.span("llm", cache="miss") as s: ...
+        `s` es un dict: lo que se agregue dentro del bloque sale en el log JSON.
+        """
+        campos = dict(campos)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield campos
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            dur = time.perf_counter() - t0
+            self.observar(etapa, dur, error)
+            log.info(json.dumps(
+                {"ts": round(time.time(), 3), "etapa": etapa, "dur_ms": round(dur * 1e3, 2),
+                 "ok": error is None, "error": error, **campos},
+                ensure_ascii=False, default=str,
+            ))
+
+    def observar(self, etapa: str, dur_s: float, error: Optional[str] = None):
+        with self._lock:
+            self._hist.setdefault(etapa, _Histograma()).observar(dur_s)
+            self._recientes.setdefault(etapa, deque(maxlen=self.ventana)).append((dur_s, error is not None))
+            if error:
+                self._errores[(etapa, error)] = self._errores.get((etapa, error), 0) + 1
+        self.volcar_archivo()
+
+    def contar(self, nombre: str, **etiquetas):
+        """Contador genérico: matriz_<nombre>_total{etiquetas}."""
+        k = (nombre, tuple(sorted((e, str(v)) for e, v in etiquetas.items())))
+        with self._lock:
+            self._contadores[k] = self._contadores.get(k, 0) + 1
+        self.volcar_archivo()
+
+    def registrar_tokens(self, resp) -> dict[str, int]:
+        """Suma el usage_metadata de una respuesta de Vertex (si lo trae); retorna lo contado."""
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is None:
+            return {}
+        contados = {}
+        for attr, tipo in TIPOS_TOKENS.items():
+            v = getattr(usage, attr, None)
+            if isinstance(v, int):
+                contados[tipo] = v
+        with self._lock:
+            for tipo, v in contados.items():
+                self._tokens[tipo] = self._tokens.get(tipo, 0) + v
+        return contados
+
+    # --- lectura ---
+    def resumen(self) -> dict[str, dict]:
+        with self._lock:
+            recientes = {e: list(d) for e, d in self._recientes.items()}
+        out = {}
+        for etapa, obs in sorted(recientes.items()):
+            ordenados = sorted(d for d, _ in obs)
+            out[etapa] = {
+                "n": len(obs),
+                "p50_ms": _percentil(ordenados, 0.50) * 1e3,
+                "p95_ms": _percentil(ordenados, 0.95) * 1e3,
+                "errores": sum(1 for _, err in obs if err),
+            }
+        return out
+
+    def tokens(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._tokens)
+
+    def contadores(self, nombre: str) -> list[tuple[dict, int]]:
+        """[(etiquetas, cuenta), ...] del contador `nombre`."""
+        with self._lock:
+            return [(dict(et), c) for (n, et), c in sorted(self._contadores.items()) if n == nombre]
+
+    def prometheus(self) -> str:
+        with self._lock:
+            hist = {e: (list(h.cuentas), h.suma, h.n) for e, h in self._hist.items()}
+            errores = dict(self._errores)
+            tokens = dict(self._tokens)
+            contadores = dict(self._contadores)
+        lineas = [
+            "# HELP matriz_etapa_duracion_segundos Duración de cada etapa del registro de incidentes.",
+            "# TYPE matriz_etapa_duracion_segundos histogram",
+        ]
+        for etapa, (cuentas, suma, n) in sorted(hist.items()):
+            acumulado = 0
+            for limite, c in zip(BUCKETS_S, cuentas):
+                acumulado += c
+                lineas.append(f'matriz_etapa_duracion_segundos_bucket{{etapa="{etapa}",le="{limite:g}"}} {acumulado}')
+            lineas.append(f'matriz_etapa_duracion_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {n}')
+            lineas.append(f'matriz_etapa_duracion_segundos_sum{{etapa="{etapa}"}} {suma:.6f}')
+            lineas.append(f'matriz_etapa_duracion_segundos_count{{etapa="{etapa}"}} {n}')
+        lineas += [
+            "# HELP matriz_etapa_errores_total Etapas que terminaron con excepción, por tipo.",
+            "# TYPE matriz_etapa_errores_total counter",
+        ]
+        for (etapa, error), c in sorted(errores.items()):
+            lineas.append(f'matriz_etapa_errores_total{{etapa="{etapa}",error="{error}"}} {c}')
+        lineas += [
+            "# HELP matriz_llm_tokens_total Tokens reportados por el modelo (usage_metadata).",
+            "# TYPE matriz_llm_tokens_total counter",
+        ]
+        for tipo, c in sorted(tokens.items()):
+            lineas.append(f'matriz_llm_tokens_total{{tipo="{tipo}"}} {c}')
+        por_nombre: dict[str, list] = {}
+        for (nombre, etiquetas), c in sorted(contadores.items()):
+            por_nombre.setdefault(nombre, []).append((etiquetas, c))
+        for nombre, series in por_nombre.items():
+            lineas.append(f"# TYPE matriz_{nombre}_total counter")
+            for etiquetas, c in series:
+                et = ",".join(f'{e}="{v}"' for e, v in etiquetas)
+                lineas.append(f"matriz_{nombre}_total{{{et}}} {c}")
+        return "\n".join(lineas) + "\n"
+
+    # --- exportación ---
+    def volcar_archivo(self, forzar: bool = False):
+        """Escribe la exposición a DATA_DIR/<archivo> (atómico: tmp + rename), a lo sumo cada intervalo."""
+        if not self.archivo:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not forzar and now - self._volcado_en < self.intervalo_archivo_s:
+                return
+            self._volcado_en = now
+        ruta = ruta_datos(self.archivo)
+        tmp = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp, ruta)
+
+    def servir(self, puerto: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """Endpoint /metrics local en un hilo de fondo (idempotente)."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        if self._servidor is not None:
+            return self._servidor
+        metricas = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, puerto), _Handler)
+        threading.Thread(target=self._servidor.serve_forever, name="metricas-http", daemon=True).start()
+        return self._servidor
+
+
+def configurar_log_json(archivo: str = "metricas.jsonl") -> logging.Logger:
+    """Manda las líneas JSON de los spans a DATA_DIR/<archivo> (una vez por proceso)."""
+    ruta = str(ruta_datos(archivo))
+    if not any(getattr(h, "baseFilename", None) == os.path.abspath(ruta) for h in log.handlers):
+        h = logging.FileHandler(ruta, encoding="utf-8")
+        h.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(h)
+    log.setLevel(logging.INFO)
+    return log
@@ -0,0 +1,68 @@
+# ---------------------------
+# Tablero de incidentes: MTTR, conteos e Impacto por mes sobre la copia local de la hoja
+# (y, opcionalmente, el archivo histórico)
+# ---------------------------
+import pandas as pd
+import streamlit as st
+
+from analitica import agregados
+from recursos import get_archivo, get_espejo
+
+st.set_page_config(page_title="Tablero DSEC", layout="wide")
+st.title("TABLERO DE INCIDENTES DSEC")
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def calcular(version: tuple[int, int], _cargar) -> dict:
+    """
+    Agregados del tablero; se recalculan (y el DataFrame se arma, con _cargar()) solo cuando
+    cambia la versión de la copia (filas nuevas) o la del archivo (0 si no se incluye).
+    """
+    return agregados(_cargar())
+
+
+espejo = get_espejo().asegurar_fresco()
+archivo = get_archivo()
+historico = st.checkbox(f"Incluir archivo histórico ({len(archivo):,} incidentes cerrados)", value=False,
+                        disabled=not len(archivo))
+if historico:
+    datos = calcular((espejo.version, archivo.version),
+                     lambda: pd.concat([archivo.dataframe(), espejo.dataframe()], ignore_index=True))
+else:
+    datos = calcular((espejo.version, 0), espejo.dataframe)
+res = datos["resumen"]
+
+if not res["incidentes"]:
+    st.info("La hoja todavía no tiene incidentes.")
+    st.stop()
+
+c1, c2, c3 = st.columns(3)
+c1.metric("Incidentes", f"{res['incidentes']:,}")
+c2.metric("Abiertos", f"{res['abiertos']:,}")
+c3.metric("MTTR", f"{res['mttr_h']:.1f} h" if res["mttr_h"] is not None else "—")
+if pd.notna(res["desde"]):
+    st.caption(f"Apertura entre {res['desde']:%Y-%m-%d} y {res['hasta']:%Y-%m-%d}")
+
+st.subheader("MTTR por Sistema")
+st.dataframe(
+    datos["mttr_sistema"],
+    use_container_width=True,
+    column_config={
+        "mttr_h": st.column_config.NumberColumn("MTTR (h)", format="%.1f"),
+        "mediana_h": st.column_config.NumberColumn("Mediana (h)", format="%.1f"),
+    },
+)
+
+col_a, col_b = st.columns(2)
+with col_a:
+    st.subheader("Por Clasificación")
+    st.bar_chart(datos["por_clasificacion"])
+with col_b:
+    st.subheader("Por Area de GTIC")
+    st.bar_chart(datos["por_gtic"])
+
+st.subheader("Impacto por mes")
+st.area_chart(datos["impacto_mes"])
+
+st.caption(f"Copia de la hoja: versión {espejo.version} · sincronizada hace {espejo.edad_s():,.0f} s"
+           + (f" · archivo: versión {archivo.version}" if historico else ""))
@@ -0,0 +1,59 @@
+# ---------------------------
+# Búsqueda de incidentes: "¿ya vimos esto?" sobre Descripción, Sistema, Acción Inmediata y
+# Solución (hoja + archivo), con filtros por Clasificación, Impacto y fecha de apertura
+# ---------------------------
+from datetime import date
+
+import streamlit as st
+
+from recursos import get_archivo, get_espejo, get_indice_busqueda, get_metricas
+
+st.set_page_config(page_title="Buscar incidentes", layout="wide")
+st.title("BUSCAR INCIDENTES")
+
+metricas = get_metricas()
+indice = get_indice_busqueda()
+with metricas.span("busqueda_sync"):
+    indice.sincronizar(get_espejo().asegurar_fresco(), get_archivo())
+
+texto = st.text_input(
+    "Buscar", placeholder='servidor caído · "base de datos" · correo* · -prueba · sistema:vpn',
+    help='Todas las palabras deben aparecer (sin distinguir tildes ni mayúsculas). "Frase exacta", '
+         "prefijo*, -excluir, OR entre términos y campo:término (descripcion, sistema, accion, solucion).",
+)
+opciones = indice.opciones()
+c1, c2, c3, c4 = st.columns([2, 2, 2, 1])
+clasificacion = c1.multiselect("Clasificación", opciones["clasificacion"])
+impacto = c2.multiselect("Impacto", opciones["impacto"])
+rango = c3.date_input("Apertura", value=(), max_value=date.today(), format="YYYY-MM-DD")
+limite = c4.number_input("Máx.", min_value=10, max_value=1000, value=50, step=10)
+
+desde = hasta = None
+if isinstance(rango, (list, tuple)) and rango:
+    desde = rango[0].isoformat()
+    hasta = (rango[1] if len(rango) > 1 else rango[0]).isoformat()
+
+with metricas.span("busqueda") as s:
+    resultados = indice.buscar(texto, clasificacion, impacto, desde, hasta, limite=int(limite))
+    s["resultados"] = len(resultados)
+
+if not resultados:
+    st.info("Sin resultados." if (texto.strip() or clasificacion or impacto or desde) else "El índice todavía está vacío.")
+    st.stop()
+
+st.caption(f"{len(resultados)} incidentes" + (" (por relevancia)" if texto.strip() else " (más recientes primero)")
+           + f" · {len(indice):,} indexados")
+st.dataframe(
+    [{
+        "CODIGO": r.codigo, "Apertura": r.apertura, "Clasificación": r.clasificacion, "Impacto": r.impacto,
+        "Estado": r.estado, "Coincidencia": r.fragmento, "Origen": r.origen,
+    } for r in resultados],
+    use_container_width=True, hide_index=True,
+)
+
+elegido = st.selectbox("Detalle", [""] + [r.codigo for r in resultados], format_func=lambda c: c or "—")
+if elegido:
+    from procesamiento import COLUMNAS
+
+    r = next(r for r in resultados if r.codigo == elegido)
+    st.table({"Campo": COLUMNAS, "Valor": list(r.fila[:len(COLUMNAS)]) + [""] * (len(COLUMNAS) - len(r.fila))})
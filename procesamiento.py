@@ -0,0 +1,704 @@
+# ---------------------------
+# Procesamiento de reportes: salida del modelo → fila de 21 columnas
+# (sin Streamlit: se usa desde la UI, la importación masiva y en hilos)
+# ---------------------------
+import re
+import json
+from contextlib import nullcontext
+from functools import cached_property
+from typing import Callable, ContextManager, Optional
+from datetime import datetime
+
+from realineo import _looks_ciudad, _looks_estado, _looks_impacto, _looks_sistema, realinear, realinear_lote
+from reglas import Analisis, MotorReglas
+from temporal import TZ, Temporal, analizar_temporal, duracion
+
+COLUMNAS = [
+    "CODIGO","Fecha y Hora de Apertura","Modo Reporte","Evento/ Incidente",
+    "Descripción Evento/ Incidente","Sistema","Area","Ubicación","Impacto",
+    "Clasificación","Acción Inmediata","Solución","Area de GTIC - Coordinando",
+    "Encargado SI","Fecha y Hora de Cierre","Tiempo Solución","Estado",
+    "Vulnerabilidad","Causa","ID Amenaza","Amenaza"
+]
+
+# Valores válidos / normalizadores rápidos
+MODO_VALIDOS = {"correo","jira","teléfono","telefono","monitoreo","webex","whatsapp","otro"}
+IMPACTO_VALIDOS = {"alto","medio","bajo"}
+ESTADO_VALIDOS = {"cerrado","en investigación"}
+
+# ---------------------------
+# Guías (texto de referencia)
+# ---------------------------
+
+CODE_RE = re.compile(r'^\d+\.\d+$')
+
+# ---------------------------
+# Clasificaciones válidas (lista cerrada)
+# ---------------------------
+CLASIF_CANON = {
+    "acceso no autorizado": "Acceso no autorizado",
+    "modificación de recursos no autorizado": "Modificación de recursos no autorizado",
+    "uso inapropiado de recursos": "Uso inapropiado de recursos",
+    "no disponibilidad de recursos": "No disponibilidad de recursos",
+    "multicomponente": "Multicomponente",
+    "exploración de vulnerabilidades": "Exploración de Vulnerabilidades",
+    "otros": "Otros",
+}
+CLASIF_TEXTO = "\n".join([f"- {v}" for v in CLASIF_CANON.values()])
+
+# ---------------------------
+# Prompt (CODIGO lo genera backend y no se inventan fechas)
+# ---------------------------
+persona = f"""
+Eres un asistente experto en seguridad informática. Convierte el reporte en UNA SOLA LÍNEA con exactamente 21 valores separados por | (pipe). Sin encabezados, sin markdown, sin explicaciones, sin saltos de línea. Exactamente 20 pipes.
+{COLUMNAS}
+
+Reglas:
+- Las claves 18-21 ("Vulnerabilidad","Causa","ID Amenaza","Amenaza") siempre vacías.
+- No inventes fechas. Usa "YYYY-MM-DD HH:MM" solo si el texto menciona día/mes/año; si no, deja vacío.
+- Zona horaria: America/La_Paz. En el año 2025
+- NO inventes ni completes los campos 18 (Vulnerabilidad), 19 (Causa), 20 (ID Amenaza) y 21 (Amenaza).
+  Déjalos vacíos siempre.
+- NO inventes fechas: si el reporte no incluye una fecha explícita con día/mes/año (p. ej., "2025-08-10", "10/08/2025" o "10 de agosto de 2025"), deja vacíos los campos de fecha. Si solo hay horas, no pongas fecha.
+- Importante: NO uses el carácter | dentro de ningún campo. Si necesitas separar ideas usa ; (punto y coma).
+- Responde únicamente la línea con 21 campos separados por | (exactamente 20 pipes), sin comentarios ni texto adicional.
+
+Columnas y formato:
+1. CODIGO → (dejar vacío; lo genera el sistema).
+2. Fecha y Hora de Apertura → YYYY-MM-DD HH:MM, solo si se menciona (con día/mes/año explícitos).
+3. Modo Reporte → valores válidos (Correo, Jira, Teléfono, Monitoreo, …).
+4. Evento/ Incidente → Evento | Incidente.
+5. Descripción Evento/ Incidente → resumen claro y profesional.
+6. Sistema → (VPN, Correo, Active Directory, …).
+7. Area
+8. Ubicación
+9. Impacto → Alto | Medio | Bajo.
+10. Clasificación → elige exactamente UNO de: 
+{CLASIF_TEXTO}
+11. Acción Inmediata
+12. Solución
+13. Area de GTIC - Coordinando → (DSEC - Seguridad, DITC - Infraestructura, DSTC - Soporte Técnico, DISC - Sistemas, …).
+14. Encargado SI → solo si se menciona; no inventes nombres.
+15. Fecha y Hora de Cierre → YYYY-MM-DD HH:MM, solo si se menciona (con día/mes/año explícitos).
+16. Tiempo Solución → “X horas Y minutos” si puedes calcular (Cierre − Apertura); si no, vacío.
+17. Estado → Cerrado | En investigación.
+18. Vulnerabilidad → Vacio
+19. Causa → vacío.
+20. ID Amenaza → Vacio
+21. Amenaza → vacío.
+
+[REPORTE DE ENTRADA]:
+"""
+
+# ---------------------------
+# Modo de salida JSON con esquema (response_schema de Vertex): una clave por columna
+# ---------------------------
+MODO_OPCIONES = ["Correo","Jira","Teléfono","Monitoreo","Webex","WhatsApp","Otro"]
+ENUMS_JSON = {
+    "Modo Reporte": MODO_OPCIONES,
+    "Evento/ Incidente": ["Evento","Incidente"],
+    "Impacto": ["Alto","Medio","Bajo"],
+    "Clasificación": list(CLASIF_CANON.values()),
+    "Estado": ["Cerrado","En investigación"],
+}
+ESQUEMA_FILA = {
+    "type": "OBJECT",
+    "properties": {
+        col: ({"type": "STRING", "enum": ENUMS_JSON[col]} if col in ENUMS_JSON else {"type": "STRING"})
+        for col in COLUMNAS
+    },
+    "required": COLUMNAS,
+}
+
+persona_json = f"""
+Eres un asistente experto en seguridad informática. Convierte el reporte en UN objeto JSON con exactamente estas claves:
+{COLUMNAS}
+
+Reglas:
+- "CODIGO", "Vulnerabilidad", "Causa", "ID Amenaza" y "Amenaza" siempre "" (vacías).
+- No inventes fechas. Usa "YYYY-MM-DD HH:MM" solo si el texto menciona día/mes/año; si no, "". Si solo hay horas, no pongas fecha.
+- Zona horaria: America/La_Paz. En el año 2025
+- "Descripción Evento/ Incidente" → resumen claro y profesional.
+- "Sistema" → (VPN, Correo, Active Directory, …). "Area" y "Ubicación" → tal como se mencionan.
+- "Clasificación" → exactamente UNO de:
+{CLASIF_TEXTO}
+- "Area de GTIC - Coordinando" → (DSEC - Seguridad, DITC - Infraestructura, DSTC - Soporte Técnico, DISC - Sistemas, …).
+- "Encargado SI" → solo si se menciona; no inventes nombres.
+- "Tiempo Solución" → “X horas Y minutos” si puedes calcular (Cierre − Apertura); si no, "".
+- Responde únicamente el objeto JSON, sin comentarios ni texto adicional.
+
+[REPORTE DE ENTRADA]:
+"""
+
+# ---------------------------
+# Utilidades de saneamiento / validación
+# ---------------------------
+def parse_model_output_to_dict(raw: str) -> dict | None:
+    # Intenta JSON directo
+    s = (raw or "").strip()
+    # Quitar cercos accidentales (```json … ```)
+    s = re.sub(r"^```(?:json)?\s*|\s*```$", "", s).strip()
+    try:
+        obj = json.loads(s)
+        if isinstance(obj, dict) and all(k in obj for k in COLUMNAS):
+            return obj
+    except Exception:
+        pass
+    return None
+
+def respuesta_completa(raw: str) -> bool:
+    """¿La salida trae la fila entera? (JSON con las 21 columnas, o al menos 21 campos con pipes)"""
+    if parse_model_output_to_dict(raw) is not None:
+        return True
+    return sanitize_text(raw or "").count("|") >= len(COLUMNAS) - 1
+
+def build_row_from_record(rec: dict) -> list[str]:
+    # Mapea por nombre → orden canónico
+    fila = [ str(rec.get(col) or "").strip() for col in COLUMNAS ]
+    return fila
+
+def fallback_parse_pipes(raw: str) -> list[str]:
+    cleaned = sanitize_text(raw)
+    parts, _ = normalize_21_fields(cleaned)
+    # “Evento/ Incidente” a valor canónico
+    parts[3] = norm_evento_incidente(parts[3])
+    # Forzar vacíos 18–21
+    parts[17] = ""; parts[18] = ""; parts[19] = ""; parts[20] = ""
+    return parts
+    
+def sanitize_text(s: str) -> str:
+    s = s.strip()
+    s = re.sub(r"^```.*?\n", "", s, flags=re.DOTALL)
+    s = re.sub(r"```$", "", s)
+    s = s.replace("```", "")
+    s = s.replace("\n", " ").replace("\r", " ")
+    s = s.replace("“", '"').replace("”", '"').replace("’", "'")
+    m = re.search(r"[^|\n]*\|[^|\n]*\|", s)
+    if m:
+        s = s[m.start():]
+    return s.strip().strip('"').strip()
+
+def campos_parciales(acumulado: str) -> list[str]:
+    """
+    Vista previa mientras llega la línea del modelo: solo los campos ya cerrados por un
+    pipe (el último trozo puede estar a medias). Sin realineo: es una aproximación visual.
+    """
+    cerrados = sanitize_text(acumulado).split("|")[:-1][:21]
+    return [c.strip() for c in cerrados] + [""] * (21 - len(cerrados))
+
+def normalize_21_fields(raw: str) -> tuple[list[str], list[str]]:
+    avisos = []
+    parts = [p.strip() for p in raw.split("|")]
+    original_count = len(parts)
+    if original_count > 21:
+        # Fusiona el excedente en 'Descripción' (columna 5)
+        keep_tail = 16  # columnas 6..21
+        left_end = max(4, original_count - keep_tail)
+        desc = " | ".join(parts[4:left_end])
+        parts = parts[:4] + [desc] + parts[left_end:]
+        avisos.append(f"Se detectaron {original_count} campos; se fusionó el excedente en 'Descripción'.")
+    if len(parts) < 21:
+        faltan = 21 - len(parts)
+        avisos.append(f"Se detectaron {len(parts)} campos; se completaron {faltan} vacíos.")
+        parts += [""] * faltan
+    parts = [p.strip() for p in parts]
+    return parts, avisos
+
+def is_empty_token(x: str) -> bool:
+    # Por ahora, solo vacío literal (""), como pediste
+    return x.strip().lower() in {""}
+
+def clean_empty_tokens(parts: list[str]) -> list[str]:
+    """Quita espacios extra en cada token sin alterar posiciones."""
+    return [(p or "").strip() for p in parts]
+
+def norm_opcion(valor: str, opciones: list[str]) -> str:
+    """Normaliza por similitud básica contra un set de opciones."""
+    v = (valor or "").strip().lower()
+    for op in opciones:
+        if v == op.lower():
+            return op
+    # sinonimos rápidos
+    if v in ("telefono","teléfono","tel"): return "Teléfono"
+    if v in ("email","correo"): return "Correo"
+    return valor or ""
+
+
+def parse_dt(s: str):
+    s = s.strip()
+    try:
+        return datetime.strptime(s, "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
+    except Exception:
+        return None
+
+def calcula_tiempo_solucion(apertura: str, cierre: str) -> str:
+    return duracion(apertura, cierre)
+
+# ---------------------------
+# Fechas/horas del texto: un solo escaneo (temporal.py); estas funciones son atajos
+# ---------------------------
+def _first_date_in_text(texto: str) -> Optional[datetime.date]:
+    return analizar_temporal(texto).fecha
+
+def extraer_horas_any(texto: str) -> list[str]:
+    return analizar_temporal(texto).horas
+
+def fechas_desde_texto(texto: str) -> tuple[str, str]:
+    """
+    Retorna (apertura, cierre) en "YYYY-MM-DD HH:MM".
+    - Día: fecha explícita (año actual si falta) → "ayer"/"anoche"/"hace N días" → hoy.
+    - Horas: el primer rango ("de 8:00 a 10:15") o la primera y la última hora;
+      si el cierre queda antes de la apertura, suma 1 día.
+    - Sin horas: apertura = ahora − N si dice "hace N horas/minutos"; si no, ("","").
+    """
+    return analizar_temporal(texto).fechas
+
+def calcula_tiempo_desde_texto(texto: str) -> str:
+    return analizar_temporal(texto).tiempo
+
+# ---------------------------
+# Inferencia de Ubicación / Modo / Acción / Solución / Clasificación / Área GTIC / Sistema / Área
+# ---------------------------
+DEPTS_BO = {
+    "la paz": ["la paz", "lpz", "senkata"],
+    "santa cruz": ["santa cruz", "scz", "santa cruz de la sierra", "pau"],
+    "cochabamba": ["cochabamba", "cbba", "cbb"],
+    "chuquisaca": ["chuquisaca", "sucre"],
+    "oruro": ["oruro"],
+    "potosí": ["potosi", "potosí"],
+    "beni": ["beni", "trinidad"],
+    "pando": ["pando", "cobija"],
+    "tarija": ["tarija", "yacuiba", "villa montes"],
+}
+UBICACION_NACIONAL_RULES = [(r"nivel nacional", "Bolivia (nivel nacional)")]
+UBICACION_SEDE_RULES = [(r"(sucursal|oficina|sede)\s+([a-záéíóúñ ]+)", "Sede")]
+# Un patrón por departamento con todos sus alias (antes: un \b{k}\b nuevo por alias y por llamada)
+UBICACION_DEPTO_RULES = [
+    (rf"\b(?:{'|'.join(re.escape(k) for k in keys)})\b", f"{dept.title()}, Bolivia")
+    for dept, keys in DEPTS_BO.items()
+]
+def detectar_ubicacion_ext(texto: str, a: Analisis | None = None) -> str:
+    a = a or analizar(texto)
+    if a.primera("ubic_nacional"):
+        return "Bolivia (nivel nacional)"
+    m = a.match("ubic_sede")
+    if m:
+        return f"{m.group(1).title()} {m.group(2).strip().title()}"
+    h = a.primera("ubic_depto")
+    return h.etiqueta if h else ""
+
+# Orden = prioridad (la primera tabla que coincide gana)
+MODO_RULES = [
+    (r"jira|ticket", "Jira"),
+    (r"monitoreo|alerta", "Monitoreo"),
+    (r"teléfono|telefono|llam|celular|whatsapp", "Teléfono"),
+    (r"correo|e-mail|email|mail|outlook", "Correo"),
+]
+def detectar_modo_reporte(texto: str, a: Analisis | None = None) -> str:
+    h = (a or analizar(texto)).primera("modo")
+    return h.etiqueta if h else "Teléfono"
+
+ENCARGADO_RULES = [(r"(encargad[oa]|responsable)\s+(es\s+)?([a-záéíóúñ\s]+)", "Encargado")]
+def extraer_encargado(texto: str, a: Analisis | None = None) -> str:
+    """
+    Busca frases como 'el encargado es <NOMBRE>' o 'responsable <NOMBRE>'.
+    Devuelve el nombre si lo encuentra.
+    """
+    m = (a or analizar(texto)).match("encargado")
+    if m:
+        # El corte por 'del/de la' distingue mayúsculas: se aplica sobre el texto original
+        nombre = texto[m.start(3):m.end(3)] if len(texto) == len(m.string) else m.group(3)
+        nombre = nombre.strip()
+        # Cortar si hay 'del área' o frases largas
+        nombre = re.split(r"\s+(del|de la|de los|de las)\b", nombre, 1)[0].strip()
+        return nombre.title()
+    return ""
+
+ACCION_RULES = [
+    (r"reinici(ar|ó|o|amos|aron).*(equipo|pc|servicio|servidor)", "Reinicio de servicios/equipo"),
+    (r"(verific(ar|ó|aron).*(conectividad|ping|traz))", "Verificación de conectividad"),
+    (r"(bloque(o|ar|ó).*(cuenta)|forz[oó].*contraseñ|cambio de contraseñ)", "Bloqueo/cambio de contraseñas"),
+    (r"aisl(ar|ado|amiento).*(equipo)|segmentaci[oó]n", "Aislamiento del equipo"),
+]
+SOLUCION_RULES = [
+    (r"(desbloque(o|ar)|reset).*cuenta|restablecimi?ento.*contraseñ", "Desbloqueo / reseteo de cuenta"),
+    (r"(limpieza|eliminaci[oó]n).*(malware|virus|troyano)", "Limpieza de malware"),
+    (r"(regla|permit|bloque).*(firewall|fw|ips|waf)", "Ajuste de reglas en firewall/WAF"),
+    (r"(whitelist|allowlist|excepci[oó]n)", "Creación de excepción/allowlist"),
+    (r"(reconfiguraci[oó]n|ajuste).*(pol[ií]tica|configuraci[oó]n)", "Reconfiguración de políticas"),
+]
+def infer_accion_inmediata(texto: str, a: Analisis | None = None) -> str:
+    s = (a or analizar(texto)).etiquetas("accion")
+    return "; ".join(sorted(s)) if s else ""
+def infer_solucion(texto: str, a: Analisis | None = None) -> str:
+    s = (a or analizar(texto)).etiquetas("solucion")
+    return "; ".join(sorted(s)) if s else ""
+
+CLASIF_PATTERNS = {
+    "Acceso no autorizado": [
+        r"acceso no autoriz", r"intrus", r"suplantaci[oó]n",
+        r"credenciales? (compromet|filtrad|robadas)", r"elevaci[oó]n de privilegios",
+        r"cuenta comprometida|login irregular",
+    ],
+    "Modificación de recursos no autorizado": [
+        r"defacement|desfiguraci[oó]n", r"alteraci[oó]n|modificaci[oó]n.*no autoriz",
+        r"borrad(o|a) (no autoriz|accidental)", r"integridad.*(afectad|compromet)",
+    ],
+    "Uso inapropiado de recursos": [
+        r"uso inapropiad|uso indebido|violaci[oó]n.*pol[íi]tica.*uso", r"usb no autoriz",
+    ],
+    "No disponibilidad de recursos": [
+        r"ca[ií]da|indisponibil|no disponible|servicio.*no responde|interrupci[oó]n|apag[oó]n|fuera de servicio|vpn.*ca[ií]da|ddos|denegaci[oó]n",
+    ],
+    "Exploración de Vulnerabilidades": [
+        r"escane[oó]|scan|nmap|nessus|openvas|enumeraci[oó]n|port scan|sondeo de puertos",
+    ],
+}
+def infer_clasificacion(texto: str, clasif_modelo: str = "", a: Analisis | None = None) -> str:
+    cm = clasif_modelo.strip().lower()
+    if cm in CLASIF_CANON:
+        return CLASIF_CANON[cm]
+    hits = (a or analizar(texto)).etiquetas("clasif")
+    if len(hits) >= 2: return "Multicomponente"
+    if len(hits) == 1: return hits[0]
+    return ""
+
+def normaliza_clasificacion_final(valor: str) -> str:
+    v = valor.strip().lower()
+    if not v: return ""
+    for k, canon in CLASIF_CANON.items():
+        if k in v:
+            return canon
+    return ""
+
+AREA_GTIC_RULES = [
+    (r"seguridad", "DSEC - Seguridad"),
+    (r"infraestructura|redes|vpn|cisco", "DITC - Infraestructura"),
+    (r"soporte|mesa de ayuda", "DSTC - Soporte Técnico"),
+    (r"sistemas|erp|base de datos", "DISC - Sistemas"),
+]
+def infer_area_coordinando(texto: str, a: Analisis | None = None) -> str:
+    h = (a or analizar(texto)).primera("area_gtic")
+    return h.etiqueta if h else ""
+
+
+SISTEMA_RULES = [
+    (r"\bvpn\b", "VPN"),
+    (r"correo|email|outlook|exchange", "Correo"),
+    (r"active directory|\bad\b", "Active Directory"),
+    (r"\bfirewall\b", "Firewall"),
+    (r"\berp\b", "ERP"),
+    (r"whatsapp", "WhatsApp"),
+    (r"portal web|sitio web|web p[úu]blica|p[aá]gina web", "Portal Web"),
+    (r"base de datos|postgres|oracle|mysql|sql server|mssql", "Base de Datos"),
+]
+def infer_sistema(texto: str, a: Analisis | None = None) -> str:
+    h = (a or analizar(texto)).primera("sistema")
+    return h.etiqueta if h else ""
+
+AREA_RULES = [(r"(área|area|departamento|unidad)\s+de\s+([a-záéíóúñ ]+)", "Area")]
+def infer_area(texto: str, a: Analisis | None = None) -> str:
+    m = (a or analizar(texto)).match("area")
+    if m:
+        return m.group(2).strip().title()
+    return ""
+
+# Todas las tablas anteriores en un solo motor: un escaneo por texto (memoizado)
+MOTOR_REGLAS = MotorReglas({
+    "ubic_nacional": UBICACION_NACIONAL_RULES,
+    "ubic_sede": UBICACION_SEDE_RULES,
+    "ubic_depto": UBICACION_DEPTO_RULES,
+    "modo": MODO_RULES,
+    "encargado": ENCARGADO_RULES,
+    "accion": ACCION_RULES,
+    "solucion": SOLUCION_RULES,
+    "clasif": [(p, nombre) for nombre, pats in CLASIF_PATTERNS.items() for p in pats],
+    "area_gtic": AREA_GTIC_RULES,
+    "sistema": SISTEMA_RULES,
+    "area": AREA_RULES,
+})
+
+def analizar(texto: str) -> Analisis:
+    """Escaneo único del texto con todas las reglas (cacheado por texto)."""
+    return MOTOR_REGLAS.escanear_cache(texto)
+
+def norm_opcion(valor: str, validos: list[str]) -> str:
+    v = (valor or "").strip().lower()
+    for x in validos:
+        if v == x.lower():
+            return x
+    return ""
+
+
+# ---------------------------
+# Contexto por reporte: cada extracción se calcula una vez y se reutiliza
+# ---------------------------
+class ContextoReporte:
+    """
+    Extracciones del texto libre de UN reporte, perezosas y memoizadas.
+    El pipeline (pasos 3–6) lee de aquí en vez de volver a llamar infer_*/extraer_*.
+    """
+
+    PROPIEDADES = (
+        "fechas", "tiempo_desde_texto", "sistema", "ubicacion", "modo", "encargado",
+        "accion_inmediata", "solucion", "clasificacion", "area_coordinando", "area",
+    )
+
+    def __init__(self, texto: str):
+        self.texto = texto
+
+    def precalcular(self) -> "ContextoReporte":
+        """Evalúa todas las extracciones (p. ej. en un hilo, mientras el modelo genera)."""
+        for p in self.PROPIEDADES:
+            getattr(self, p)
+        return self
+
+    @cached_property
+    def lower(self) -> str:
+        return self.texto.lower()
+
+    @cached_property
+    def analisis(self) -> Analisis:
+        return analizar(self.texto)
+
+    @cached_property
+    def temporal(self) -> Temporal:
+        return analizar_temporal(self.texto)
+
+    @cached_property
+    def horas(self) -> list[str]:
+        return self.temporal.horas
+
+    @cached_property
+    def fechas(self) -> tuple[str, str]:
+        return self.temporal.fechas
+
+    @cached_property
+    def tiempo_desde_texto(self) -> str:
+        return self.temporal.tiempo
+
+    @cached_property
+    def sistema(self) -> str:
+        return infer_sistema(self.texto, a=self.analisis)
+
+    @cached_property
+    def ubicacion(self) -> str:
+        return detectar_ubicacion_ext(self.texto, a=self.analisis)
+
+    @cached_property
+    def modo(self) -> str:
+        return detectar_modo_reporte(self.texto, a=self.analisis)
+
+    @cached_property
+    def encargado(self) -> str:
+        return extraer_encargado(self.texto, a=self.analisis)
+
+    @cached_property
+    def accion_inmediata(self) -> str:
+        return infer_accion_inmediata(self.texto, a=self.analisis)
+
+    @cached_property
+    def solucion(self) -> str:
+        return infer_solucion(self.texto, a=self.analisis)
+
+    @cached_property
+    def clasificacion(self) -> str:
+        return infer_clasificacion(self.texto, a=self.analisis)
+
+    @cached_property
+    def area_coordinando(self) -> str:
+        return infer_area_coordinando(self.texto, a=self.analisis)
+
+    @cached_property
+    def area(self) -> str:
+        return infer_area(self.texto, a=self.analisis)
+
+
+# ---------------------------
+# Pipeline completo (pasos 2–6 del flujo "Reportar")
+# ---------------------------
+# medir(etapa) → context manager que cronometra la etapa (p. ej. Metricas.span); opcional
+Medidor = Callable[[str], ContextManager]
+
+
+def _sin_medir(etapa: str) -> ContextManager:
+    return nullcontext()
+
+
+def procesar_respuesta(
+    user_question: str, response_text: str, ctx: ContextoReporte | None = None,
+    medir: Medidor | None = None,
+) -> tuple[list[str], list[str], str]:
+    """
+    Convierte la respuesta del modelo en la fila final de 21 columnas (sin CODIGO).
+    Retorna (fila, avisos, cleaned).
+    """
+    medir = medir or _sin_medir
+    ctx = ctx or ContextoReporte(user_question)
+    rec = parse_model_output_to_dict(response_text)
+    if rec is not None:
+        # Salida JSON válida (modo esquema): directo al constructor de filas, sin realineo
+        with medir("parseo_json"):
+            fila, avisos, cleaned = _preparar_json(rec, ctx), [], response_text.strip()
+    else:
+        with medir("normalizacion"):
+            fila, avisos, cleaned = _preparar(response_text, ctx)
+        # 4) Realineo semántico (pasos A–J, tabla REGLAS_REALINEO)
+        with medir("realineo"):
+            fila = realinear(fila, ctx)
+    with medir("inferencia"):
+        fila = _finalizar(fila, ctx)
+    return fila, avisos, cleaned
+
+
+# Filas con pipes desde las que el realineo vectorizado empata con el de a una (armar el
+# DataFrame tiene un costo fijo: con 50 reportes cortos rinde ~la mitad); medido con
+# `python -m bench.run --barrido-lote`
+LOTE_MIN_VECTORIZADO = 3200
+
+
+def procesar_respuestas_lote(
+    textos: list[str], respuestas: list[str], medir: Medidor | None = None,
+    vectorizar: Optional[bool] = None,
+) -> list[tuple[list[str], list[str], str]]:
+    """
+    Igual que procesar_respuesta para muchos reportes; el realineo A–J corre vectorizado
+    sobre un DataFrame con las filas que vinieron como línea con pipes (importación masiva).
+    Las respuestas JSON válidas van directo al constructor de filas.
+    Con menos de LOTE_MIN_VECTORIZADO filas con pipes el realineo va fila por fila
+    (`vectorizar` fuerza uno u otro camino).
+    """
+    if not textos:
+        return []
+    medir = medir or _sin_medir
+    ctxs = [ContextoReporte(t) for t in textos]
+    recs = [parse_model_output_to_dict(r) for r in respuestas]
+    preparados: list = [None] * len(textos)
+    with medir("parseo_json"):
+        for i, rec in enumerate(recs):
+            if rec is not None:
+                preparados[i] = (_preparar_json(rec, ctxs[i]), [], respuestas[i].strip())
+    pipes = [i for i, rec in enumerate(recs) if rec is None]
+    if pipes:
+        with medir("normalizacion"):
+            for i in pipes:
+                preparados[i] = _preparar(respuestas[i], ctxs[i])
+        if vectorizar is None:
+            vectorizar = len(pipes) >= LOTE_MIN_VECTORIZADO
+        with medir("realineo"):
+            if vectorizar:
+                import pandas as pd
+
+                df = pd.DataFrame([preparados[i][0] for i in pipes], dtype=object)
+                df = realinear_lote(df, [ctxs[i] for i in pipes])
+                for i, fila in zip(pipes, df.itertuples(index=False, name=None)):
+                    preparados[i] = (list(fila),) + preparados[i][1:]
+            else:
+                for i in pipes:
+                    preparados[i] = (realinear(preparados[i][0], ctxs[i]),) + preparados[i][1:]
+    with medir("inferencia"):
+        return [
+            (_finalizar(fila, ctx), avisos, cleaned)
+            for ctx, (fila, avisos, cleaned) in zip(ctxs, preparados)
+        ]
+
+
+def _preparar(response_text: str, ctx: ContextoReporte) -> tuple[list[str], list[str], str]:
+    """Pasos 2–3: saneo, normalización a 21 columnas y fechas por defecto."""
+    # 2) Saneo + normalización a 21 columnas
+    cleaned = sanitize_text(response_text)
+    cleaned = re.sub(r"\s\|\s", " ; ", cleaned)
+    fila, avisos = normalize_21_fields(cleaned)
+    fila = clean_empty_tokens(fila)
+    return _vacios_y_fechas(fila, ctx), avisos, cleaned
+
+
+def _preparar_json(rec: dict, ctx: ContextoReporte) -> list[str]:
+    """Pasos 2–3 para una respuesta JSON: el orden viene de las claves, no hay corrimientos."""
+    return _vacios_y_fechas(build_row_from_record(rec), ctx)
+
+
+def _vacios_y_fechas(fila: list[str], ctx: ContextoReporte) -> list[str]:
+    fila[3] = "Evento" if "evento" in (fila[3] or "").lower() else "Incidente"
+
+    # Forzar vacíos 18–21
+    fila[17] = ""; fila[18] = ""; fila[19] = ""; fila[20] = ""
+
+    # 3) Fechas: extraer del texto y defaults
+    ap_auto, ci_auto = ctx.fechas
+    # Si el modelo no dio apertura: la del texto, o ahora
+    if not fila[1].strip():
+        fila[1] = ap_auto or datetime.now(TZ).strftime("%Y-%m-%d %H:%M")
+    # Si no hay cierre y el extractor encontró, úsalo
+    if not fila[14].strip() and ci_auto:
+        fila[14] = ci_auto
+
+    return fila
+
+
+def _finalizar(fila: list[str], ctx: ContextoReporte) -> list[str]:
+    """Pasos K–L, 5 y 6: clasificación, correcciones finales, tiempo e inferencias por defecto."""
+    def _put(idx: int, val: str) -> bool:
+        """Escribe en idx solo si está vacío."""
+        if not (fila[idx] or "").strip() and (val or "").strip():
+            fila[idx] = val
+            return True
+        return False
+
+    # K) Clasificación final (catálogo + inferencia)
+    fila[9] = normaliza_clasificacion_final(fila[9]) or ctx.clasificacion or "Otros"
+
+    # L) Corrección de valores imposibles en Sistema/Área/Ubicación
+    #    (p.ej. Impacto o Estado que se nos haya escapado)
+    if _looks_impacto(fila[5]): 
+        _put(8, fila[5].title()); fila[5] = ctx.sistema or fila[5]
+    if _looks_estado(fila[5]): 
+        _put(16, fila[5].capitalize()); fila[5] = ctx.sistema or ""
+    if _looks_impacto(fila[6]): 
+        _put(8, fila[6].title()); fila[6] = ""
+    if _looks_estado(fila[6]): 
+        _put(16, fila[6].capitalize()); fila[6] = ""
+    if not _looks_ciudad(fila[7]) and _looks_sistema(fila[7]):
+        _put(5, fila[7]); fila[7] = ctx.ubicacion or "La paz"
+
+    # 5) Tiempo de solución
+    if not fila[15].strip():
+        fila[15] = calcula_tiempo_solucion(fila[1], fila[14])
+    if not fila[15].strip():
+        fila[15] = ctx.tiempo_desde_texto
+
+    # 6) Inferencias y normalizaciones
+    # Modo Reporte
+    fila[2] = norm_opcion(fila[2] or ctx.modo,
+                          ["Correo","Jira","Teléfono","Monitoreo","Webex","WhatsApp"]) or "Otro"
+
+    # Ubicación (si quedó vacía)
+    if not fila[7].strip():
+        fila[7] = ctx.ubicacion or "La Paz, Bolivia"
+
+    # Acción inmediata y Solución
+    if not fila[10].strip():
+        fila[10] = ctx.accion_inmediata
+    if not fila[11].strip():
+        fila[11] = ctx.solucion
+
+    # Clasificación
+    fila[9] = normaliza_clasificacion_final(fila[9]) or ctx.clasificacion or "Otros"
+
+    # Área de GTIC / Encargado
+    if not fila[12].strip():
+        fila[12] = ctx.area_coordinando
+    if not fila[13].strip():
+        fila[13] = ctx.encargado
+
+    # Sistema / Área
+    if not fila[5].strip():
+        fila[5] = ctx.sistema or "Firewall"
+    if not fila[6].strip():
+        fila[6] = ctx.area
+
+    # Estado por defecto
+    if not fila[16].strip():
+        fila[16] = "Cerrado" if fila[14].strip() else "En investigación"
+
+    return fila
@@ -0,0 +1,177 @@
+# ---------------------------
+# Realineo de campos corridos (pasos A–J), guiado por una tabla de reglas
+# ---------------------------
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+CIUDADES = {"la paz","el alto","santa cruz","cochabamba","tarija","potosí","potosi","sucre","beni","pando","oruro","bolivia"}
+IMPACTOS = {"alto","medio","bajo"}
+ESTADOS  = {"cerrado","en investigación","en investigacion"}
+EVENTOS  = {"evento","incidente"}
+MODO_OPC = ["Correo","Jira","Teléfono","Monitoreo","Webex","WhatsApp"]
+SISTEMAS_KEYWORDS = ["firewall","kubernetes","cortex","checkpoint","proxy","waf","antivirus","umbrella","ise","vpn","exchange","servidor","server","correo","email","outlook"]
+GTIC_KEYWORDS = ["dsec","ditc","dstc","disc"]
+
+_MODO_CANON = {m.lower(): m for m in MODO_OPC}
+NOMBRE_CORTO_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜáéíóúñÑ]+(?:\s+[A-Za-zÁÉÍÓÚÜáéíóúñÑ]+)?")
+VERBOS_RE = re.compile(r"\b(?:reinici|bloque|verific|restablec|permit|desbloque|allow|whitelist)\b")
+
+
+def _looks_ciudad(s: str) -> bool:
+    return any(c in (s or "").lower() for c in CIUDADES)
+def _looks_impacto(s: str) -> bool:
+    return (s or "").strip().lower() in IMPACTOS
+def _looks_estado(s: str) -> bool:
+    return (s or "").strip().lower() in ESTADOS
+def _looks_evento_incidente(s: str) -> bool:
+    return (s or "").strip().lower() in EVENTOS
+def _looks_sistema(s: str) -> bool:
+    t = (s or "").strip().lower()
+    return any(k in t for k in SISTEMAS_KEYWORDS)
+def _looks_gtic(s: str) -> bool:
+    t = (s or "").lower()
+    return any(k in t for k in GTIC_KEYWORDS)
+def _looks_agetic(s: str) -> bool:
+    return "agetic" in (s or "").lower()
+def _looks_nombre_corto(s: str) -> bool:
+    t = (s or "").strip()
+    return bool(t and NOMBRE_CORTO_RE.fullmatch(t) and len(t.split()) <= 2 and t[0].isalpha() and t[0].isupper())
+def _looks_accion(s: str) -> bool:
+    return bool(VERBOS_RE.search((s or "").lower()))
+def _norm_modo(s: str) -> str:
+    return _MODO_CANON.get((s or "").strip().lower(), "")
+
+
+@dataclass(frozen=True)
+class ReglaRealineo:
+    """
+    Una fila de la tabla: las celdas de `fuentes` que cumplen `detecta` se mueven a la
+    primera columna vacía de `destinos` (transformadas por `valor`).
+    - limpia="siempre": la celda origen se vacía aunque el destino ya estuviera ocupado.
+    - limpia="si_mueve": solo se vacía si efectivamente se movió.
+    - rellenos: (columna, atributo de ContextoReporte) que se completan antes de la regla.
+    """
+    paso: str
+    destinos: tuple[int, ...]
+    detecta: Callable[[str], bool]
+    valor: Callable[[str], str] = lambda s: s
+    fuentes: Optional[tuple[int, ...]] = None        # None = todas menos los destinos
+    limpia: str = "siempre"
+    rellenos: tuple[tuple[int, str], ...] = ()
+
+
+# Orden de la tabla = prioridad (el mismo orden de los pasos A–J originales)
+REGLAS_REALINEO: list[ReglaRealineo] = [
+    ReglaRealineo("A", (8,),  _looks_impacto, str.title),                         # Impacto mal ubicado
+    ReglaRealineo("B", (16,), _looks_estado, str.capitalize),                     # Estado mal ubicado
+    ReglaRealineo("C", (3,),  _looks_evento_incidente, str.title),                # Evento/Incidente
+    ReglaRealineo("D", (2,),  lambda s: bool(_norm_modo(s)), _norm_modo),          # Modo de reporte
+    ReglaRealineo("E", (12,), _looks_gtic),                                       # Área GTIC (DSEC/DITC/…)
+    ReglaRealineo("F", (13,), _looks_nombre_corto, fuentes=(5,6,7,9,10,11,12),    # Encargado
+                  limpia="si_mueve", rellenos=((13, "encargado"),)),
+    ReglaRealineo("G", (6,),  _looks_agetic, lambda s: "AGETIC"),                 # AGETIC → Área
+    ReglaRealineo("H", (5,),  _looks_sistema, limpia="si_mueve",                  # Sistema
+                  rellenos=((5, "sistema"),)),
+    ReglaRealineo("I", (7,),  _looks_ciudad, limpia="si_mueve"),                  # Ubicación (primera ciudad)
+    ReglaRealineo("J", (11, 10), _looks_accion, fuentes=(5,6,7,9),                # Solución / Acción inmediata
+                  rellenos=((7, "ubicacion"), (10, "accion_inmediata"), (11, "solucion"))),
+]
+_BIT = {r.paso: 1 << i for i, r in enumerate(REGLAS_REALINEO)}
+
+
+@lru_cache(maxsize=4096)
+def clasificar_celda(valor: str) -> int:
+    """Máscara de bits con todas las reglas cuyo `detecta` acepta el valor (memoizada por valor)."""
+    out = 0
+    for r in REGLAS_REALINEO:
+        if r.detecta(valor):
+            out |= _BIT[r.paso]
+    return out
+
+
+def realinear(fila: list[str], ctx) -> list[str]:
+    """
+    Pasos A–J sobre una fila: cada celda se clasifica una sola vez (máscara de bits) y las
+    reglas se resuelven en orden de prioridad; solo las celdas modificadas se reclasifican.
+    """
+    fila = [(x or "").strip() for x in fila]
+    clases = [clasificar_celda(v) for v in fila]
+
+    def _set(i: int, v: str):
+        fila[i] = v
+        clases[i] = clasificar_celda(v)
+
+    for r in REGLAS_REALINEO:
+        for col, attr in r.rellenos:
+            if not fila[col].strip():
+                _set(col, getattr(ctx, attr) or "")
+        bit = _BIT[r.paso]
+        fuentes = r.fuentes if r.fuentes is not None else range(len(fila))
+        for i in fuentes:
+            if i in r.destinos or not clases[i] & bit:
+                continue
+            v = fila[i]
+            destino = next((d for d in r.destinos if not fila[d].strip()), None)
+            nuevo = r.valor(v)
+            if destino is not None and nuevo.strip():
+                _set(destino, nuevo)
+                _set(i, "")
+            elif r.limpia == "siempre":
+                _set(i, "")
+    return fila
+
+
+# ---------------------------
+# Variante por lotes: mismas reglas sobre una matriz N×21, operaciones por columna
+# ---------------------------
+def realinear_lote(df, ctxs: list):
+    """
+    Pasos A–J sobre un DataFrame (una fila por reporte, 21 columnas posicionales).
+    Todas las celdas se clasifican en una pasada (clasificar_celda, memoizada por valor)
+    a una matriz de bits; luego cada regla se resuelve columna por columna con
+    operaciones numpy sobre las N filas. Solo las celdas que se mueven pasan por Python.
+    Resultado idéntico a aplicar realinear() fila por fila.
+    """
+    import numpy as np
+    import pandas as pd
+
+    crudos = df.fillna("").astype(object).to_numpy()
+    n, ncols = crudos.shape
+    # Recorte y clasificación sobre los valores únicos (factorize es hash en C): en un lote
+    # real la mayoría de celdas se repite ("", "Alto", "Cerrado", "Correo", …)
+    codigos, unicos = pd.factorize(crudos.ravel())
+    unicos = np.array([(u or "").strip() for u in unicos], dtype=object)
+    bits_unicos = np.array([clasificar_celda(u) for u in unicos], dtype=np.int64)
+    vals = unicos[codigos].reshape(n, ncols)
+    clases = bits_unicos[codigos].reshape(n, ncols)
+
+    def _set(rows, col, nuevos):
+        for j, v in zip(rows, nuevos):
+            vals[j, col] = v
+            clases[j, col] = clasificar_celda(v)
+
+    for r in REGLAS_REALINEO:
+        for col, attr in r.rellenos:
+            rows = np.flatnonzero(vals[:, col] == "")
+            if rows.size:
+                _set(rows, col, [getattr(ctxs[j], attr) or "" for j in rows])
+        bit = _BIT[r.paso]
+        fuentes = r.fuentes if r.fuentes is not None else range(ncols)
+        for i in fuentes:
+            if i in r.destinos:
+                continue
+            rows = np.flatnonzero(clases[:, i] & bit)
+            if not rows.size:
+                continue
+            nuevos = np.array([r.valor(v) for v in vals[rows, i]], dtype=object)
+            validos = np.array([bool(v.strip()) for v in nuevos], dtype=bool)
+            movido = np.zeros(rows.size, dtype=bool)
+            for d in r.destinos:
+                pone = ~movido & validos & (vals[rows, d] == "")
+                _set(rows[pone], d, nuevos[pone])
+                movido |= pone
+            limpiar = rows if r.limpia == "siempre" else rows[movido]
+            _set(limpiar, i, [""] * limpiar.size)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns)
@@ -0,0 +1,80 @@
+# ---------------------------
+# Recursos compartidos por proceso (página principal y pages/): hoja, copia local, archivo,
+# índice de búsqueda y métricas
+# ---------------------------
+from typing import Optional
+
+import streamlit as st
+
+from archivo import ArchivoIncidentes
+from busqueda import IndiceBusqueda
+from casete import Casete, HojaGrabada
+from espejo import EspejoHoja
+from hoja import BLOQUE_FILAS, ClienteHoja, abrir_worksheet
+from metricas import Metricas, configurar_log_json
+
+# Métricas: endpoint /metrics local (0 = solo archivo DATA_DIR/metricas.prom)
+METRICS_PORT = int(st.secrets.get("METRICS_PORT", 0))
+# Antigüedad máxima de la copia local de la hoja antes de pedir filas nuevas a la API
+ESPEJO_MAX_EDAD_S = float(st.secrets.get("ESPEJO_MAX_EDAD_S", 60))
+# Filas por rango en las lecturas con batch_get
+HOJA_BLOQUE_FILAS = int(st.secrets.get("HOJA_BLOQUE_FILAS", BLOQUE_FILAS))
+# Casete de Vertex y de la hoja (.jsonl): "grabar" las respuestas reales o "reproducirlas" sin red
+CASETE      = st.secrets.get("CASETE", "")
+CASETE_MODO = st.secrets.get("CASETE_MODO", "reproducir")
+# Archivo histórico: los "Cerrado" abiertos hace más de N días salen de la hoja a Parquet
+ARCHIVO_EDAD_DIAS = float(st.secrets.get("ARCHIVO_EDAD_DIAS", 180))
+
+
+@st.cache_resource(show_spinner=False)
+def get_metricas() -> Metricas:
+    """Registro de métricas por proceso: spans por etapa, logs JSON y exportación Prometheus."""
+    configurar_log_json()
+    m = Metricas()
+    if METRICS_PORT:
+        m.servir(METRICS_PORT)
+    return m
+
+
+@st.cache_resource(show_spinner=False)
+def get_casete() -> Optional[Casete]:
+    return Casete(CASETE, CASETE_MODO) if CASETE else None
+
+
+def _abrir_hoja():
+    casete = get_casete()
+    if casete is not None and not casete.grabando:
+        return HojaGrabada(None, casete)   # sin credenciales ni red
+    ws = abrir_worksheet(
+        dict(st.secrets["connections"]["gsheets"]),
+        st.secrets["SHEET_ID"],
+        st.secrets.get("SHEET_NAME", "Reportes"),
+    )
+    return HojaGrabada(ws, casete) if casete is not None else ws
+
+
+@st.cache_resource(show_spinner=False)
+def get_hoja() -> ClienteHoja:
+    """Hoja "Reportes" (Service Account de connections.gsheets; SHEET_ID en secrets), abierta en el primer uso."""
+    return ClienteHoja(
+        conectar=_abrir_hoja,
+        bloque_filas=HOJA_BLOQUE_FILAS,
+        medir=get_metricas().span,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_espejo() -> EspejoHoja:
+    return EspejoHoja(leer=lambda rango: get_hoja().leer(rango), max_edad_s=ESPEJO_MAX_EDAD_S)
+
+
+@st.cache_resource(show_spinner=False)
+def get_archivo() -> ArchivoIncidentes:
+    """Incidentes archivados (DATA_DIR/archivo/anio=…/mes=…) + índice de CODIGO."""
+    return ArchivoIncidentes()
+
+
+@st.cache_resource(show_spinner=False)
+def get_indice_busqueda() -> IndiceBusqueda:
+    """Índice FTS5 (DATA_DIR/busqueda.sqlite3) de la hoja y del archivo; se pone al día al buscar."""
+    return IndiceBusqueda()
@@ -0,0 +1,97 @@
+# ---------------------------
+# Motor de reglas: todas las tablas heurísticas precompiladas y evaluadas en un solo escaneo
+# ---------------------------
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Hit:
+    tabla: str
+    etiqueta: str
+    start: int
+    end: int
+
+
+class Analisis:
+    """Resultado de un escaneo: el primer hit (más a la izquierda) de cada regla, con vistas por tabla."""
+
+    def __init__(self, motor: "MotorReglas", texto_lower: str, hits: dict[int, re.Match]):
+        self.texto = texto_lower
+        self._motor = motor
+        self._hits = hits
+
+    @property
+    def hits(self) -> list[Hit]:
+        out = []
+        for i, m in self._hits.items():
+            tabla, etiqueta, _ = self._motor.reglas[i]
+            out.append(Hit(tabla, etiqueta, *m.span()))
+        return sorted(out, key=lambda h: (h.start, h.end))
+
+    def etiquetas(self, tabla: str) -> list[str]:
+        """Etiquetas de `tabla` con al menos un hit, en el orden de la tabla (sin repetir)."""
+        out: list[str] = []
+        for i in self._motor.por_tabla[tabla]:
+            etiqueta = self._motor.reglas[i][1]
+            if i in self._hits and etiqueta not in out:
+                out.append(etiqueta)
+        return out
+
+    def match(self, tabla: str) -> Optional[re.Match]:
+        """re.Match (con subgrupos) de la regla de mayor prioridad de `tabla` que coincidió."""
+        for i in self._motor.por_tabla[tabla]:
+            m = self._hits.get(i)
+            if m is not None:
+                return m
+        return None
+
+    def primera(self, tabla: str) -> Optional[Hit]:
+        """Como match(), pero como Hit (etiqueta + span)."""
+        for i in self._motor.por_tabla[tabla]:
+            m = self._hits.get(i)
+            if m is not None:
+                tabla_, etiqueta, _ = self._motor.reglas[i]
+                return Hit(tabla_, etiqueta, *m.span())
+        return None
+
+
+class MotorReglas:
+    """
+    Tablas {tabla: [(patrón, etiqueta), ...]} compiladas una sola vez al importar.
+
+    escanear() pasa a minúsculas UNA vez y evalúa todas las reglas sobre ese mismo buffer;
+    el resultado se memoiza por texto, así que infer_sistema, infer_clasificacion, etc.
+    leen del mismo Analisis en lugar de volver a recorrer el reporte.
+
+    Nota: se probó una única alternancia `(?=(?P<r0>...))|(?=(?P<r1>...))|…`; con el motor
+    backtracking de `re` resultó 4–5× más lenta que una búsqueda por regla precompilada,
+    porque anula el salto por prefijo literal que `re` aplica a cada patrón por separado.
+    """
+
+    def __init__(self, tablas: dict[str, list[tuple[str, str]]]):
+        self.reglas: list[tuple[str, str, re.Pattern]] = []
+        self.por_tabla: dict[str, list[int]] = {}
+        for tabla, reglas in tablas.items():
+            for pat, etiqueta in reglas:
+                self.por_tabla.setdefault(tabla, []).append(len(self.reglas))
+                self.reglas.append((tabla, etiqueta, re.compile(pat)))
+
+    def escanear(self, texto: str) -> Analisis:
+        t = (texto or "").lower()
+        hits: dict[int, re.Match] = {}
+        for i, (_, _, pat) in enumerate(self.reglas):
+            m = pat.search(t)
+            if m is not None:
+                hits[i] = m
+        return Analisis(self, t, hits)
+
+    def escanear_cache(self, texto: str) -> Analisis:
+        return _escanear_memo(self, texto or "")
+
+
+@lru_cache(maxsize=256)
+def _escanear_memo(motor: MotorReglas, texto: str) -> Analisis:
+    return motor.escanear(texto)
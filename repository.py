@@ -1,53 +1,196 @@
 # --- IMPORTS ---
+# pandas, gspread, vertexai y google-auth se importan recién al usarse (arranque en frío rápido)
 import streamlit as st
-import gspread
-import pandas as pd
-import re
-import json
-from typing import Optional, Iterable
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-
-# Vertex AI
-from vertexai import init as vertex_init
-from vertexai.generative_models import GenerativeModel
-from google.oauth2.service_account import Credentials
-
-# --- CONFIG GOOGLE SHEETS (lo que ya tenías) ---
+import threading
+import time
+from typing import Callable, Optional
+from datetime import datetime
+
+from cache_llm import CacheLLM, huella_prompt
+from codigos import CodigoAllocator
+from cola_hoja import ColaHoja
+from duplicados import Coincidencia, IndiceDuplicados, fila_reusada, normalizar
+from llm import CircuitBreaker, LLMClient, LLMCubierto, PresupuestoTokens, TokenBucket, estimar_tokens
+from masivo import leer_reportes, procesar_lote
+from procesamiento import (
+    TZ, COLUMNAS, ESQUEMA_FILA, ContextoReporte, persona, persona_json,
+    campos_parciales, normalize_21_fields, parse_model_output_to_dict, procesar_respuesta, respuesta_completa,
+    sanitize_text,
+)
+from casete import ModeloGrabado
+from archivo import archivar
+from recursos import (
+    ARCHIVO_EDAD_DIAS, get_archivo, get_casete, get_espejo, get_hoja, get_indice_busqueda, get_metricas,
+)
+from via_rapida import extraer as extraer_por_reglas
+
+# --- CONFIG GOOGLE SHEETS ---
 # gc = gspread.service_account_from_dict(st.secrets["connections"]["gsheets"])
-# SHEET_ID = "..." ; sh = gc.open_by_key(SHEET_ID) ; ws = sh.worksheet("Reportes")
+# SHEET_ID en secrets ; sh = gc.open_by_key(SHEET_ID) ; ws = sh.worksheet("Reportes")
+# (recursos.get_hoja: una vez por proceso, compartido con las páginas de pages/;
+#  se abre en la primera lectura/escritura, no al cargar la página)
 
 st.title("MATRIZ DE REPORTES DSEC")
 
 # --- CONFIG VERTEX AI (usa tu Service Account en secrets) ---
-from google.oauth2.service_account import Credentials
-from vertexai import init as vertex_init
-from vertexai.generative_models import GenerativeModel
-
-# 1) Carga credenciales desde tus secrets (ya las tienes en connections.gsheets)
-sa_info = dict(st.secrets["connections"]["gsheets"])
-creds   = Credentials.from_service_account_info(sa_info)
-
-# 2) Proyecto y región desde secrets
+# Proyecto y región desde secrets
 PROJECT_ID = st.secrets["GCP_PROJECT_ID"]          # p.ej. "portafolio-461101" (¡ojo! no confundir con 'matriz' si no es el project real)
 REGION     = st.secrets.get("VERTEX_REGION", "us-central1")
+MODEL_NAME = "gemini-1.5-flash"                    # nombre flotante del modelo (evita -002 mientras pruebas)
+HEALTH_TTL_S = int(st.secrets.get("VERTEX_HEALTH_TTL_S", 300))
+BULK_MAX_WORKERS = int(st.secrets.get("BULK_MAX_WORKERS", 4))   # llamadas simultáneas en importación masiva
+# Límites del cliente LLM (compartidos por todas las sesiones del proceso)
+LLM_RATE_PER_MIN = float(st.secrets.get("LLM_RATE_PER_MIN", 60))
+LLM_BURST        = int(st.secrets.get("LLM_BURST", 10))
+LLM_TIMEOUT_S    = float(st.secrets.get("LLM_TIMEOUT_S", 60))
+LLM_MAX_RETRIES  = int(st.secrets.get("LLM_MAX_RETRIES", 4))
+# Formato de salida del modelo: "json" (esquema, sin realineo) o "pipes" (línea con |)
+LLM_OUTPUT_MODE  = st.secrets.get("LLM_OUTPUT_MODE", "pipes")
+# Presupuesto de tokens por reporte (estimado localmente antes de enviar)
+LLM_TOKENS_AVISO = int(st.secrets.get("LLM_TOKENS_AVISO", 2000))
+LLM_TOKENS_MAX   = int(st.secrets.get("LLM_TOKENS_MAX", 8000))
+# Reportar en modo "pipes": vista previa progresiva a medida que llegan los fragmentos
+LLM_STREAMING    = bool(st.secrets.get("LLM_STREAMING", True))
+# Cobertura (hedging): si el modelo tarda más que su percentil de latencia, el mismo pedido va
+# a una región de respaldo y/o un modelo más liviano; gana la primera fila completa
+LLM_COBERTURA             = bool(st.secrets.get("LLM_COBERTURA", False))
+REGION_RESPALDO           = st.secrets.get("VERTEX_REGION_RESPALDO", REGION)
+MODEL_NAME_RESPALDO       = st.secrets.get("MODEL_NAME_RESPALDO", "gemini-1.5-flash-8b")
+LLM_COBERTURA_PERCENTIL   = float(st.secrets.get("LLM_COBERTURA_PERCENTIL", 0.9))
+LLM_COBERTURA_MAX_FRACCION = float(st.secrets.get("LLM_COBERTURA_MAX_FRACCION", 0.1))  # tope de pedidos extra
+
+GEN_CONFIG = {"temperature": 0.2}
+GEN_CONFIG_JSON = {**GEN_CONFIG, "response_mime_type": "application/json", "response_schema": ESQUEMA_FILA}
+# modo → (instrucción de sistema, generation_config, archivo de caché)
+# La instrucción fija va como system_instruction del modelo; en cada llamada solo viaja el reporte.
+MODOS_SALIDA = {
+    "pipes": (persona, GEN_CONFIG, "cache_llm.sqlite3"),
+    "json": (persona_json, GEN_CONFIG_JSON, "cache_llm_json.sqlite3"),
+}
+presupuesto = PresupuestoTokens(aviso=LLM_TOKENS_AVISO, maximo=LLM_TOKENS_MAX)
+# Casi-duplicados: similitud mínima (Jaccard estimado) y cuántos incidentes recientes se indexan
+DUP_UMBRAL   = float(st.secrets.get("DUP_UMBRAL", 0.6))
+DUP_MAX_DOCS = int(st.secrets.get("DUP_MAX_DOCS", 20000))
+# Vía rápida: sin modelo cuando los campos obligatorios y la Clasificación superan el umbral de confianza
+# (apagada por defecto hasta validar los extractores contra reportes reales)
+VIA_RAPIDA        = bool(st.secrets.get("VIA_RAPIDA", False))
+VIA_RAPIDA_UMBRAL = float(st.secrets.get("VIA_RAPIDA_UMBRAL", 0.8))
+# Panel admin de métricas en la barra lateral
+ADMIN_METRICS = bool(st.secrets.get("ADMIN_METRICS", False))
 
-# 3) Inicializa Vertex con credenciales del SA
-vertex_init(project=PROJECT_ID, location=REGION, credentials=creds)
 
-# 4) Usa el nombre flotante del modelo (evita -002 mientras pruebas)
-model = GenerativeModel("gemini-1.5-flash")
+metricas = get_metricas()
 
-# 5) (opcional) smoke test
-try:
-    r = model.generate_content(["hello"], generation_config={"temperature": 0.0})
-    st.write(":grey[Vertex OK]")
-except Exception as e:
-    st.error(f"Vertex error: {e}")
-    st.stop()
 
+class VertexHealth:
+    """
+    Estado del smoke test de Vertex, compartido por todo el proceso.
+    El chequeo corre en un hilo de fondo: la página nunca espera al modelo para dibujarse.
+    """
+
+    def __init__(self, model, ttl_s: int = HEALTH_TTL_S):
+        self._model = model
+        self._ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._running = False
+        self.ok: Optional[bool] = None      # None = aún verificando
+        self.error = ""
+        self.checked_at = 0.0               # time.monotonic() del último chequeo
 
-TZ = ZoneInfo("America/La_Paz")
+    def _check(self):
+        try:
+            self._model.generate_content(
+                ["hello"], generation_config={"temperature": 0.0, "max_output_tokens": 1}
+            )
+            ok, error = True, ""
+        except Exception as e:
+            ok, error = False, str(e)
+        with self._lock:
+            self.ok, self.error = ok, error
+            self.checked_at = time.monotonic()
+            self._running = False
+
+    def refresh(self):
+        """Lanza un chequeo en segundo plano (si no hay uno en curso)."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._check, name="vertex-health", daemon=True).start()
+
+    def estado(self) -> tuple[Optional[bool], str]:
+        """Devuelve (ok, error); si el resultado venció el TTL, re-chequea en segundo plano."""
+        with self._lock:
+            vencido = time.monotonic() - self.checked_at > self._ttl_s
+            ok, error = self.ok, self.error
+        if vencido:
+            self.refresh()
+        return ok, error
+
+
+@st.cache_resource(show_spinner=False)
+def get_vertex() -> tuple[dict[str, LLMClient | LLMCubierto], VertexHealth]:
+    """
+    Credenciales + vertex_init + modelos + clientes LLM: una sola vez por proceso (no en cada rerun).
+    Un modelo por modo de salida (cada uno con su system_instruction); todos comparten
+    el mismo límite de tasa y circuit breaker.
+    Con LLM_COBERTURA cada cliente se cubre con un respaldo (región/modelo de secrets) que
+    tiene su propio límite de tasa y breaker.
+    Con CASETE (secrets) los modelos graban sus respuestas o las reproducen sin Vertex.
+    Se llama en la primera consulta al modelo (o al final del script, para el estado en la barra lateral).
+    """
+    casete = get_casete()
+    reproducir = casete is not None and not casete.grabando
+    if not reproducir:
+        # Vertex AI
+        from vertexai import init as vertex_init
+        from vertexai.generative_models import GenerativeModel
+        from google.oauth2.service_account import Credentials
+
+        # Credenciales desde tus secrets (ya las tienes en connections.gsheets)
+        sa_info = dict(st.secrets["connections"]["gsheets"])
+        creds   = Credentials.from_service_account_info(sa_info)
+        vertex_init(project=PROJECT_ID, location=REGION, credentials=creds)
+
+    def modelo(nombre: str, instruccion: str):
+        real = None if reproducir else GenerativeModel(nombre, system_instruction=[instruccion])
+        return ModeloGrabado(real, casete, nombre, instruccion) if casete is not None else real
+
+    bucket, breaker = TokenBucket(LLM_RATE_PER_MIN / 60.0, LLM_BURST), CircuitBreaker()
+    primarios = {
+        modo: LLMClient(
+            modelo(MODEL_NAME, instruccion),
+            bucket=bucket, breaker=breaker,
+            timeout_s=LLM_TIMEOUT_S, max_retries=LLM_MAX_RETRIES,
+        )
+        for modo, (instruccion, _, _) in MODOS_SALIDA.items()
+    }
+    clientes: dict[str, LLMClient | LLMCubierto] = dict(primarios)
+    if LLM_COBERTURA:
+        # Con el nombre completo del recurso el modelo usa esa región (vertex_init fija la del primario)
+        respaldo = f"projects/{PROJECT_ID}/locations/{REGION_RESPALDO}/publishers/google/models/{MODEL_NAME_RESPALDO}"
+        bucket_r, breaker_r = TokenBucket(LLM_RATE_PER_MIN / 60.0, LLM_BURST), CircuitBreaker()
+        for modo, (instruccion, _, _) in MODOS_SALIDA.items():
+            clientes[modo] = LLMCubierto(
+                primarios[modo],
+                LLMClient(
+                    modelo(respaldo, instruccion),
+                    bucket=bucket_r, breaker=breaker_r, timeout_s=LLM_TIMEOUT_S, max_retries=1,
+                ),
+                valida=lambda r: respuesta_completa(_texto_fragmento(r)),
+                percentil=LLM_COBERTURA_PERCENTIL,
+                max_fraccion=LLM_COBERTURA_MAX_FRACCION,
+                contar=lambda resultado: metricas.contar("llm_cobertura", resultado=resultado),
+            )
+    # El smoke test va por su propio cliente (bucket y breaker aparte, sin reintentos): un
+    # chequeo fallido no gasta cupo ni abre el circuito del tráfico real
+    health = VertexHealth(LLMClient(primarios["pipes"].model, timeout_s=LLM_TIMEOUT_S, max_retries=0, max_workers=1))
+    health.refresh()  # warm-up: una vez, en segundo plano
+    return clientes, health
+
+
+# Se llena al final del script: inicializar Vertex no retrasa el formulario
+estado_vertex = st.sidebar.empty()
 
 
 st.markdown("""
@@ -65,476 +208,35 @@ Por favor, describe el incidente en **un solo párrafo** incluyendo estos campos
 8. **Encargado** - El responsable del incidente/alerta.
 """)
 
-COLUMNAS = [
-    "CODIGO","Fecha y Hora de Apertura","Modo Reporte","Evento/ Incidente",
-    "Descripción Evento/ Incidente","Sistema","Area","Ubicación","Impacto",
-    "Clasificación","Acción Inmediata","Solución","Area de GTIC - Coordinando",
-    "Encargado SI","Fecha y Hora de Cierre","Tiempo Solución","Estado",
-    "Vulnerabilidad","Causa","ID Amenaza","Amenaza"
-]
-
-# Valores válidos / normalizadores rápidos
-MODO_VALIDOS = {"correo","jira","teléfono","telefono","monitoreo","webex","whatsapp","otro"}
-IMPACTO_VALIDOS = {"alto","medio","bajo"}
-ESTADO_VALIDOS = {"cerrado","en investigación"}
-
-# ---------------------------
-# Guías (texto de referencia)
-# ---------------------------
-
-CODE_RE = re.compile(r'^\d+\.\d+$')
-
-# ---------------------------
-# Clasificaciones válidas (lista cerrada)
-# ---------------------------
-CLASIF_CANON = {
-    "acceso no autorizado": "Acceso no autorizado",
-    "modificación de recursos no autorizado": "Modificación de recursos no autorizado",
-    "uso inapropiado de recursos": "Uso inapropiado de recursos",
-    "no disponibilidad de recursos": "No disponibilidad de recursos",
-    "multicomponente": "Multicomponente",
-    "exploración de vulnerabilidades": "Exploración de Vulnerabilidades",
-    "otros": "Otros",
-}
-CLASIF_TEXTO = "\n".join([f"- {v}" for v in CLASIF_CANON.values()])
-
-# ---------------------------
-# Prompt (CODIGO lo genera backend y no se inventan fechas)
-# ---------------------------
-persona = f"""
-Eres un asistente experto en seguridad informática. Convierte el reporte en UNA SOLA LÍNEA con exactamente 21 valores separados por | (pipe). Sin encabezados, sin markdown, sin explicaciones, sin saltos de línea. Exactamente 20 pipes.
-{COLUMNAS}
-
-Reglas:
-- Las claves 18-21 ("Vulnerabilidad","Causa","ID Amenaza","Amenaza") siempre vacías.
-- No inventes fechas. Usa "YYYY-MM-DD HH:MM" solo si el texto menciona día/mes/año; si no, deja vacío.
-- Zona horaria: America/La_Paz. En el año 2025
-- NO inventes ni completes los campos 18 (Vulnerabilidad), 19 (Causa), 20 (ID Amenaza) y 21 (Amenaza).
-  Déjalos vacíos siempre.
-- NO inventes fechas: si el reporte no incluye una fecha explícita con día/mes/año (p. ej., "2025-08-10", "10/08/2025" o "10 de agosto de 2025"), deja vacíos los campos de fecha. Si solo hay horas, no pongas fecha.
-- Importante: NO uses el carácter | dentro de ningún campo. Si necesitas separar ideas usa ; (punto y coma).
-- Responde únicamente la línea con 21 campos separados por | (exactamente 20 pipes), sin comentarios ni texto adicional.
-
-Columnas y formato:
-1. CODIGO → (dejar vacío; lo genera el sistema).
-2. Fecha y Hora de Apertura → YYYY-MM-DD HH:MM, solo si se menciona (con día/mes/año explícitos).
-3. Modo Reporte → valores válidos (Correo, Jira, Teléfono, Monitoreo, …).
-4. Evento/ Incidente → Evento | Incidente.
-5. Descripción Evento/ Incidente → resumen claro y profesional.
-6. Sistema → (VPN, Correo, Active Directory, …).
-7. Area
-8. Ubicación
-9. Impacto → Alto | Medio | Bajo.
-10. Clasificación → elige exactamente UNO de: 
-{CLASIF_TEXTO}
-11. Acción Inmediata
-12. Solución
-13. Area de GTIC - Coordinando → (DSEC - Seguridad, DITC - Infraestructura, DSTC - Soporte Técnico, DISC - Sistemas, …).
-14. Encargado SI → solo si se menciona; no inventes nombres.
-15. Fecha y Hora de Cierre → YYYY-MM-DD HH:MM, solo si se menciona (con día/mes/año explícitos).
-16. Tiempo Solución → “X horas Y minutos” si puedes calcular (Cierre − Apertura); si no, vacío.
-17. Estado → Cerrado | En investigación.
-18. Vulnerabilidad → Vacio
-19. Causa → vacío.
-20. ID Amenaza → Vacio
-21. Amenaza → vacío.
-
-[REPORTE DE ENTRADA]:
-"""
-
-# ---------------------------
-# Utilidades de saneamiento / validación
-# ---------------------------
-def parse_model_output_to_dict(raw: str) -> dict | None:
-    # Intenta JSON directo
-    s = raw.strip()
-    # Quitar cercos accidentales
-    s = s.strip('`').strip()
-    try:
-        obj = json.loads(s)
-        if isinstance(obj, dict) and all(k in obj for k in COLUMNAS):
-            return obj
-    except Exception:
-        pass
-    return None
-
-def build_row_from_record(rec: dict) -> list[str]:
-    # Mapea por nombre → orden canónico
-    fila = [ (rec.get(col) or "").strip() for col in COLUMNAS ]
-    return fila
-
-def fallback_parse_pipes(raw: str) -> list[str]:
-    cleaned = sanitize_text(raw)
-    parts, _ = normalize_21_fields(cleaned)
-    # “Evento/ Incidente” a valor canónico
-    parts[3] = norm_evento_incidente(parts[3])
-    # Forzar vacíos 18–21
-    parts[17] = ""; parts[18] = ""; parts[19] = ""; parts[20] = ""
-    return parts
-    
-def sanitize_text(s: str) -> str:
-    s = s.strip()
-    s = re.sub(r"^```.*?\n", "", s, flags=re.DOTALL)
-    s = re.sub(r"```$", "", s)
-    s = s.replace("```", "")
-    s = s.replace("\n", " ").replace("\r", " ")
-    s = s.replace("“", '"').replace("”", '"').replace("’", "'")
-    m = re.search(r"[^|\n]*\|[^|\n]*\|", s)
-    if m:
-        s = s[m.start():]
-    return s.strip().strip('"').strip()
-
-def assert_20_pipes(s: str):
-    """Muestra un aviso si la línea no tiene exactamente 20 pipes (21 campos)."""
-    cnt = s.count("|")
-    if cnt != 20:
-        st.info(f"Se detectaron {cnt+1} campos; se fusionará el excedente en 'Descripción'.")
-
-def normalize_21_fields(raw: str) -> Tuple[List[str], List[str]]:
-    avisos = []
-    parts = [p.strip() for p in raw.split("|")]
-    original_count = len(parts)
-    if original_count > 21:
-        # Fusiona el excedente en 'Descripción' (columna 5)
-        keep_tail = 16  # columnas 6..21
-        left_end = max(4, original_count - keep_tail)
-        desc = " | ".join(parts[4:left_end])
-        parts = parts[:4] + [desc] + parts[left_end:]
-        avisos.append(f"Se detectaron {original_count} campos; se fusionó el excedente en 'Descripción'.")
-    if len(parts) < 21:
-        faltan = 21 - len(parts)
-        avisos.append(f"Se detectaron {len(parts)} campos; se completaron {faltan} vacíos.")
-        parts += [""] * faltan
-    parts = [p.strip() for p in parts]
-    return parts, avisos
-
-def is_empty_token(x: str) -> bool:
-    # Por ahora, solo vacío literal (""), como pediste
-    return x.strip().lower() in {""}
-
-def clean_empty_tokens(parts: list[str]) -> list[str]:
-    """Quita espacios extra en cada token sin alterar posiciones."""
-    return [(p or "").strip() for p in parts]
-
-def norm_opcion(valor: str, opciones: list[str]) -> str:
-    """Normaliza por similitud básica contra un set de opciones."""
-    v = (valor or "").strip().lower()
-    for op in opciones:
-        if v == op.lower():
-            return op
-    # sinonimos rápidos
-    if v in ("telefono","teléfono","tel"): return "Teléfono"
-    if v in ("email","correo"): return "Correo"
-    return valor or ""
-
-
-def parse_dt(s: str):
-    s = s.strip()
-    try:
-        return datetime.strptime(s, "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
-    except Exception:
-        return None
-
-def calcula_tiempo_solucion(apertura: str, cierre: str) -> str:
-    dt_a = parse_dt(apertura) if apertura else None
-    dt_c = parse_dt(cierre) if cierre else None
-    if dt_a and dt_c and dt_c >= dt_a:
-        delta = dt_c - dt_a
-        horas = delta.seconds // 3600 + delta.days * 24
-        minutos = (delta.seconds % 3600) // 60
-        return f"{horas} horas {minutos} minutos"
-    return ""
-
 # ---------------------------
-# Fechas/horas del texto (am/pm y 24h)
+# Copia local de la hoja (lecturas sin pasar por la API en cada vista)
 # ---------------------------
-MESES_ES = r"enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
-MESES_MAP = {
-    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9,
-    "octubre": 10, "noviembre": 11, "diciembre": 12,
-}
-ISO_FECHA_RE = re.compile(r"\b(20\d{2})-(\d{1,2})-(\d{1,2})\b")              # 2025-09-05
-DMY_SLASH_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?\b")   # 5/9[/2025] o 05-09-2025
-DM_DE_MES_RE = re.compile(
-    rf"\b(\d{{1,2}})\s+de\s+(?:{MESES_ES})(?:\s+de\s+(\d{{4}}))?\b", re.IGNORECASE
-)
-
-def _safe_int(x: str) -> int | None:
-    try:
-        return int(x)
-    except Exception:
-        return None
-
-def _year_or_current(y: str | None) -> int:
-    if not y:
-        return datetime.now(TZ).year
-    yi = _safe_int(y)
-    if yi is None:
-        return datetime.now(TZ).year
-    if 0 <= yi < 100:
-        return 2000 + yi
-    return yi
-
-def _first_date_in_text(texto: str) -> Optional[datetime.date]:
-    t = texto.lower()
-
-    m = ISO_FECHA_RE.search(t)
-    if m:
-        y, mo, d = map(int, m.groups())
-        return datetime(y, mo, d, tzinfo=TZ).date()
-
-    m = DM_DE_MES_RE.search(t)
-    if m:
-        d = int(m.group(1))
-        mes_txt = m.group(0).lower()
-        mes_name = re.search(rf"{MESES_ES}", mes_txt).group(0)
-        mo = MESES_MAP.get(mes_name, None)
-        y = _year_or_current(m.group(2))
-        if mo:
-            return datetime(y, mo, d, tzinfo=TZ).date()
-
-    m = DMY_SLASH_RE.search(t)
-    if m:
-        d = int(m.group(1)); mo = int(m.group(2)); y = _year_or_current(m.group(3))
-        if 1 <= d <= 31 and 1 <= mo <= 12:
-            return datetime(y, mo, d, tzinfo=TZ).date()
-
-    return None
-
-AMPM_RE = re.compile(
-    r"\b(?P<hour>1[0-2]|0?[1-9])(?::(?P<minute>[0-5]\d))?\s*(?P<ampm>a\.?m\.?|am|p\.?m\.?|pm)\b",
-    re.IGNORECASE
-)
-H24_RE = re.compile(r"\b(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)\b")
-
-def _to_24h(hour: int, minute: int, ampm: str) -> tuple[int, int]:
-    ampm = ampm.lower().replace(".", "")
-    if ampm.startswith("p") and hour != 12:
-        hour += 12
-    if ampm.startswith("a") and hour == 12:
-        hour = 0
-    return hour, minute
-
-def extraer_horas_any(texto: str) -> list[str]:
-    t = texto.lower()
-    horas: list[str] = []
-    for m in AMPM_RE.finditer(t):
-        h = int(m.group("hour")); mi = int(m.group("minute") or 0)
-        H, M = _to_24h(h, mi, m.group("ampm"))
-        horas.append(f"{H:02d}:{M:02d}")
-    for m in H24_RE.finditer(t):
-        H = int(m.group("hour")); M = int(m.group("minute"))
-        horas.append(f"{H:02d}:{M:02d}")
-    seen, out = set(), []
-    for x in horas:
-        if x not in seen:
-            seen.add(x); out.append(x)
-    return out
-
-def fechas_desde_texto(texto: str) -> tuple[str, str]:
-    """
-    Retorna (apertura, cierre) en "YYYY-MM-DD HH:MM".
-    - Si hay día+mes (con o sin año) y horas, usa esa fecha (año actual si falta).
-    - Si solo hay horas, usa fecha de hoy.
-    - Si no hay horas, retorna ("","").
-    - Si hay dos o más horas, cierre = última; si la última < primera, suma 1 día.
-    """
-    horas = extraer_horas_any(texto)
-    if not horas:
-        return "", ""
-
-    base_date = _first_date_in_text(texto) or datetime.now(TZ).date()
-    a_str = f"{base_date} {horas[0]}"
-    if len(horas) > 1:
-        c_date = base_date
-        h0 = datetime.strptime(horas[0], "%H:%M").time()
-        h1 = datetime.strptime(horas[-1], "%H:%M").time()
-        if (h1.hour, h1.minute) < (h0.hour, h0.minute):
-            c_date = base_date + timedelta(days=1)
-        c_str = f"{c_date} {horas[-1]}"
-    else:
-        c_str = ""
-    return a_str, c_str
-
-def calcula_tiempo_desde_texto(texto: str) -> str:
-    # Si hay al menos dos horas en el texto, calcula diferencia usando la fecha de hoy
-    hh = extraer_horas_any(texto)
-    if len(hh) < 2:
-        return ""
-    h_ini, h_fin = hh[0], hh[-1]
-    today = datetime.now(TZ).date()
-    a = datetime.strptime(f"{today} {h_ini}", "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
-    c = datetime.strptime(f"{today} {h_fin}", "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
-    if c < a:
-        c = c + timedelta(days=1)
-    delta = c - a
-    horas = delta.seconds // 3600 + delta.days * 24
-    minutos = (delta.seconds % 3600) // 60
-    return f"{horas} horas {minutos} minutos"
+espejo = get_espejo()
+archivo_hist = get_archivo()
 
-# ---------------------------
-# Inferencia de Ubicación / Modo / Acción / Solución / Clasificación / Área GTIC / Sistema / Área
-# ---------------------------
-DEPTS_BO = {
-    "la paz": ["la paz", "lpz", "senkata"],
-    "santa cruz": ["santa cruz", "scz", "santa cruz de la sierra", "pau"],
-    "cochabamba": ["cochabamba", "cbba", "cbb"],
-    "chuquisaca": ["chuquisaca", "sucre"],
-    "oruro": ["oruro"],
-    "potosí": ["potosi", "potosí"],
-    "beni": ["beni", "trinidad"],
-    "pando": ["pando", "cobija"],
-    "tarija": ["tarija", "yacuiba", "villa montes"],
-}
-def detectar_ubicacion_ext(texto: str) -> str:
-    t = texto.lower()
-    if "a nivel nacional" in t or "nivel nacional" in t:
-        return "Bolivia (nivel nacional)"
-    m = re.search(r"(sucursal|oficina|sede)\s+([a-záéíóúñ ]+)", t)
-    if m:
-        return f"{m.group(1).title()} {m.group(2).strip().title()}"
-    for dept, keys in DEPTS_BO.items():
-        for k in keys:
-            if re.search(rf"\b{k}\b", t):
-                return f"{dept.title()}, Bolivia"
-    return ""
-
-def detectar_modo_reporte(texto: str) -> str:
-    t = texto.lower()
-    if "jira" in t or "ticket" in t:
-        return "Jira"
-    if "monitoreo" in t or "alerta" in t:
-        return "Monitoreo"
-    if any(x in t for x in ["teléfono", "telefono", "llam", "llamada", "celular", "whatsapp"]):
-        return "Teléfono"
-    if any(x in t for x in ["correo", "e-mail", "email", "mail", "outlook"]):
-        return "Correo"
-    return "Teléfono"
-
-def extraer_encargado(texto: str) -> str:
+def codigos_en_hoja(fresco: bool = False) -> list[str]:
     """
-    Busca frases como 'el encargado es <NOMBRE>' o 'responsable <NOMBRE>'.
-    Devuelve el nombre si lo encuentra.
+    Columna CODIGO desde la copia local (fresco=True fuerza traer las filas nuevas), más los
+    CODIGO ya archivados: siguen contando para la unicidad aunque no estén en la hoja.
+    Tras sincronizar, el generador de CODIGO siembra (la primera vez) o registra solo las
+    filas nuevas: códigos de otras instancias o cargados a mano en la hoja.
     """
-    t = texto.lower()
-    m = re.search(r"(encargad[oa]|responsable)\s+(es\s+)?([a-záéíóúñ\s]+)", texto, re.IGNORECASE)
-    if m:
-        nombre = m.group(3).strip()
-        # Cortar si hay 'del área' o frases largas
-        nombre = re.split(r"\s+(del|de la|de los|de las)\b", nombre, 1)[0].strip()
-        return nombre.title()
-    return ""
-
-ACCION_RULES = [
-    (r"reinici(ar|ó|o|amos|aron).*(equipo|pc|servicio|servidor)", "Reinicio de servicios/equipo"),
-    (r"(verific(ar|ó|aron).*(conectividad|ping|traz))", "Verificación de conectividad"),
-    (r"(bloque(o|ar|ó).*(cuenta)|forz[oó].*contraseñ|cambio de contraseñ)", "Bloqueo/cambio de contraseñas"),
-    (r"aisl(ar|ado|amiento).*(equipo)|segmentaci[oó]n", "Aislamiento del equipo"),
-]
-SOLUCION_RULES = [
-    (r"(desbloque(o|ar)|reset).*cuenta|restablecimi?ento.*contraseñ", "Desbloqueo / reseteo de cuenta"),
-    (r"(limpieza|eliminaci[oó]n).*(malware|virus|troyano)", "Limpieza de malware"),
-    (r"(regla|permit|bloque).*(firewall|fw|ips|waf)", "Ajuste de reglas en firewall/WAF"),
-    (r"(whitelist|allowlist|excepci[oó]n)", "Creación de excepción/allowlist"),
-    (r"(reconfiguraci[oó]n|ajuste).*(pol[ií]tica|configuraci[oó]n)", "Reconfiguración de políticas"),
-]
-def _collect(vals: set[str], rules: list[tuple[str,str]], texto: str):
-    t = texto.lower()
-    for pat, label in rules:
-        if re.search(pat, t):
-            vals.add(label)
-def infer_accion_inmediata(texto: str) -> str:
-    s: set[str] = set(); _collect(s, ACCION_RULES, texto)
-    return "; ".join(sorted(s)) if s else ""
-def infer_solucion(texto: str) -> str:
-    s: set[str] = set(); _collect(s, SOLUCION_RULES, texto)
-    return "; ".join(sorted(s)) if s else ""
-
-CLASIF_PATTERNS = {
-    "Acceso no autorizado": [
-        r"acceso no autoriz", r"intrus", r"suplantaci[oó]n",
-        r"credenciales? (compromet|filtrad|robadas)", r"elevaci[oó]n de privilegios",
-        r"cuenta comprometida|login irregular",
-    ],
-    "Modificación de recursos no autorizado": [
-        r"defacement|desfiguraci[oó]n", r"alteraci[oó]n|modificaci[oó]n.*no autoriz",
-        r"borrad(o|a) (no autoriz|accidental)", r"integridad.*(afectad|compromet)",
-    ],
-    "Uso inapropiado de recursos": [
-        r"uso inapropiad|uso indebido|violaci[oó]n.*pol[íi]tica.*uso", r"usb no autoriz",
-    ],
-    "No disponibilidad de recursos": [
-        r"ca[ií]da|indisponibil|no disponible|servicio.*no responde|interrupci[oó]n|apag[oó]n|fuera de servicio|vpn.*ca[ií]da|ddos|denegaci[oó]n",
-    ],
-    "Exploración de Vulnerabilidades": [
-        r"escane[oó]|scan|nmap|nessus|openvas|enumeraci[oó]n|port scan|sondeo de puertos",
-    ],
-}
-def infer_clasificacion(texto: str, clasif_modelo: str = "") -> str:
-    cm = clasif_modelo.strip().lower()
-    if cm in CLASIF_CANON:
-        return CLASIF_CANON[cm]
-    hits = []
-    t = texto.lower()
-    for nombre, pats in CLASIF_PATTERNS.items():
-        if any(re.search(p, t) for p in pats):
-            hits.append(nombre)
-    if len(hits) >= 2: return "Multicomponente"
-    if len(hits) == 1: return hits[0]
-    return ""
-
-def normaliza_clasificacion_final(valor: str) -> str:
-    v = valor.strip().lower()
-    if not v: return ""
-    for k, canon in CLASIF_CANON.items():
-        if k in v:
-            return canon
-    return ""
-
-def infer_area_coordinando(texto: str) -> str:
-    t = texto.lower()
-    if "seguridad" in t:
-        return "DSEC - Seguridad"
-    if "infraestructura" in t or "redes" in t or "vpn" in t or "cisco" in t:
-        return "DITC - Infraestructura"
-    if "soporte" in t or "mesa de ayuda" in t:
-        return "DSTC - Soporte Técnico"
-    if "sistemas" in t or "erp" in t or "base de datos" in t:
-        return "DISC - Sistemas"
-    return ""
-
-
-def infer_sistema(texto: str) -> str:
-    t = texto.lower()
-    if re.search(r"\bvpn\b", t): return "VPN"
-    if re.search(r"correo|email|outlook|exchange", t): return "Correo"
-    if re.search(r"active directory|\bad\b", t): return "Active Directory"
-    if re.search(r"\bfirewall\b", t): return "Firewall"
-    if re.search(r"\berp\b", t): return "ERP"
-    if re.search(r"whatsapp", t): return "WhatsApp"
-    if re.search(r"portal web|sitio web|web p[úu]blica|p[aá]gina web", t): return "Portal Web"
-    if re.search(r"base de datos|postgres|oracle|mysql|sql server|mssql", t): return "Base de Datos"
-    return ""
-
-def infer_area(texto: str) -> str:
-    t = texto.lower()
-    m = re.search(r"(área|area|departamento|unidad)\s+de\s+([a-záéíóúñ ]+)", t)
-    if m:
-        return m.group(2).strip().title()
-    return ""
-
-def norm_opcion(valor: str, validos: list[str]) -> str:
-    v = (valor or "").strip().lower()
-    for x in validos:
-        if v == x.lower():
-            return x
-    return ""
+    with metricas.span("espejo_sync"):
+        if fresco:
+            espejo.sincronizar()
+        else:
+            espejo.asegurar_fresco()
+    get_codigo_allocator().ponerse_al_dia(espejo, archivo_hist)
+    return archivo_hist.codigos() + espejo.codigos()
 
 # ---------------------------
 # Generador de CODIGO: INC-<día>-<mes>-<NNN>
 # ---------------------------
-def generar_codigo_inc(ws, fecha_apertura: str | None) -> str:
+@st.cache_resource(show_spinner=False)
+def get_codigo_allocator() -> CodigoAllocator:
+    return CodigoAllocator()
+
+def dia_mes_codigo(fecha_apertura: str | None) -> tuple[int, int]:
     dia, mes = None, None
     if fecha_apertura:
         try:
@@ -545,294 +247,368 @@ def generar_codigo_inc(ws, fecha_apertura: str | None) -> str:
     if dia is None:
         now = datetime.now(TZ)
         dia, mes = now.day, now.month
+    return dia, mes
 
-    codigos = ws.col_values(1)  # CODIGO
-    patron = re.compile(rf"^INC-{dia}-{mes}-(\d{{3}})$")
-    max_seq = 0
-    for c in codigos:
-        if not c: continue
-        m = patron.match(c.strip())
-        if m:
-            n = int(m.group(1))
-            if n > max_seq: max_seq = n
-
-    seq = max_seq + 1
-    candidato = f"INC-{dia}-{mes}-{seq:03d}"
-    existentes = set(x.strip() for x in codigos if x)
-    while candidato in existentes:
-        seq += 1
-        candidato = f"INC-{dia}-{mes}-{seq:03d}"
-    return candidato
+def _allocator_al_dia() -> CodigoAllocator:
+    """
+    El generador con lo que la copia local ya trajo (sin llamar a la API: la copia la
+    refrescan las vistas y la cola). Solo la primera vez se lee la columna entera.
+    """
+    alloc = get_codigo_allocator()
+    if not alloc.sembrado():
+        codigos_en_hoja()
+    else:
+        alloc.ponerse_al_dia(espejo, archivo_hist)
+    return alloc
+
+def generar_codigo_inc(fecha_apertura: str | None) -> str:
+    alloc = _allocator_al_dia()
+    dia, mes = dia_mes_codigo(fecha_apertura)
+    return alloc.reservar(dia, mes)[0]
+
+# Códigos en bloque (importación masiva): una reserva por (día, mes)
+def generar_codigos_bloque(fechas_apertura: list[str]) -> list[str]:
+    alloc = _allocator_al_dia()
+    grupos: dict[tuple[int, int], list[int]] = {}
+    for i, f in enumerate(fechas_apertura):
+        grupos.setdefault(dia_mes_codigo(f if (f or "").strip() else None), []).append(i)
+    codigos = [""] * len(fechas_apertura)
+    for (dia, mes), idxs in grupos.items():
+        for i, c in zip(idxs, alloc.reservar(dia, mes, len(idxs))):
+            codigos[i] = c
+    return codigos
 
 # ---------------------------
-# UI
+# Escritura a la hoja: journal local + vaciado en lotes en segundo plano
 # ---------------------------
-user_question = st.text_area(
-    "Describe el incidente:",
-    height=200,
-    placeholder="Ej: A las 8:00am el área de Contabilidad reporta por Correo que no puede acceder al sistema de Correo corporativo. Como acción inmediata, el usuario reinició el equipo y Mesa de Ayuda validó conectividad sin resultados. Seguridad Informática coordinó la atención y reinició el servicio de Correo en el servidor, verificando autenticación y entrega de mensajes. A las 10:15am el servicio quedó restablecido y se cerró el incidente.",
-    help="Incluye: Fecha/hora de apertura, Sistema, Área, Acción inmediata, Solución, Área GTIC que coordinó y Fecha/hora de cierre."
-)
+def _escribir_hoja(filas: list[list[str]]):
+    get_hoja().append_rows(filas, value_input_option="USER_ENTERED")
+    espejo.invalidar()  # la próxima lectura trae las filas recién agregadas
+
+@st.cache_resource(show_spinner=False)
+def get_cola_hoja() -> ColaHoja:
+    return ColaHoja(
+        escribir=_escribir_hoja,
+        codigos_en_hoja=lambda: codigos_en_hoja(fresco=True),
+        medir=metricas.span,
+    ).iniciar()
+
+cola_hoja = get_cola_hoja()
+_pend = cola_hoja.estado()
+if _pend["pendiente"] or _pend["enviando"]:
+    st.sidebar.caption(f":orange[Hoja: {_pend['pendiente'] + _pend['enviando']} filas en cola]")
+if _pend["fallido"]:
+    st.sidebar.error(f"Hoja: {_pend['fallido']} filas no se pudieron escribir.")
+    for _c, _n, _e in cola_hoja.fallidos(5):
+        st.sidebar.caption(f"{_c} ({_n} intentos): {_e}")
+    if st.sidebar.button("Reintentar filas fallidas"):
+        cola_hoja.reintentar_fallidos()
+        st.rerun()
 
-if st.button("Reportar", use_container_width=True):
-    if not user_question.strip():
-        st.warning("Por favor, describe el incidente antes de continuar.")
-        st.stop()
+# ---------------------------
+# Casi-duplicados: se consultan antes de llamar al modelo
+# ---------------------------
+@st.cache_resource(show_spinner=False)
+def get_indice_duplicados() -> IndiceDuplicados:
+    return IndiceDuplicados(umbral=DUP_UMBRAL, max_docs=DUP_MAX_DOCS)
+
+def buscar_duplicado(texto: str) -> Optional[Coincidencia]:
+    """Incidente reciente (hoja o esta sesión) casi igual al reporte, o None."""
+    with metricas.span("duplicados") as s:
+        indice = get_indice_duplicados()
+        indice.sincronizar(espejo, textos=cola_hoja.textos)
+        dup = indice.buscar(texto)
+        s["docs"] = len(indice)
+    return dup
 
-    prompt = persona + user_question.strip()
+# ---------------------------
+# LLM
+# ---------------------------
+@st.cache_resource(show_spinner=False)
+def get_cache_llm(modo: str = "pipes") -> CacheLLM:
+    # La versión depende del prompt/modelo/config y va en la clave: si cambian, las entradas
+    # viejas dejan de verse y salen por TTL/tamaño (un archivo por modo)
+    prompt, config, db = MODOS_SALIDA[modo]
+    return CacheLLM(huella_prompt(prompt, MODEL_NAME, config), db=db)
+
+def _texto_fragmento(resp) -> str:
+    # Vertex lanza ValueError en .text si el fragmento no trae texto (p. ej. solo finish_reason)
+    try:
+        return resp.text or ""
+    except Exception:
+        return ""
 
-    with st.spinner("Generando y validando la fila..."):
-        # 1) LLM
-        try:
-            resp = model.generate_content([prompt], generation_config={"temperature": 0.2})
+def _generar(texto: str, modo: str, al_avanzar: Optional[Callable[[str], None]] = None) -> str:
+    """Llamada (o caché) en un modo; con al_avanzar consume la salida en stream y la va reportando."""
+    cache = get_cache_llm(modo)
+    cached = cache.get(texto)
+    if cached is not None:
+        return cached
+    llms, _ = get_vertex()
+    instruccion, config, _ = MODOS_SALIDA[modo]
+    etapa = "llm" if modo == "pipes" else f"llm_{modo}"
+    tokens_est = estimar_tokens(instruccion) + estimar_tokens(texto)
+    with metricas.span(etapa, modelo=MODEL_NAME, tokens_est=tokens_est, stream=al_avanzar is not None) as s:
+        if al_avanzar is None:
+            resp = llms[modo].generate_content([texto.strip()], generation_config=config)
             response_text = resp.text if hasattr(resp, "text") else str(resp)
-        except Exception as e:
-            st.error(f"Error al generar contenido: {e}")
-            st.stop()
+        else:
+            t0, partes, resp = time.perf_counter(), [], None
+            for resp in llms[modo].generate_stream([texto.strip()], generation_config=config):
+                if not partes:
+                    metricas.observar("llm_primer_fragmento", time.perf_counter() - t0)
+                partes.append(_texto_fragmento(resp))
+                al_avanzar("".join(partes))
+            response_text = "".join(partes)
+        s.update(metricas.registrar_tokens(resp))  # en stream, usage_metadata viene en el último fragmento
+    # Solo se guarda una respuesta entera: una vacía, cortada (MAX_TOKENS) o mal formada se
+    # repetiría en cada reenvío del mismo reporte hasta que venza el TTL
+    completa = parse_model_output_to_dict(response_text) is not None if modo == "json" else respuesta_completa(response_text)
+    if completa:
+        cache.put(texto, response_text)
+    return response_text
+
+def llamar_modelo(texto: str, al_avanzar: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Una llamada al modelo para un reporte (o la respuesta en caché); retorna el texto crudo.
+    En modo "json", si la respuesta no es un objeto válido se repite en modo "pipes".
+    al_avanzar(acumulado): solo en modo "pipes" y con LLM_STREAMING; recibe el texto parcial.
+    Lanza PresupuestoExcedido (sin llamar al modelo) si el reporte supera LLM_TOKENS_MAX.
+    """
+    presupuesto.exigir(texto)
+    if LLM_OUTPUT_MODE == "json":
+        response_text = _generar(texto, "json")
+        if parse_model_output_to_dict(response_text) is not None:
+            metricas.contar("salida_llm", modo="json", resultado="ok")
+            return response_text
+        metricas.contar("salida_llm", modo="json", resultado="fallback")
+    response_text = _generar(texto, "pipes", al_avanzar if LLM_STREAMING else None)
+    _, avisos = normalize_21_fields(sanitize_text(response_text))
+    metricas.contar("salida_llm", modo="pipes", resultado="corregida" if avisos else "ok")
+    return response_text
+
+def fila_por_reglas(texto: str, ctx: Optional[ContextoReporte] = None) -> Optional[list[str]]:
+    """Fila armada solo con los extractores locales si los obligatorios y la Clasificación son confiables; si no, None."""
+    if not VIA_RAPIDA:
+        return None
+    with metricas.span("via_rapida") as s:
+        ext = extraer_por_reglas(texto, ctx)
+        bajas = ext.bajas(VIA_RAPIDA_UMBRAL)
+        s["bajas"] = bajas
+    metricas.contar("via_rapida", resultado="modelo" if bajas else "reglas")
+    return None if bajas else ext.fila
+
+_cs = get_cache_llm(LLM_OUTPUT_MODE).stats()
+st.sidebar.caption(f":grey[Caché LLM: {_cs['hits_mem'] + _cs['hits_disk']} aciertos / {_cs['misses']} fallos]")
+
+def tabla(filas: list[list[str]], columnas: list[str]):
+    """DataFrame para st.dataframe/st.data_editor (pandas se carga en la primera tabla, no al abrir la página)."""
+    import pandas as pd
+
+    return pd.DataFrame(filas, columns=columnas)
+
+if ADMIN_METRICS:
+    with st.sidebar.expander("Métricas (admin)"):
+        import pandas as pd
+
+        _res = metricas.resumen()
+        if _res:
+            st.dataframe(
+                pd.DataFrame.from_dict(_res, orient="index")[["n", "p50_ms", "p95_ms", "errores"]].round(1),
+                use_container_width=True,
+            )
+        else:
+            st.caption("Sin datos todavía.")
+        _salidas = metricas.contadores("salida_llm")
+        if _salidas:
+            st.caption(" · ".join(f"{e['modo']} {e['resultado']}: {c}" for e, c in _salidas))
+        _rapida = metricas.contadores("via_rapida")
+        if _rapida:
+            st.caption("Vía rápida: " + " · ".join(f"{e['resultado']}: {c}" for e, c in _rapida))
+        _cobertura = metricas.contadores("llm_cobertura")
+        if _cobertura:
+            st.caption("Cobertura LLM: " + " · ".join(f"{e['resultado']}: {c}" for e, c in _cobertura))
+        _tok = metricas.tokens()
+        if _tok:
+            st.caption(" · ".join(f"tokens {k}: {v:,}" for k, v in sorted(_tok.items())))
+        st.caption(f"Instrucción de sistema: ~{estimar_tokens(MODOS_SALIDA[LLM_OUTPUT_MODE][0]):,} tokens por llamada")
+        st.caption(f"Copia de la hoja: {len(espejo.codigos()):,} filas · sincronizada hace {espejo.edad_s():,.0f} s")
+        st.caption(f"Archivo: {len(archivo_hist):,} incidentes en {len(archivo_hist.particiones())} meses")
+        if st.button(f"Archivar cerrados (> {ARCHIVO_EDAD_DIAS:g} días)", use_container_width=True):
+            with st.spinner("Archivando…"), metricas.span("archivo"):
+                _r = archivar(get_hoja(), espejo, archivo_hist, ARCHIVO_EDAD_DIAS)
+            st.caption(f"{_r.candidatos} candidatos · {_r.archivados} archivados · {_r.borrados} filas quitadas de la hoja")
+            if _r.omitidos:
+                st.warning(f"{len(_r.omitidos)} filas cambiaron de lugar durante el archivo; quedan para la próxima corrida.")
 
-        # 2) Saneo + normalización a 21 columnas
-        cleaned = sanitize_text(response_text)
-        cleaned = re.sub(r"\s\|\s", " ; ", cleaned)
-        assert_20_pipes(cleaned)
-        fila, avisos = normalize_21_fields(cleaned)
-        fila = clean_empty_tokens(fila)
-        fila[3] = "Evento" if "evento" in (fila[3] or "").lower() else "Incidente"
-
-        # Forzar vacíos 18–21
-        fila[17] = ""; fila[18] = ""; fila[19] = ""; fila[20] = ""
-
-        # 3) Fechas: extraer del texto y defaults
-        ap_auto, ci_auto = fechas_desde_texto(user_question)
-        # Si el modelo no dio apertura, usa ahora
-        if not fila[1].strip():
-            fila[1] = datetime.now(TZ).strftime("%Y-%m-%d %H:%M")
-        # Si no hay cierre y el extractor encontró, úsalo
-        if not fila[14].strip() and ci_auto:
-            fila[14] = ci_auto
-
-        # 4) Realineo semántico mínimo (corrige campos corridos)
-                # 4) Realineo semántico reforzado (corrige campos corridos)
-        CIUDADES = {"la paz","el alto","santa cruz","cochabamba","tarija","potosí","potosi","sucre","beni","pando","oruro","bolivia"}
-        IMPACTOS = {"alto","medio","bajo"}
-        ESTADOS  = {"cerrado","en investigación","en investigacion"}
-        MODO_OPC = ["Correo","Jira","Teléfono","Monitoreo","Webex","WhatsApp"]
-        SISTEMAS_KEYWORDS = ["firewall","kubernetes","cortex","checkpoint","proxy","waf","antivirus","umbrella","ise","vpn","exchange","servidor","server","correo","email","outlook"]
-
-        def _looks_ciudad(s: str) -> bool:
-            return any(c in (s or "").lower() for c in CIUDADES)
-        def _looks_impacto(s: str) -> bool:
-            return (s or "").strip().lower() in IMPACTOS
-        def _looks_estado(s: str) -> bool:
-            return (s or "").strip().lower() in ESTADOS
-        def _looks_evento_incidente(s: str) -> bool:
-            return (s or "").strip().lower() in {"evento","incidente"}
-        def _looks_sistema(s: str) -> bool:
-            t = (s or "").strip().lower()
-            return any(k in t for k in SISTEMAS_KEYWORDS)
-        def _norm_modo(s: str) -> str:
-            return norm_opcion(s, MODO_OPC)
-
-        def _put(idx: int, val: str) -> bool:
-            """Escribe en idx solo si está vacío."""
-            if not (fila[idx] or "").strip() and (val or "").strip():
-                fila[idx] = val
-                return True
-            return False
-
-        # Limpieza básica
-        fila = [(x or "").strip() for x in fila]
-
-        # A) Impacto mal ubicado (a veces cae en Sistema/Área/Ubicación/Clasificación…)
-        for i in range(21):
-            if i == 8: 
-                continue
-            if _looks_impacto(fila[i]):
-                _put(8, fila[i].title())
-                if i != 8:
-                    fila[i] = ""
-
-        # B) Estado mal ubicado
-        for i in range(21):
-            if i == 16: 
-                continue
-            if _looks_estado(fila[i]):
-                _put(16, fila[i].capitalize())
-                if i != 16:
-                    fila[i] = ""
-
-        # C) Evento/Incidente mal ubicado
-        for i in range(21):
-            if i == 3: 
-                continue
-            if _looks_evento_incidente(fila[i]):
-                _put(3, fila[i].title())
-                if i != 3:
-                    fila[i] = ""
-
-        # D) Modo de reporte en otro campo
-        for i in range(21):
-            if i == 2: 
-                continue
-            mm = _norm_modo(fila[i])
-            if mm:
-                _put(2, mm)
-                if i != 2:
-                    fila[i] = ""
-
-        # E) Área GTIC (DSEC/DITC/DSTC/DISC) detectada en otro lado
-        for i in range(21):
-            if i == 12: 
-                continue
-            t = (fila[i] or "").lower()
-            if any(k in t for k in ["dsec","ditc","dstc","disc"]):
-                _put(12, fila[i])
-                if i != 12:
-                    fila[i] = ""
-
-        # F) Encargado: del texto libre o si cayó en otra columna
-        if not fila[13].strip():
-            enc = extraer_encargado(user_question)
-            if enc:
-                fila[13] = enc
-        # Si nombres cortos quedaron en otras columnas, muévelos
-        for i in (5,6,7,9,10,11,12):
-            t = (fila[i] or "").strip()
-            if re.fullmatch(r"[A-Za-zÁÉÍÓÚÜáéíóúñÑ]+(?:\s+[A-Za-zÁÉÍÓÚÜáéíóúñÑ]+)?", t) and len(t.split()) <= 2:
-                if t and t[0].isalpha() and t[0].isupper():
-                    if _put(13, t): 
-                        fila[i] = ""
-
-        # G) “AGETIC” → Área (si está en otra columna)
-        for i in range(21):
-            if "agetic" in (fila[i] or "").lower():
-                _put(6, "AGETIC")
-                if i != 6:
-                    fila[i] = ""
-
-        # H) Sistema mal ubicado / inferencia por texto
-        if not fila[5].strip():
-            sis = infer_sistema(user_question)
-            if sis:
-                fila[5] = sis
-        for i in range(21):
-            if i == 5: 
-                continue
-            if _looks_sistema(fila[i]):
-                if _put(5, fila[i]):
-                    fila[i] = ""
-
-        # I) Ubicación: si hay ciudad en otras columnas, muévela; si vacía, infiere del texto
-        if not fila[7].strip():
-            for i in range(21):
-                if i == 7: 
-                    continue
-                if _looks_ciudad(fila[i]):
-                    fila[7] = fila[i]
-                    if i != 7:
-                        fila[i] = ""
-                    break
-        if not fila[7].strip():
-            fila[7] = detectar_ubicacion_ext(user_question) or ""
-
-        # J) Acción inmediata / Solución mal ubicadas (verbos típicos en otras columnas)
-        if not fila[10].strip():
-            fila[10] = infer_accion_inmediata(user_question)
-        if not fila[11].strip():
-            fila[11] = infer_solucion(user_question)
-
-        for i in (5,6,7,9):
-            t = (fila[i] or "").lower()
-            if re.search(r"\b(reinici|bloque|verific|restablec|permit|desbloque|allow|whitelist)\b", t):
-                # Si no hay solución → va a Solución; si hay → a Acción inmediata
-                if not fila[11].strip():
-                    fila[11] = fila[i]
-                elif not fila[10].strip():
-                    fila[10] = fila[i]
-                fila[i] = ""
-
-        # K) Clasificación final (catálogo + inferencia)
-        fila[9] = normaliza_clasificacion_final(fila[9]) or infer_clasificacion(user_question) or "Otros"
-
-        # L) Corrección de valores imposibles en Sistema/Área/Ubicación
-        #    (p.ej. Impacto o Estado que se nos haya escapado)
-        if _looks_impacto(fila[5]): 
-            _put(8, fila[5].title()); fila[5] = infer_sistema(user_question) or fila[5]
-        if _looks_estado(fila[5]): 
-            _put(16, fila[5].capitalize()); fila[5] = infer_sistema(user_question) or ""
-        if _looks_impacto(fila[6]): 
-            _put(8, fila[6].title()); fila[6] = ""
-        if _looks_estado(fila[6]): 
-            _put(16, fila[6].capitalize()); fila[6] = ""
-        if not _looks_ciudad(fila[7]) and _looks_sistema(fila[7]):
-            _put(5, fila[7]); fila[7] = detectar_ubicacion_ext(user_question) or "La paz"
-
-        # 5) Tiempo de solución
-        if not fila[15].strip():
-            fila[15] = calcula_tiempo_solucion(fila[1], fila[14])
-        if not fila[15].strip():
-            fila[15] = calcula_tiempo_desde_texto(user_question)
-
-        # 6) Inferencias y normalizaciones
-        # Modo Reporte
-        fila[2] = norm_opcion(fila[2] or detectar_modo_reporte(user_question),
-                              ["Correo","Jira","Teléfono","Monitoreo","Webex","WhatsApp"]) or "Otro"
-
-        # Ubicación (si quedó vacía)
-        if not fila[7].strip():
-            fila[7] = detectar_ubicacion_ext(user_question) or "La Paz, Bolivia"
-
-        # Acción inmediata y Solución
-        if not fila[10].strip():
-            fila[10] = infer_accion_inmediata(user_question)
-        if not fila[11].strip():
-            fila[11] = infer_solucion(user_question)
-
-        # Clasificación
-        fila[9] = normaliza_clasificacion_final(fila[9]) or infer_clasificacion(user_question) or "Otros"
-
-        # Área de GTIC / Encargado
-        if not fila[12].strip():
-            fila[12] = infer_area_coordinando(user_question)
-        if not fila[13].strip():
-            fila[13] = extraer_encargado(user_question)
-
-        # Sistema / Área
-        if not fila[5].strip():
-            fila[5] = infer_sistema(user_question) or "Firewall"
-        if not fila[6].strip():
-            fila[6] = infer_area(user_question)
-
-        # Estado por defecto
-        if not fila[16].strip():
-            fila[16] = "Cerrado" if fila[14].strip() else "En investigación"
-
-        # 7) Validaciones finales
-        if len(fila) != 21:
-            st.error(f"La salida quedó con {len(fila)} columnas (esperado: 21).")
-            st.code(cleaned, language="text")
+# ---------------------------
+# UI
+# ---------------------------
+modo_ui = st.radio("Modo", ["Reporte individual", "Importación masiva"], horizontal=True, label_visibility="collapsed")
+
+if modo_ui == "Reporte individual":
+    user_question = st.text_area(
+        "Describe el incidente:",
+        height=200,
+        placeholder="Ej: A las 8:00am el área de Contabilidad reporta por Correo que no puede acceder al sistema de Correo corporativo. Como acción inmediata, el usuario reinició el equipo y Mesa de Ayuda validó conectividad sin resultados. Seguridad Informática coordinó la atención y reinició el servicio de Correo en el servidor, verificando autenticación y entrega de mensajes. A las 10:15am el servicio quedó restablecido y se cerró el incidente.",
+        help="Incluye: Fecha/hora de apertura, Sistema, Área, Acción inmediata, Solución, Área GTIC que coordinó y Fecha/hora de cierre."
+    )
+    tokens_rep, nivel_rep = presupuesto.revisar(user_question)
+    if nivel_rep == "aviso":
+        st.warning(f"Reporte largo (~{tokens_rep:,} tokens): la respuesta tardará más y costará más. "
+                   "Considera quitar logs pegados.")
+    elif nivel_rep == "excede":
+        st.error(f"El reporte tiene ~{tokens_rep:,} tokens (máximo {presupuesto.maximo:,}); recórtalo antes de enviarlo.")
+
+    dup = buscar_duplicado(user_question) if user_question.strip() else None
+    accion_dup = "nuevo"
+    if dup is not None:
+        st.warning(f"Parece el mismo incidente que **{dup.codigo}** (similitud {dup.similitud:.0%}): "
+                   f"{dup.fila[5]} · {dup.fila[4]}")
+        accion_dup = st.radio(
+            "¿Qué hacer con este reporte?",
+            ["vincular", "reusar", "nuevo"],
+            format_func={
+                "vincular": f"Es el mismo incidente: vincular a {dup.codigo} (no crea fila)",
+                "reusar": f"Registrar usando los campos de {dup.codigo} (sin consultar al modelo)",
+                "nuevo": "Es otro incidente: registrar consultando al modelo",
+            }.get,
+        )
+
+    if st.button("Reportar", use_container_width=True):
+        if not user_question.strip():
+            st.warning("Por favor, describe el incidente antes de continuar.")
+            st.stop()
+        if nivel_rep == "excede":
+            st.stop()
+        if accion_dup == "vincular":
+            metricas.contar("duplicado", accion="vincular")
+            st.success(f"Reporte vinculado a {dup.codigo}; no se creó una fila nueva.")
             st.stop()
 
-        # 8) Código + timestamp
-        codigo = generar_codigo_inc(ws, fila[1] if fila[1].strip() else None)
-        fila[0] = codigo
-        registro_ts = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-        fila_con_ts = fila + [registro_ts]
-
-        # 9) Vista previa
-        df_prev = pd.DataFrame([fila_con_ts], columns=COLUMNAS + ["Hora de reporte"])
-        st.subheader("Vista previa")
-        st.dataframe(df_prev, use_container_width=True)
-        if avisos:
-            st.info(" | ".join(avisos))
-
-        # 10) Guardar
+        with st.spinner("Generando y validando la fila..."), metricas.span("reporte_total"):
+            # Extracciones locales (fechas, ubicación, sistema, …) en paralelo con el modelo
+            ctx = ContextoReporte(user_question)
+            pre = threading.Thread(target=ctx.precalcular, name="contexto-reporte", daemon=True)
+            pre.start()
+
+            st.subheader("Vista previa")
+            vista = st.empty()
+
+            def _avance(acumulado: str):
+                vista.dataframe(
+                    tabla([campos_parciales(acumulado)], COLUMNAS), use_container_width=True
+                )
+
+            if accion_dup == "reusar":
+                # 1–6) Sin modelo: campos del duplicado + fechas y modo de este reporte
+                metricas.contar("duplicado", accion="reusar")
+                pre.join()
+                fila, avisos, cleaned = fila_reusada(dup.fila, ctx), [f"Campos tomados de {dup.codigo}"], ""
+            elif (fila := fila_por_reglas(user_question, ctx)) is not None:
+                # 1–6) Sin modelo: el reporte sigue la plantilla y las reglas cubren todos los campos
+                pre.join()
+                avisos, cleaned = ["Fila armada con reglas locales (sin consultar al modelo)"], ""
+            else:
+                # 1) LLM
+                try:
+                    response_text = llamar_modelo(user_question, al_avanzar=_avance)
+                except Exception as e:
+                    st.error(f"Error al generar contenido: {e}")
+                    st.stop()
+
+                # 2–6) Saneo, normalización a 21 columnas, fechas, realineo e inferencias
+                pre.join()
+                fila, avisos, cleaned = procesar_respuesta(user_question, response_text, ctx=ctx, medir=metricas.span)
+
+            # 7) Validaciones finales
+            if len(fila) != 21:
+                for _modo in MODOS_SALIDA:
+                    get_cache_llm(_modo).quitar(user_question)
+                st.error(f"La salida quedó con {len(fila)} columnas (esperado: 21).")
+                st.code(cleaned, language="text")
+                st.stop()
+
+            # 8) Código + timestamp
+            with metricas.span("codigo"):
+                codigo = generar_codigo_inc(fila[1] if fila[1].strip() else None)
+            fila[0] = codigo
+            registro_ts = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+            fila_con_ts = fila + [registro_ts]
+
+            # 9) Vista previa
+            with metricas.span("vista_previa"):
+                df_prev = tabla([fila_con_ts], COLUMNAS + ["Hora de reporte"])
+                vista.dataframe(df_prev, use_container_width=True)
+                if avisos:
+                    st.info(" | ".join(avisos))
+
+            # 10) Guardar: queda en el journal local; el envío a la hoja es en segundo plano
+            try:
+                with metricas.span("journal", filas=1):
+                    cola_hoja.encolar([fila_con_ts], textos=[normalizar(user_question)])
+                get_indice_duplicados().agregar(codigo, user_question, fila)
+                get_indice_busqueda().agregar([fila_con_ts])
+                st.success(f"Incidente registrado correctamente: {codigo}")
+            except Exception as e:
+                st.error(f"No se pudo registrar el incidente: {e}")
+
+else:
+    archivo = st.file_uploader("Archivo de reportes", type=["csv", "txt", "jsonl"])
+    st.caption("TXT: un reporte por párrafo (separados por línea en blanco) · CSV: columna 'reporte' · JSONL: un objeto {\"reporte\": ...} por línea.")
+
+    if archivo is not None and st.button("Procesar archivo", use_container_width=True):
         try:
-            ws.append_row(fila_con_ts, value_input_option="USER_ENTERED")
-            st.success(f"Incidente registrado correctamente: {codigo}")
+            textos = leer_reportes(archivo.name, archivo.getvalue())
         except Exception as e:
-            st.error(f"No se pudo escribir en la hoja: {e}")
-
-
-
-
+            st.error(f"No se pudo leer el archivo: {e}")
+            st.stop()
+        if not textos:
+            st.warning("El archivo no contiene reportes.")
+            st.stop()
+        with st.spinner(f"Procesando {len(textos)} reportes..."):
+            with metricas.span("lote_total", filas=len(textos)):
+                st.session_state["lote"] = procesar_lote(
+                    textos, llamar_modelo, BULK_MAX_WORKERS, medir=metricas.span, reglas=fila_por_reglas,
+                )
+
+    lote = st.session_state.get("lote")
+    if lote:
+        df_lote = tabla(
+            [[r.ok, r.error or " | ".join(r.avisos)] + (r.fila if r.ok else [""] * 21) for r in lote],
+            ["Aceptar", "Avisos"] + COLUMNAS,
+        )
+        st.subheader("Vista previa")
+        editado = st.data_editor(
+            df_lote, use_container_width=True, hide_index=True,
+            disabled=["Avisos"] + COLUMNAS, key="lote_editor",
+        )
+        aceptados = [r for r, ok in zip(lote, editado["Aceptar"]) if ok and r.ok]
+        st.caption(f"{len(aceptados)} de {len(lote)} reportes aceptados.")
+
+        if aceptados and st.button(f"Registrar {len(aceptados)} incidentes", use_container_width=True):
+            with metricas.span("codigo", filas=len(aceptados)):
+                codigos = generar_codigos_bloque([r.fila[1] for r in aceptados])
+            registro_ts = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+            filas = [[c] + r.fila[1:] + [registro_ts] for r, c in zip(aceptados, codigos)]
+            try:
+                with metricas.span("journal", filas=len(filas)):
+                    cola_hoja.encolar(filas, textos=[normalizar(r.texto) for r in aceptados])
+                for r, f in zip(aceptados, filas):
+                    get_indice_duplicados().agregar(f[0], r.texto, f[:21])
+                get_indice_busqueda().agregar(filas)
+                st.success(f"{len(filas)} incidentes registrados: {codigos[0]} … {codigos[-1]}")
+                del st.session_state["lote"]
+            except Exception as e:
+                st.error(f"No se pudo registrar los incidentes: {e}")
 
+# ---------------------------
+# Estado de Vertex (al final: el formulario ya se dibujó)
+# ---------------------------
+_ok, _err = get_vertex()[1].estado()
+if _ok is None:
+    estado_vertex.caption(":grey[Vertex: verificando…]")
+elif _ok:
+    estado_vertex.caption(":green[Vertex OK]")
+else:
+    estado_vertex.error(f"Vertex error: {_err}")
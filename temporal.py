@@ -0,0 +1,227 @@
+# ---------------------------
+# Motor temporal: fechas, horas, rangos y expresiones relativas en un solo escaneo
+# ---------------------------
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import cached_property, lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("America/La_Paz")
+
+MESES_ES = r"enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
+MESES_MAP = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9,
+    "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+RELATIVOS_DIAS = {"hoy": 0, "esta mañana": 0, "esta tarde": 0, "esta noche": 0,
+                  "ayer": 1, "anoche": 1, "anteayer": 2, "antier": 2}
+UNIDADES = {"min": timedelta(minutes=1), "h": timedelta(hours=1), "d": timedelta(days=1), "s": timedelta(weeks=1)}
+CANTIDADES = {"un": 1, "una": 1, "media": 0.5}
+
+# Una sola expresión con una alternativa por tipo de mención. En una misma posición gana la
+# primera alternativa: "8:00 pm" es UNA hora (am/pm antes que 24 h) y "2025-09-05" no se
+# relee como 5/9.
+TOKEN_RE = re.compile(
+    r"\b(?:"
+    r"(?P<iso_y>20\d{2})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})"                                  # 2025-09-05
+    rf"|(?P<dm_d>\d{{1,2}})\s+de\s+(?P<dm_mes>{MESES_ES})(?:\s+de\s+(?P<dm_y>\d{{4}}))?"          # 5 de septiembre [de 2025]
+    r"|(?P<ap_h>1[0-2]|0?[1-9])(?::(?P<ap_m>[0-5]\d))?\s*(?P<ap>a\.?m\.?|am|p\.?m\.?|pm)"          # 8:15am, 8 pm
+    r"|(?P<h24_h>[01]?\d|2[0-3]):(?P<h24_m>[0-5]\d)"                                             # 14:30
+    r"|(?P<sl_d>\d{1,2})[/-](?P<sl_m>\d{1,2})(?:[/-](?P<sl_y>\d{2,4}))?"                         # 5/9[/2025]
+    r"|hace\s+(?P<hace_n>\d+|un|una|media)\s+(?P<hace_u>minutos?|min|horas?|hrs?|d[ií]as?|semanas?)"  # hace 2 horas
+    r"|(?P<rel>anteayer|antier|ayer|anoche|hoy|esta\s+(?:mañana|tarde|noche))"                   # ayer, anoche
+    r")\b"
+)
+# Entre dos horas: "de 8:00 a 10:15", "entre las 8am y las 9am", "8:00 - 9:30"
+CONECTOR_RANGO_RE = re.compile(r"\s*(?:a|hasta|y|-|–)\s*(?:las\s+)?")
+FECHA_HORA_RE = re.compile(r"\s*(\d{4})-(\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{2})\s*")
+
+
+@dataclass(frozen=True)
+class Mencion:
+    tipo: str       # "fecha" | "hora" | "relativo" | "hace"
+    origen: str     # "iso" | "dmes" | "dmy" | "ampm" | "h24" | "rel" | "hace"
+    inicio: int
+    fin: int
+    valor: object   # date | (hora, minuto) | días hacia atrás (int) | timedelta
+
+
+def _anio(y: Optional[str], hoy: date) -> int:
+    if not y:
+        return hoy.year
+    yi = int(y)
+    return 2000 + yi if yi < 100 else yi
+
+
+def _fecha(y: int, m: int, d: int) -> Optional[date]:
+    try:
+        return date(y, m, d)
+    except ValueError:
+        return None
+
+
+def _a_24h(h: int, ampm: str) -> int:
+    tarde = ampm.startswith("p")
+    if tarde and h != 12:
+        return h + 12
+    if not tarde and h == 12:
+        return 0
+    return h
+
+
+def _formato_duracion(delta: timedelta) -> str:
+    horas = delta.seconds // 3600 + delta.days * 24
+    minutos = (delta.seconds % 3600) // 60
+    return f"{horas} horas {minutos} minutos"
+
+
+def escanear(texto: str, hoy: date) -> list[Mencion]:
+    """Todas las menciones temporales del texto, en orden de aparición (un solo finditer)."""
+    out: list[Mencion] = []
+    for m in TOKEN_RE.finditer((texto or "").lower()):
+        g = m.groupdict()
+        ini, fin = m.span()
+        if g["iso_y"]:
+            f = _fecha(int(g["iso_y"]), int(g["iso_m"]), int(g["iso_d"]))
+            if f:
+                out.append(Mencion("fecha", "iso", ini, fin, f))
+        elif g["dm_d"]:
+            f = _fecha(_anio(g["dm_y"], hoy), MESES_MAP[g["dm_mes"]], int(g["dm_d"]))
+            if f:
+                out.append(Mencion("fecha", "dmes", ini, fin, f))
+        elif g["ap_h"]:
+            hm = (_a_24h(int(g["ap_h"]), g["ap"].replace(".", "")), int(g["ap_m"] or 0))
+            out.append(Mencion("hora", "ampm", ini, fin, hm))
+        elif g["h24_h"]:
+            out.append(Mencion("hora", "h24", ini, fin, (int(g["h24_h"]), int(g["h24_m"]))))
+        elif g["sl_d"]:
+            f = _fecha(_anio(g["sl_y"], hoy), int(g["sl_m"]), int(g["sl_d"]))
+            if f:
+                out.append(Mencion("fecha", "dmy", ini, fin, f))
+        elif g["hace_n"]:
+            n = CANTIDADES.get(g["hace_n"]) or int(g["hace_n"])
+            u = g["hace_u"]
+            unidad = UNIDADES["min" if u.startswith("min") else "h" if u.startswith("h")
+                              else "s" if u.startswith("sem") else "d"]
+            out.append(Mencion("hace", "hace", ini, fin, unidad * n))
+        elif g["rel"]:
+            out.append(Mencion("relativo", "rel", ini, fin, RELATIVOS_DIAS[re.sub(r"\s+", " ", g["rel"])]))
+    return out
+
+
+class Temporal:
+    """
+    Resultado del escaneo de UN texto; apertura, cierre y tiempo de solución salen de aquí.
+
+    - horas: en orden de aparición y sin repetir ("HH:MM").
+    - fecha: la fecha explícita (prioridad ISO > "5 de septiembre" > 5/9, como antes).
+    - Apertura/cierre: el primer rango "de H1 a H2" si lo hay; si no, la primera y la
+      última hora. Día: fecha explícita → relativa ("ayer", "anoche", "hace 3 días") → hoy.
+      Si el cierre queda antes de la apertura, es del día siguiente.
+    - Sin horas, "hace N horas/minutos" da la apertura (ahora − N).
+    """
+
+    def __init__(self, texto: str, ahora: datetime):
+        self.texto = texto
+        self.ahora = ahora
+        self.menciones = escanear(texto, ahora.date())
+
+    @cached_property
+    def _horas(self) -> list[Mencion]:
+        return [m for m in self.menciones if m.tipo == "hora"]
+
+    @cached_property
+    def horas(self) -> list[str]:
+        vistas: dict[str, None] = {}
+        for m in self._horas:
+            vistas.setdefault(f"{m.valor[0]:02d}:{m.valor[1]:02d}", None)
+        return list(vistas)
+
+    @cached_property
+    def fecha(self) -> Optional[date]:
+        fechas = [m for m in self.menciones if m.tipo == "fecha"]
+        for origen in ("iso", "dmes", "dmy"):
+            for m in fechas:
+                if m.origen == origen:
+                    return m.valor
+        return None
+
+    @cached_property
+    def rangos(self) -> list[tuple[str, str]]:
+        out = []
+        for a, b in zip(self._horas, self._horas[1:]):
+            if CONECTOR_RANGO_RE.fullmatch(self.texto[a.fin:b.inicio]):
+                out.append((f"{a.valor[0]:02d}:{a.valor[1]:02d}", f"{b.valor[0]:02d}:{b.valor[1]:02d}"))
+        return out
+
+    @cached_property
+    def fecha_base(self) -> date:
+        if self.fecha:
+            return self.fecha
+        for m in self.menciones:
+            if m.tipo == "relativo":
+                return self.ahora.date() - timedelta(days=m.valor)
+            if m.tipo == "hace" and m.valor >= timedelta(days=1):
+                return (self.ahora - m.valor).date()
+        return self.ahora.date()
+
+    @cached_property
+    def intervalo(self) -> tuple[Optional[datetime], Optional[datetime]]:
+        """(apertura, cierre) como datetime (None si no hay)."""
+        if self.rangos:
+            h_ini, h_fin = self.rangos[0]
+        elif self.horas:
+            h_ini, h_fin = self.horas[0], (self.horas[-1] if len(self.horas) > 1 else None)
+        else:
+            hace = next((m.valor for m in self.menciones if m.tipo == "hace" and m.valor < timedelta(days=1)), None)
+            return ((self.ahora - hace).replace(second=0, microsecond=0) if hace else None), None
+        apertura = datetime.combine(self.fecha_base, time(*map(int, h_ini.split(":"))), TZ)
+        if h_fin is None:
+            return apertura, None
+        cierre = datetime.combine(self.fecha_base, time(*map(int, h_fin.split(":"))), TZ)
+        if cierre < apertura:
+            cierre += timedelta(days=1)
+        return apertura, cierre
+
+    @cached_property
+    def fechas(self) -> tuple[str, str]:
+        """(apertura, cierre) en "YYYY-MM-DD HH:MM" ("" si no hay)."""
+        return tuple(d.strftime("%Y-%m-%d %H:%M") if d else "" for d in self.intervalo)
+
+    @cached_property
+    def tiempo(self) -> str:
+        """Tiempo de solución "X horas Y minutos" (cierre − apertura) o ""."""
+        apertura, cierre = self.intervalo
+        return _formato_duracion(cierre - apertura) if apertura and cierre else ""
+
+
+@lru_cache(maxsize=256)
+def _analizar_memo(texto: str, ahora: datetime) -> Temporal:
+    return Temporal(texto, ahora)
+
+
+def analizar_temporal(texto: str, ahora: Optional[datetime] = None) -> Temporal:
+    """Escaneo temporal de `texto`; memoizado por (texto, minuto actual)."""
+    ahora = (ahora or datetime.now(TZ)).replace(second=0, microsecond=0)
+    return _analizar_memo(texto or "", ahora)
+
+
+@lru_cache(maxsize=1024)
+def _fecha_hora(s: str) -> Optional[datetime]:
+    m = FECHA_HORA_RE.fullmatch(s)
+    if not m:
+        return None
+    y, mo, d, h, mi = map(int, m.groups())
+    try:
+        return datetime(y, mo, d, h, mi, tzinfo=TZ)
+    except ValueError:
+        return None
+
+
+def duracion(apertura: str, cierre: str) -> str:
+    """ "X horas Y minutos" entre dos celdas "YYYY-MM-DD HH:MM" (p. ej. las que dio el modelo)."""
+    a, c = _fecha_hora(apertura or ""), _fecha_hora(cierre or "")
+    return _formato_duracion(c - a) if a and c and c >= a else ""
@@ -0,0 +1,244 @@
+# ---------------------------
+# Vía rápida: fila armada solo con reglas cuando todos los campos decisivos son confiables
+# ---------------------------
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from procesamiento import (
+    COLUMNAS, MODO_OPCIONES, ContextoReporte, _finalizar, _vacios_y_fechas,
+    analizar, infer_area_coordinando, norm_opcion, normaliza_clasificacion_final,
+)
+from temporal import TZ, analizar_temporal
+
+# Campos "obligatorios" de las instrucciones de la página (Encargado solo si se menciona)
+REQUERIDOS = (
+    "Fecha y Hora de Apertura", "Modo Reporte", "Sistema", "Area",
+    "Acción Inmediata", "Solución", "Area de GTIC - Coordinando",
+)
+# Además de los obligatorios, la vía rápida exige Clasificación: sin una regla que la respalde,
+# _finalizar escribiría "Otros" por defecto (Ubicación/Encargado vacíos no se adivinan mejor con el modelo)
+DECISIVOS = REQUERIDOS + ("Clasificación",)
+UMBRAL = 0.8
+
+# Formato plantilla "Campo: valor" (por línea, o separados por ; / . / viñetas / numeración)
+ETIQUETAS = {
+    "Fecha y Hora de Apertura": ("fecha y hora de apertura", "fecha de apertura", "apertura", "inicio"),
+    "Modo Reporte": ("modo de reporte", "modo reporte", "reportado por", "medio"),
+    "Descripción Evento/ Incidente": ("descripción", "descripcion", "detalle"),
+    "Sistema": ("sistema afectado", "sistema"),
+    "Area": ("área afectada", "area afectada", "área", "area"),
+    "Ubicación": ("ubicación", "ubicacion"),
+    "Impacto": ("impacto",),
+    "Clasificación": ("clasificación", "clasificacion"),
+    "Acción Inmediata": ("acción inmediata tomada", "accion inmediata tomada", "acción inmediata", "accion inmediata"),
+    "Solución": ("solución aplicada", "solucion aplicada", "solución", "solucion"),
+    "Area de GTIC - Coordinando": (
+        "área de gtic que coordinó", "area de gtic que coordino", "área de gtic", "area de gtic",
+        "área gtic", "area gtic", "coordinado por", "coordinó", "coordino",
+    ),
+    "Encargado SI": ("encargado", "responsable"),
+    "Fecha y Hora de Cierre": ("fecha y hora de cierre", "fecha de cierre", "cierre"),
+}
+_ALIAS = {a: col for col, alias in ETIQUETAS.items() for a in alias}
+ETIQUETA_RE = re.compile(
+    r"(?:^|[\n;•]|\.\s|\d[.)]\s)\s*[-*]*\s*(?:\*\*)?(?P<etq>"
+    + "|".join(re.escape(a) for a in sorted(_ALIAS, key=len, reverse=True))
+    + r")(?:\*\*)?\s*(?:\*\*)?:",
+    re.IGNORECASE,
+)
+GTIC_CODIGOS = {
+    "dsec": "DSEC - Seguridad", "ditc": "DITC - Infraestructura",
+    "dstc": "DSTC - Soporte Técnico", "disc": "DISC - Sistemas",
+}
+GTIC_CODIGO_RE = re.compile(r"\b(dsec|ditc|dstc|disc)\b", re.IGNORECASE)
+# Frases de la redacción en párrafo que anuncian un campo
+ACCION_CUE_RE = re.compile(r"(?:como |la )?(?:acci[oó]n|medida) inmediata(?: tomada)?(?: fue)?\s*[:,]?\s*(?P<v>[^.;\n]+)", re.IGNORECASE)
+SOLUCION_CUE_RE = re.compile(r"(?:la )?soluci[oó]n(?: aplicada)?(?: fue)?\s*[:,]?\s*(?P<v>[^.;\n]+)", re.IGNORECASE)
+COORDINO_RE = re.compile(r"coordin[oó]|a cargo de", re.IGNORECASE)
+# infer_area toma todo hasta la puntuación ("Contabilidad Reporta Por Correo Que …", "Rrhh A Las 14:00"):
+# se corta en el verbo o en la hora
+AREA_CORTE_RE = re.compile(r"\s+(?:(?:report|inform|indic|comunic|avis|notific|recib|detect|present|tien)\w*|que|por|con|sin|no|se|en|desde|a\s+las?|\d+)\b.*", re.IGNORECASE)
+# Capturas de texto libre que arrastran una hora o empiezan con un verbo conjugado ("Fue eliminar …",
+# "Se bloqueó …", "Reinició …") están mal cortadas: no alcanzan el umbral
+HORA_EN_VALOR_RE = re.compile(r"\b\d{1,2}(?::\d{2}|\s*(?:am|pm|hrs?|horas)\b)|\ba\s+las?\s+\d", re.IGNORECASE)
+VERBO_INICIAL_RE = re.compile(
+    r"^(?:se|fue|fueron|es|era|eran|son|ha|han|hab[ií]a|est[aá]|estaba|qued[oó]|consisti[oó]|\w+ó|\w+(?:aron|ieron))\b",
+    re.IGNORECASE,
+)
+CONFIANZA_SOSPECHOSA = 0.5
+CAMPOS_LIBRES = (
+    "Sistema", "Area", "Ubicación", "Encargado SI", "Acción Inmediata", "Solución", "Area de GTIC - Coordinando",
+)
+MODO_EXPLICITO_RE = re.compile(r"\b(whatsapp|webex)\b")
+# "… al sistema de ERP …": desempata cuando el texto nombra varios sistemas
+SISTEMA_FRASE_RE = re.compile(r"\bsistemas?(?:\s+afectados?)?\s+(?:de(?:l)?\s+)?")
+IMPACTO_RE = re.compile(r"\bimpacto\s+(?:es\s+|fue\s+)?(alto|medio|bajo)\b", re.IGNORECASE)
+
+
+def campos_etiquetados(texto: str) -> dict[str, str]:
+    """{columna: valor} de los segmentos "Campo: valor" del reporte (el primero gana)."""
+    marcas = list(ETIQUETA_RE.finditer(texto or ""))
+    out: dict[str, str] = {}
+    for m, sig in zip(marcas, marcas[1:] + [None]):
+        col = _ALIAS[m.group("etq").lower()]
+        fin = sig.start() if sig is not None else len(texto)
+        # En redacción de párrafo ("Solución: … . Coordinó …") el valor termina con la oración
+        valor = re.split(r"\.\s|\n", texto[m.end():fin].strip(), 1)[0].strip().strip(".;,").strip()
+        if valor and col not in out:
+            out[col] = valor
+    return out
+
+
+def sospechoso(valor: str) -> bool:
+    """Valor capturado del texto libre que contiene una hora o empieza con un verbo conjugado."""
+    v = (valor or "").strip()
+    return bool(HORA_EN_VALOR_RE.search(v) or VERBO_INICIAL_RE.match(v))
+
+
+def _primera_frase(texto: str, max_len: int = 220) -> str:
+    """Resumen extractivo: la primera oración del reporte, recortada."""
+    frase = re.split(r"(?<=[.!?])\s+|\n", (texto or "").strip(), 1)[0].strip()
+    if len(frase) > max_len:
+        frase = frase[:max_len].rsplit(" ", 1)[0] + "…"
+    return frase
+
+
+@dataclass
+class Extraccion:
+    fila: list[str]                                          # 21 columnas (CODIGO vacío)
+    confianza: dict[str, float] = field(default_factory=dict)   # columna → 0–1
+
+    def bajas(self, umbral: float = UMBRAL, requeridos: tuple = DECISIVOS) -> list[str]:
+        """Campos decisivos por debajo del umbral (los que habría que pedirle al modelo)."""
+        return [c for c in requeridos if self.confianza.get(c, 0.0) < umbral]
+
+    def confiable(self, umbral: float = UMBRAL) -> bool:
+        return not self.bajas(umbral)
+
+
+def extraer(texto: str, ctx: ContextoReporte | None = None) -> Extraccion:
+    """
+    Arma la fila con los extractores locales y una confianza por campo:
+    1.0 si vino como "Campo: valor"; ~0.9 si una regla coincidió sin ambigüedad;
+    menos si hubo varias coincidencias, si el valor parece mal cortado o si es un default.
+    La fila pasa por los mismos pasos finales que la respuesta del modelo (_finalizar).
+    """
+    ctx = ctx or ContextoReporte(texto)
+    a = ctx.analisis
+    etq = campos_etiquetados(texto)
+    col = {c: i for i, c in enumerate(COLUMNAS)}
+    fila = [""] * len(COLUMNAS)
+    conf: dict[str, float] = {}
+
+    def poner(c: str, valor: str, confianza: float):
+        fila[col[c]] = valor or ""
+        conf[c] = confianza if valor else 0.0
+
+    # Fechas: hora explícita (+ fecha explícita) en el campo o en el texto
+    fecha_texto = ctx.temporal.fecha
+    for c, i_ctx in (("Fecha y Hora de Apertura", 0), ("Fecha y Hora de Cierre", 1)):
+        campo = analizar_temporal(etq[c]) if c in etq else None
+        if campo and campo.horas:
+            fecha = campo.fecha or fecha_texto
+            poner(c, f"{fecha or datetime.now(TZ).date()} {campo.horas[0]}", 1.0 if fecha else 0.9)
+        else:
+            poner(c, ctx.fechas[i_ctx], 0.9 if fecha_texto else 0.85)
+
+    # Modo
+    if "Modo Reporte" in etq:
+        h = analizar(etq["Modo Reporte"]).primera("modo")
+        poner("Modo Reporte", norm_opcion(etq["Modo Reporte"], MODO_OPCIONES) or (h.etiqueta if h else ""), 1.0)
+    else:
+        modos = a.etiquetas("modo")
+        # MODO_RULES agrupa WhatsApp con Teléfono; la columna los distingue
+        explicito = MODO_EXPLICITO_RE.search(ctx.lower)
+        poner("Modo Reporte", norm_opcion(explicito.group(1), MODO_OPCIONES) if explicito else ctx.modo,
+              0.9 if len(modos) == 1 else 0.6 if modos else 0.2)
+
+    fila[col["Evento/ Incidente"]] = "Evento" if re.search(r"\bevento\b", ctx.lower) and \
+        not re.search(r"\bincidente\b", ctx.lower) else "Incidente"
+
+    # Sistema / Área / Ubicación / Encargado
+    if "Sistema" in etq:
+        poner("Sistema", etq["Sistema"], 1.0)
+    else:
+        sistemas = a.etiquetas("sistema")
+        frase = SISTEMA_FRASE_RE.search(ctx.lower)
+        nombrado = next((h for h in a.hits if h.tabla == "sistema" and frase
+                         and frase.end() <= h.start <= frase.end() + 20), None)
+        if nombrado is not None:
+            poner("Sistema", nombrado.etiqueta, 0.9 if len(sistemas) == 1 else 0.85)
+        else:
+            # "sistema de <X>" con un X fuera de la tabla: lo que encontró la regla es otra cosa
+            poner("Sistema", ctx.sistema, 0.5 if frase else 0.9 if len(sistemas) == 1 else 0.6)
+    if "Area" in etq:
+        poner("Area", etq["Area"], 1.0)
+    else:
+        area = AREA_CORTE_RE.sub("", ctx.area).strip()
+        poner("Area", area, 0.85 if len(area.split()) <= 3 else 0.4)
+    if "Ubicación" in etq:
+        poner("Ubicación", etq["Ubicación"], 1.0)
+    else:
+        poner("Ubicación", ctx.ubicacion, 0.9)
+    if "Encargado SI" in etq:
+        poner("Encargado SI", etq["Encargado SI"], 1.0)
+    else:
+        poner("Encargado SI", ctx.encargado, 0.85 if len(ctx.encargado.split()) <= 4 else 0.4)
+
+    # Impacto: solo si el texto lo dice
+    impacto = norm_opcion(etq.get("Impacto", ""), ["Alto", "Medio", "Bajo"])
+    m = IMPACTO_RE.search(texto)
+    poner("Impacto", impacto or (m.group(1).title() if m else ""), 1.0)
+
+    # Clasificación
+    clasif = normaliza_clasificacion_final(etq.get("Clasificación", ""))
+    if clasif:
+        poner("Clasificación", clasif, 1.0)
+    else:
+        hits = a.etiquetas("clasif")
+        poner("Clasificación", ctx.clasificacion, 0.85 if len(hits) == 1 else 0.7 if hits else 0.0)
+
+    # Acción inmediata / Solución: campo → frase que lo anuncia → tabla de reglas
+    for c, cue, regla in (("Acción Inmediata", ACCION_CUE_RE, ctx.accion_inmediata),
+                          ("Solución", SOLUCION_CUE_RE, ctx.solucion)):
+        m = cue.search(texto)
+        if c in etq:
+            poner(c, etq[c], 1.0)
+        elif m:
+            poner(c, m.group("v").strip().capitalize(), 0.9)
+        else:
+            poner(c, regla, 0.8)
+
+    # Área de GTIC: código explícito → palabra clave en la frase de coordinación → palabra clave suelta
+    v = etq.get("Area de GTIC - Coordinando", "")
+    m = GTIC_CODIGO_RE.search(v or texto)
+    if m:
+        poner("Area de GTIC - Coordinando", GTIC_CODIGOS[m.group(1).lower()], 1.0)
+    elif v:
+        poner("Area de GTIC - Coordinando", infer_area_coordinando(v) or v, 0.9)
+    else:
+        frase = next((f for f in re.split(r"(?<=[.;])\s+", texto) if COORDINO_RE.search(f)), "")
+        en_frase = infer_area_coordinando(frase) if frase else ""
+        poner("Area de GTIC - Coordinando", en_frase or ctx.area_coordinando, 0.9 if en_frase else 0.6)
+
+    # Descripción: resumen extractivo (el modelo resume mejor; aquí basta la primera oración)
+    if "Descripción Evento/ Incidente" in etq:
+        poner("Descripción Evento/ Incidente", etq["Descripción Evento/ Incidente"], 1.0)
+    elif ETIQUETA_RE.match(texto.lstrip()):
+        # Plantilla sin descripción: se arma con los campos (la primera línea es una etiqueta)
+        desc = f"Incidente en {fila[col['Sistema']] or 'sistema no indicado'}"
+        desc += f" reportado por {fila[col['Area']]}" if fila[col["Area"]] else ""
+        desc += f"; {fila[col['Solución']]}" if fila[col["Solución"]] else ""
+        poner("Descripción Evento/ Incidente", desc, 0.5)
+    else:
+        poner("Descripción Evento/ Incidente", _primera_frase(texto), 0.5)
+
+    # Capturas del texto libre mal cortadas: que decida el modelo (los "Campo: valor" se respetan)
+    for c in CAMPOS_LIBRES:
+        if c not in etq and sospechoso(fila[col[c]]):
+            conf[c] = min(conf.get(c, 0.0), CONFIANZA_SOSPECHOSA)
+
+    # Mismos pasos finales que una respuesta del modelo (defaults, normalizaciones, tiempo, estado)
+    fila = _finalizar(_vacios_y_fechas(fila, ctx), ctx)
+    return Extraccion(fila=fila, confianza=conf)